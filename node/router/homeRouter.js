@@ -5,7 +5,7 @@ const path = require("path");
 dotenv.config({ path: path.join(__dirname, '..', 'env', '.env') });
 const jwt = require('jsonwebtoken');
 
-const { JWT_SECRET_KEY, CHATBOT_SERVER } = process.env;
+const { JWT_SECRET_KEY, CHATBOT_SERVER, INGEST_SERVER, INGEST_TOKEN } = process.env;
 
 // db 연결
 const { registerMember, confirmMember, setCodeForChPw, changePw } = require("../models/register_query.js");
@@ -15,6 +15,28 @@ const { writeBoard, getBoard, getPost, approveY } = require("../models/board_que
 ///api/chat 라우터 필요 코드 (node-fetch 동적 임포트 유지)
 const fetch = (...args) => import('node-fetch').then(({ default: fetch }) => fetch(...args));
 
+// Python RAG 서버와의 연결을 재사용 (요청마다 TCP 연결을 새로 맺지 않음)
+// 유휴 연결은 60초 뒤 닫음 → Python 쪽 keep-alive(RAG_KEEP_ALIVE_TIMEOUT=65초)보다 짧게 유지
+const http = require('http');
+const https = require('https');
+const ragAgentOptions = { keepAlive: true, maxSockets: 64, timeout: 60000 };
+const ragHttpAgent = new http.Agent(ragAgentOptions);
+const ragHttpsAgent = new https.Agent(ragAgentOptions);
+const ragAgent = (parsedURL) => (parsedURL.protocol === 'http:' ? ragHttpAgent : ragHttpsAgent);
+
+// 승인된 공고를 임베딩 수집기(post_to_pinecone.py)에 바로 알림 → 주기 확인을 기다리지 않고 몇 초 안에 검색됨
+// 응답을 기다리지 않으며, 실패해도 수집기의 주기 확인이 나중에 반영하므로 로그만 남김
+function notifyIngester(postIds) {
+    if (!INGEST_SERVER) return;
+    fetch(INGEST_SERVER + '/ingest', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-Ingest-Token': INGEST_TOKEN || '' },
+        body: JSON.stringify({ post_ids: postIds }),
+        agent: ragAgent,
+        signal: AbortSignal.timeout(2000),
+    }).catch((err) => console.log('수집기 알림 실패:', err.message));
+}
+
 
 // 홈페이지
 router.get('/', (req, res) => {
@@ -120,6 +142,9 @@ router.patch('/setApprove', async (req, res) => {
     try {
 
         const result = await approveY(req.body.postnum);
+        if (result.result && result.result.affectedRows > 0) {
+            notifyIngester([Number(req.body.postnum)]);
+        }
         res.status(result.code).json(result.result);
     }
     catch (err) {
@@ -140,10 +165,11 @@ router.get('/confirmMember', async (req, res) => {
 router.post('/api/chat', async (req, res) => {
     try {
         // ⭐️ [수정] React에서 'user_profile'도 함께 받음
-        const { message, history, user_profile } = req.body;
+        // session_id가 있으면 Python 서버가 대화 기록을 보관하므로 history는 비어 있어도 됨
+        const { message, history = [], user_profile, session_id, resume_session, location } = req.body;
 
         console.log('React로부터 받은 메시지:', message);
-        console.log(`React로부터 받은 대화 기록 수: ${history.length}개`);
+        console.log(`React로부터 받은 대화 기록 수: ${history.length}개 (세션: ${session_id || '없음'})`);
         console.log('사용자 프로필 정보:', user_profile); // 로그로 확인
 
         // 2. Python RAG API 서버(8001번 포트)에 요청 전송
@@ -151,27 +177,41 @@ router.post('/api/chat', async (req, res) => {
 
         const ragResponse = await fetch(ragApiUrl, {
             method: 'POST',
+            agent: ragAgent,
             headers: {
                 'Content-Type': 'application/json',
+                'X-Timing': '1', // Python 서버가 단계별 처리 시간을 Server-Timing 헤더로 돌려줌
             },
             // ⭐️ [수정] Python 서버로 'user_profile'을 포함하여 전송
             body: JSON.stringify({
                 message: message,
                 history: history,
-                user_profile: user_profile // 파이썬이 이걸 받아서 프롬프트에 넣음
+                user_profile: user_profile, // 파이썬이 이걸 받아서 프롬프트에 넣음
+                session_id: session_id,
+                resume_session: resume_session, // true인데 Python 서버에 세션이 없으면 409 → React가 history를 다시 보냄
+                location: location // {lat, lng}: "근처" 질문이면 가까운 공고로 좁힘
             }),
         });
 
+        if (ragResponse.status === 409) {
+            return res.status(409).json(await ragResponse.json());
+        }
         if (!ragResponse.ok) {
             throw new Error(`Python RAG 서버 에러: ${ragResponse.statusText}`);
         }
 
+        // ⏱️ 단계별 처리 시간 로그 (예: embed;dur=12.3, retrieve;dur=80.1, llm_total;dur=900.2, ...)
+        const serverTiming = ragResponse.headers.get('server-timing');
+        if (serverTiming) {
+            console.log('RAG 단계별 처리 시간:', serverTiming);
+        }
+
         // 3. Python 서버의 응답 받기
         const ragData = await ragResponse.json();
         const botReply = ragData.answer;
 
         // 4. React로 최종 응답 전송
-        res.status(200).json({ reply: botReply });
+        res.status(200).json({ reply: botReply, session_id: ragData.session_id });
 
     } catch (error) {
         console.error('챗봇 API 처리 중 오류:', error);
@@ -179,4 +219,78 @@ router.post('/api/chat', async (req, res) => {
     }
 });
 
+// 챗봇 스트리밍 라우터 (Python /ask/stream의 SSE 이벤트를 그대로 전달)
+// event: token → {text}, event: done → {answer, sources}, event: error → {message}
+router.post('/api/chat/stream', async (req, res) => {
+    // 클라이언트가 답변을 다 받기 전에 연결을 끊으면 Python 쪽 요청 / 스트림도 중단
+    // (req의 'close'는 express.json()이 본문을 다 읽으면 바로 발생하므로 응답 기준으로 확인)
+    const upstream = new AbortController();
+    res.on('close', () => {
+        if (!res.writableEnded) {
+            upstream.abort();
+        }
+    });
+
+    try {
+        const { message, history = [], user_profile, session_id, resume_session, location } = req.body;
+
+        console.log('React로부터 받은 메시지(스트리밍):', message);
+
+        const ragApiUrl = CHATBOT_SERVER + '/ask/stream';
+
+        const ragResponse = await fetch(ragApiUrl, {
+            method: 'POST',
+            agent: ragAgent,
+            signal: upstream.signal,
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                message: message,
+                history: history,
+                user_profile: user_profile,
+                session_id: session_id,
+                resume_session: resume_session,
+                location: location
+            }),
+        });
+
+        if (ragResponse.status === 409) {
+            return res.status(409).json(await ragResponse.json());
+        }
+        if (!ragResponse.ok) {
+            throw new Error(`Python RAG 서버 에러: ${ragResponse.statusText}`);
+        }
+
+        // SSE 헤더를 먼저 보내고, Python 스트림을 그대로 파이프
+        res.status(200);
+        res.setHeader('Content-Type', 'text/event-stream; charset=utf-8');
+        res.setHeader('Cache-Control', 'no-cache');
+        res.setHeader('Connection', 'keep-alive');
+        res.setHeader('X-Accel-Buffering', 'no');
+        res.flushHeaders();
+
+        // 중단(abort)하거나 Python 서버가 끊기면 본문 스트림에서 error가 나므로 여기서 응답을 닫음 (pipe는 error를 넘기지 않음)
+        ragResponse.body.on('error', (error) => {
+            if (!upstream.signal.aborted) {
+                console.error('챗봇 스트리밍 중 RAG 서버 연결 오류:', error);
+            }
+            res.end();
+        });
+        ragResponse.body.pipe(res);
+
+    } catch (error) {
+        if (upstream.signal.aborted) {
+            console.log('클라이언트 연결 종료 → RAG 스트리밍 중단');
+            return;
+        }
+        console.error('챗봇 스트리밍 처리 중 오류:', error);
+        if (!res.headersSent) {
+            res.status(500).json({ reply: '서버에서 오류가 발생했습니다.' });
+        } else {
+            res.end();
+        }
+    }
+});
+
 module.exports = router;
\ No newline at end of file
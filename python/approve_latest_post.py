@@ -1,5 +1,7 @@
 import mysql.connector
 import os
+import json
+import urllib.request
 from dotenv import load_dotenv
 
 # 0. 설정 로드
@@ -13,6 +15,23 @@ db_config = {
     'database': os.getenv("DB_NAME") 
 }
 
+# 임베딩 수집기(post_to_pinecone.py)의 승인 알림 주소
+INGEST_SERVER = os.getenv("INGEST_SERVER", f"http://127.0.0.1:{os.getenv('INGEST_PORT', 8002)}")
+
+def notify_ingester(post_id):
+    """수집기에 바로 알려 몇 초 안에 검색되게 합니다. (실패해도 수집기의 주기 확인이 나중에 반영)"""
+    request = urllib.request.Request(
+        INGEST_SERVER + "/ingest",
+        data=json.dumps({"post_ids": [post_id]}).encode("utf-8"),
+        headers={"Content-Type": "application/json", "X-Ingest-Token": os.getenv("INGEST_TOKEN", "")},
+    )
+    try:
+        urllib.request.urlopen(request, timeout=2).close()
+        return True
+    except OSError as e:
+        print(f"⚠️ 수집기 알림 실패 (주기 확인 때 반영됩니다): {e}")
+        return False
+
 def approve_latest_post():
     conn = None
     try:
@@ -49,6 +68,8 @@ def approve_latest_post():
         conn.commit()
 
         print("✅ 승인 완료! 이제 파이썬 자동화 코드가 이 글을 가져갈 수 있습니다.")
+        if notify_ingester(latest_post['post_id']):
+            print("🔔 수집기에 알렸습니다. 몇 초 안에 챗봇 검색에 반영됩니다.")
 
     except mysql.connector.Error as err:
         print(f"⚠️ 에러 발생: {err}")
@@ -0,0 +1,410 @@
+import re
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from local_vector_store import LocalIndex, LocalVectorStore
+
+# -----------------------------------------------
+# 🧪 벤치마크용 로컬 대역 (OpenAI / Pinecone / Gemini / MySQL)
+# - 외부 API 없이 같은 코드 경로를 돌리되, 호출마다 설정한 지연 시간만큼 기다립니다.
+# - 임베딩은 텍스트 해시로 만든 결정적 단위 벡터 (같은 텍스트 → 같은 벡터)
+# - post 테이블은 sqlite 파일로 흉내 내고, 수집기가 쓰는 MySQL 문법만 바꿔서 실행합니다.
+# (benchmark.py가 rag_server / post_to_pinecone을 import하기 전에 바꿔 끼웁니다)
+# -----------------------------------------------
+EMBEDDING_DIMENSION = 1536
+
+
+def fake_vector(text: str, dimension: int = EMBEDDING_DIMENSION) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class CallStats:
+    """대역별 호출 수 / 처리 항목 수 (스레드 안전)"""
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self.items: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, op: str, items: int = 1) -> None:
+        with self._lock:
+            self.calls[op] += 1
+            self.items[op] += items
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {op: {"calls": self.calls[op], "items": self.items[op]} for op in sorted(self.calls)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.items.clear()
+
+
+stats = CallStats()
+
+
+# ---------------------------------------------------------
+# 🧮 OpenAI 임베딩 대역
+# ---------------------------------------------------------
+class FakeEmbeddings(Embeddings):
+    """OpenAIEmbeddings 대역 (RAG 서버 질문 임베딩). 호출당 latency + 텍스트당 item_latency초"""
+
+    def __init__(self, latency: float = 0.0, item_latency: float = 0.0):
+        self.latency = latency
+        self.item_latency = item_latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        stats.record("embed", len(texts))
+        time.sleep(self.latency + self.item_latency * len(texts))
+        return [fake_vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        stats.record("embed", len(texts))
+        await asyncio.sleep(self.latency + self.item_latency * len(texts))
+        return [fake_vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeOpenAIClient:
+    """openai.OpenAI 대역 (수집기의 embeddings.create 호출만 지원)"""
+
+    def __init__(self, latency: float = 0.0, item_latency: float = 0.0, **kwargs):
+        self.embeddings = SimpleNamespace(create=self._create)
+        self.latency = latency
+        self.item_latency = item_latency
+
+    def _create(self, input, model, **kwargs):
+        texts = input if isinstance(input, list) else [input]
+        stats.record("openai_embeddings", len(texts))
+        time.sleep(self.latency + self.item_latency * len(texts))
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=fake_vector(t)) for i, t in enumerate(texts)])
+
+
+# ---------------------------------------------------------
+# 🗂️ Pinecone 대역: 로컬 인덱스 + 호출당 네트워크 지연
+# ---------------------------------------------------------
+class SlowLocalIndex(LocalIndex):
+    """LocalIndex에 요청마다 latency초를 더해 Pinecone 왕복 시간을 흉내 냅니다."""
+
+    latency = 0.0
+
+    def _wait(self, op: str, items: int = 1) -> None:
+        stats.record(f"index_{op}", items)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        self._wait("upsert", len(vectors))
+        return super().upsert(vectors, namespace=namespace, **kwargs)
+
+    def query(self, *args, **kwargs):
+        # 검색 지연은 SlowLocalVectorStore가 넣음 (비동기 검색에서 이벤트 루프를 막지 않도록)
+        stats.record("index_query")
+        return super().query(*args, **kwargs)
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        self._wait("fetch", len(ids))
+        return super().fetch(ids, namespace=namespace, **kwargs)
+
+    def update(self, id, set_metadata=None, namespace=None, **kwargs):
+        self._wait("update")
+        return super().update(id, set_metadata=set_metadata, namespace=namespace, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self._wait("delete", len(kwargs.get("ids") or (args[0] if args else None) or []))
+        return super().delete(*args, **kwargs)
+
+    def list(self, prefix=None, namespace=None, limit=100, **kwargs) -> Iterator[List[str]]:
+        for page in super().list(prefix=prefix, namespace=namespace, limit=limit, **kwargs):
+            self._wait("list", len(page))
+            yield page
+
+    def describe_index_stats(self, **kwargs):
+        self._wait("describe")
+        return super().describe_index_stats(**kwargs)
+
+
+class SlowLocalVectorStore(LocalVectorStore):
+    """검색 1회마다 latency초 (비동기 검색은 asyncio.sleep → PineconeVectorStore처럼 루프를 막지 않음)"""
+
+    latency = 0.0
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        time.sleep(self.latency)
+        return super().similarity_search_by_vector(embedding, k=k, filter=filter, **kwargs)
+
+    async def asimilarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await asyncio.to_thread(LocalVectorStore.similarity_search_by_vector, self, embedding, k=k, filter=filter, **kwargs)
+
+
+class FakePineconeServer:
+    """
+    Pinecone 데이터 API의 검색(POST /query)만 흉내 내는 로컬 HTTP 서버.
+    실제 pinecone 클라이언트 + PineconeVectorStore 경로(연결 / 세션 재사용)를 그대로 타는지 확인할 때 씁니다.
+    (documents: 메타데이터 dict 목록, 검색 결과는 질문 벡터와 상관없이 앞에서부터 top_k개)
+    """
+
+    def __init__(self, documents: List[Dict[str, Any]], latency: float = 0.0):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stats.record("index_query")
+                if fake.latency:
+                    time.sleep(fake.latency)
+                matches = [
+                    {"id": f"doc-{i}", "score": 1.0 - i * 0.01, "metadata": metadata}
+                    for i, metadata in enumerate(fake.documents[: body.get("topK", 4)])
+                ]
+                payload = json.dumps({"matches": matches, "namespace": body.get("namespace", "")}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.documents = documents
+        self.latency = latency
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="fake-pinecone", daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ---------------------------------------------------------
+# 💬 Gemini 대역: 첫 토큰 지연 + 토큰당 지연으로 스트리밍
+# ---------------------------------------------------------
+ANSWER_WORDS = "네, 조건에 맞는 공고를 찾았습니다. 마감일과 신청 방법, 링크를 함께 안내해 드립니다.".split()
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake-chat"
+
+    def _pieces(self) -> List[str]:
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(self.tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        stats.record("llm")
+        time.sleep(self.first_token_latency + self.token_latency * self.tokens)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(self._pieces())))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        stats.record("llm")
+        time.sleep(self.first_token_latency)
+        for i, piece in enumerate(self._pieces()):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        stats.record("llm")
+        await asyncio.sleep(self.first_token_latency)
+        for i, piece in enumerate(self._pieces()):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+# ---------------------------------------------------------
+# 🗄️ MySQL 대역: sqlite 파일 위의 post 테이블
+# ---------------------------------------------------------
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()))
+
+
+def _to_sqlite(query: str) -> str:
+    query = query.replace("%s", "?")
+    query = re.sub(r"\bCURDATE\(\)", "DATE('now', 'localtime')", query)
+    return re.sub(r"\bNOW\(\)", "DATETIME('now', 'localtime')", query)
+
+
+class SqliteCursor:
+    def __init__(self, conn: sqlite3.Connection, dictionary: bool = False, **kwargs):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+        self.rowcount = 0
+
+    def execute(self, query: str, params=()) -> None:
+        self._cursor.execute(_to_sqlite(query), tuple(params))
+        self.rowcount = self._cursor.rowcount
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([d[0] for d in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size: int = 1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    def close(self) -> None:
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """mysql.connector 연결 대역 (수집기가 쓰는 메서드만)"""
+
+    def __init__(self, path: str, **kwargs):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, timeout=30)
+        self._open = True
+
+    def cursor(self, **kwargs) -> SqliteCursor:
+        return SqliteCursor(self._conn, **kwargs)
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def ping(self, **kwargs) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return self._open
+
+    def close(self) -> None:
+        self._conn.close()
+        self._open = False
+
+
+# ---------------------------------------------------------
+# 🏭 합성 데이터 (post 테이블 모양의 채용 공고 + 정책)
+# ---------------------------------------------------------
+REGIONS = ["서울특별시", "부산광역시", "대구광역시", "인천광역시", "광주광역시", "대전광역시", "울산광역시",
+           "세종특별자치시", "경기도", "강원특별자치도", "충청북도", "충청남도", "전라북도", "전라남도",
+           "경상북도", "경상남도", "제주특별자치도", "전국"]
+JOB_CATEGORIES = ["IT/개발", "디자인", "마케팅", "사무/행정", "생산/제조", "물류/운송", "교육", "의료/보건",
+                  "서비스", "영업", "연구/R&D", "건설", "공공/복지"]
+COMPANIES = ["한빛소프트", "누리데이터", "바른물류", "새봄디자인", "다온교육", "가람건설", "하늘바이오",
+             "미래에너지", "온누리푸드", "청솔복지재단", "동해해운", "별빛미디어"]
+AUDIENCES = ["청년", "대학생", "졸업예정자", "신중년", "중장년", "어르신", "청소년", "누구나"]
+TAGS = ["정규직", "계약직", "인턴", "재택", "주4일", "신입", "경력", "청년내일채움", "장애인우대", "보훈"]
+STATUSES = ["published"] * 18 + ["closed", "draft"]
+
+POST_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS post (
+    post_id INTEGER PRIMARY KEY, title TEXT, summary TEXT, content TEXT, status TEXT,
+    job_category TEXT, employment_type TEXT, required_experience TEXT, region TEXT,
+    company_name TEXT, source_url TEXT, apply_method TEXT, apply_link TEXT, contact_info TEXT,
+    tags TEXT, target_audience TEXT, apply_start_date DATE, apply_end_date DATE,
+    latitude REAL, longitude REAL, view_count INTEGER DEFAULT 0,
+    approved TEXT DEFAULT 'Y', del TEXT DEFAULT 'N', is_embedded TEXT DEFAULT 'N',
+    created_at TIMESTAMP, updated_at TIMESTAMP
+)
+"""
+
+
+def synthetic_post(post_id: int, rng: random.Random, long_ratio: float = 0.1) -> Dict[str, Any]:
+    region = rng.choice(REGIONS)
+    category = rng.choice(JOB_CATEGORIES)
+    company = rng.choice(COMPANIES)
+    sentences = rng.randint(40, 160) * 4 if rng.random() < long_ratio else rng.randint(4, 16)
+    content = " ".join(
+        f"{company}에서 {region} 지역 {category} 담당자를 모집합니다. 업무 {i}: 관련 경험이 있으면 우대합니다."
+        for i in range(sentences)
+    )
+    start = date.today() - timedelta(days=rng.randint(0, 60))
+    end = None if rng.random() < 0.1 else date.today() + timedelta(days=rng.randint(-10, 90))
+    return {
+        "post_id": post_id,
+        "title": f"[{company}] {region} {category} 채용 ({post_id})",
+        "summary": f"{company} {category} 분야 {rng.choice(['신입', '경력', '무관'])} 채용",
+        "content": content,
+        "status": rng.choice(STATUSES),
+        "job_category": category,
+        "employment_type": rng.choice(["정규직", "계약직", "인턴"]),
+        "required_experience": rng.choice(["신입", "1년 이상", "3년 이상", "무관"]),
+        "region": region,
+        "company_name": company,
+        "source_url": f"https://jobs.example.com/{post_id}",
+        "apply_method": rng.choice(["온라인 접수", "이메일 접수", "방문 접수"]),
+        "apply_link": f"https://jobs.example.com/{post_id}/apply",
+        "contact_info": "02-000-0000",
+        "tags": ",".join(rng.sample(TAGS, 3)),
+        "target_audience": ",".join(rng.sample(AUDIENCES, rng.randint(1, 2))),
+        "apply_start_date": start.isoformat(),
+        "apply_end_date": end.isoformat() if end else None,
+        "latitude": 33.0 + rng.random() * 5,
+        "longitude": 126.0 + rng.random() * 4,
+        "created_at": f"{start.isoformat()} 09:00:00",
+        "updated_at": f"{start.isoformat()} 09:00:00",
+    }
+
+
+def create_post_table(path: str, rows: int, seed: int = 7, long_ratio: float = 0.1) -> None:
+    """sqlite 파일에 rows개의 승인된 공고를 만듭니다. (post_id 1..rows)"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute(POST_TABLE_SQL)
+    posts = [synthetic_post(i, rng, long_ratio) for i in range(1, rows + 1)]
+    columns = list(posts[0])
+    conn.executemany(
+        f"INSERT OR REPLACE INTO post ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(p[c] for c in columns) for p in posts],
+    )
+    conn.commit()
+    conn.close()
+
+
+def synthetic_policies(count: int, seed: int = 11) -> List[Dict[str, Any]]:
+    """정책 인덱스(policy-chatbot) 모양의 레코드: id / embedding_text / 메타데이터"""
+    rng = random.Random(seed)
+    kinds = ["월세 지원", "취업 장려금", "교통비 지원", "창업 지원금", "자격증 응시료 지원", "직업 훈련", "구직 활동비"]
+    policies = []
+    for i in range(count):
+        region = rng.choice(REGIONS)
+        kind = rng.choice(kinds)
+        audience = rng.choice(AUDIENCES)
+        name = f"{region} {audience} {kind} ({i})"
+        policies.append({
+            "id": f"policy-{i}",
+            "embedding_text": f"{name}: {region}에 거주하는 {audience}에게 {kind}을(를) 제공합니다. 신청은 온라인으로 가능합니다.",
+            "metadata": {"policy_name": name, "target_audience": audience, "region": region},
+        })
+    return policies
@@ -0,0 +1,425 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+# -----------------------------------------------
+# 🏁 오프라인 벤치마크 (OpenAI / Pinecone / Gemini / MySQL 없이)
+# 사용법:
+#   python benchmark.py ask      → RAG 서버(/ask)에 동시 접속 부하 → RPS / 지연 분위수
+#   python benchmark.py stream   → /ask/stream 기준 (첫 토큰까지의 시간 포함)
+#   python benchmark.py ingest   → 합성 공고 BENCH_INGEST_ROWS개로 process_new_postings 처리량
+#   python benchmark.py pinecone → 실제 PineconeVectorStore(로컬 HTTP 대역)로 비동기 검색을 연속 / 동시에 호출
+#   python benchmark.py all      → ingest 후 같은 인덱스로 ask / stream, 그리고 pinecone
+# 외부 API는 bench_fakes.py의 대역으로 바꿔 끼우고, 지연 시간은 아래 BENCH_* 환경 변수로 조절합니다.
+# 결과는 표로 출력하고, BENCH_OUTPUT 경로가 있으면 JSON으로도 저장합니다. (회귀 비교용)
+# -----------------------------------------------
+
+# --- 부하 설정 ---
+CLIENTS = int(os.getenv("BENCH_CLIENTS", 16))              # 동시 접속 클라이언트 수
+REQUESTS = int(os.getenv("BENCH_REQUESTS", 200))           # 전체 요청 수
+REPEAT_RATIO = float(os.getenv("BENCH_REPEAT_RATIO", 0.2)) # 이전과 같은 질문을 다시 보내는 비율 (답변 캐시 적중)
+INGEST_ROWS = int(os.getenv("BENCH_INGEST_ROWS", 10000))   # ingest 벤치마크 공고 수
+CORPUS_ROWS = int(os.getenv("BENCH_CORPUS_ROWS", 2000))    # ask 단독 실행 시 미리 넣어 둘 공고 수
+POLICIES = int(os.getenv("BENCH_POLICIES", 500))           # 정책 인덱스 문서 수
+EDIT_RATIO = float(os.getenv("BENCH_EDIT_RATIO", 0.1))     # ingest 수정 단계에서 바꾸는 공고 비율
+DELETE_RATIO = float(os.getenv("BENCH_DELETE_RATIO", 0.05))
+OUTPUT_PATH = os.getenv("BENCH_OUTPUT")
+VERBOSE = os.getenv("BENCH_VERBOSE", "0") == "1"           # 1이면 서버 요청 로그도 출력
+# ---------------------------------------------
+
+# --- 대역 지연 시간 (초) ---
+EMBED_LATENCY = float(os.getenv("BENCH_EMBED_LATENCY", 0.15))          # 임베딩 API 호출당
+EMBED_ITEM_LATENCY = float(os.getenv("BENCH_EMBED_ITEM_LATENCY", 0.0005)) # 임베딩 텍스트 1개당 추가
+INDEX_LATENCY = float(os.getenv("BENCH_INDEX_LATENCY", 0.03))          # Pinecone 요청 1회당
+LLM_FIRST_TOKEN = float(os.getenv("BENCH_LLM_FIRST_TOKEN", 0.4))       # Gemini 첫 토큰까지
+LLM_TOKEN_LATENCY = float(os.getenv("BENCH_LLM_TOKEN_LATENCY", 0.01))  # 이후 토큰 간격
+LLM_TOKENS = int(os.getenv("BENCH_LLM_TOKENS", 80))                    # 답변 토큰 수
+# ---------------------------------------------
+
+# 저장소 모듈이 import될 때 읽는 설정이므로 가장 먼저 지정합니다. (매번 빈 임시 폴더에서 시작)
+os.environ["RAG_DATA_DIR"] = tempfile.mkdtemp(prefix="rag-bench-")
+os.environ["VECTOR_BACKEND"] = "local"
+for key in ("OPENAI_API_KEY", "PINECONE_API_KEY", "GOOGLE_API_KEY"):
+    os.environ.setdefault(key, "benchmark")
+
+import bench_fakes  # noqa: E402 (RAG_DATA_DIR 지정 후 import)
+
+DB_PATH = os.path.join(os.environ["RAG_DATA_DIR"], "post.sqlite3")
+
+
+def install_fakes() -> None:
+    """rag_server / post_to_pinecone이 import 시점에 만드는 클라이언트를 대역으로 바꿉니다."""
+    import openai
+    import mysql.connector
+    import langchain_openai
+    import langchain_google_genai
+    import local_vector_store
+
+    embeddings = bench_fakes.FakeEmbeddings(EMBED_LATENCY, EMBED_ITEM_LATENCY)
+    llm = bench_fakes.FakeStreamingChatModel(
+        first_token_latency=LLM_FIRST_TOKEN, token_latency=LLM_TOKEN_LATENCY, tokens=LLM_TOKENS
+    )
+    bench_fakes.SlowLocalIndex.latency = INDEX_LATENCY
+    bench_fakes.SlowLocalVectorStore.latency = INDEX_LATENCY
+
+    openai.OpenAI = lambda **kwargs: bench_fakes.FakeOpenAIClient(EMBED_LATENCY, EMBED_ITEM_LATENCY)
+    mysql.connector.connect = lambda **kwargs: bench_fakes.SqliteConnection(DB_PATH)
+    langchain_openai.OpenAIEmbeddings = lambda **kwargs: embeddings
+    langchain_google_genai.ChatGoogleGenerativeAI = lambda **kwargs: llm
+    local_vector_store.LocalIndex = bench_fakes.SlowLocalIndex
+    local_vector_store.LocalVectorStore = bench_fakes.SlowLocalVectorStore
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50 / p95 / p99 (밀리초)"""
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 1)
+    return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+def print_table(title: str, rows: Dict[str, Any]) -> None:
+    print(f"\n📊 {title}")
+    for key, value in rows.items():
+        print(f"   {key:<28} {value}")
+
+
+# ---------------------------------------------------------
+# 🚰 수집기 처리량
+# ---------------------------------------------------------
+def run_ingest(rows: int) -> Dict[str, Any]:
+    """
+    합성 공고 rows개로 수집기의 주요 경로를 단계별로 잽니다.
+    1) initial: 전부 새 공고  2) rescan: 바뀐 것 없음(지문 비교만)
+    3) edits: 본문 수정 / 메타데이터만 수정  4) deletions: 삭제 동기화
+    """
+    bench_fakes.create_post_table(DB_PATH, rows)
+    import post_to_pinecone
+
+    def timed(name: str, fn) -> Dict[str, Any]:
+        bench_fakes.stats.reset()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        return {
+            "phase": name,
+            "seconds": round(elapsed, 2),
+            "posts_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+            "calls": bench_fakes.stats.snapshot(),
+        }
+
+    def edit_posts() -> None:
+        conn = bench_fakes.SqliteConnection(DB_PATH)
+        cursor = conn.cursor()
+        rng = random.Random(3)
+        picked = rng.sample(range(1, rows + 1), int(rows * EDIT_RATIO))
+        half = len(picked) // 2
+        # 절반은 본문 수정(다시 임베딩), 절반은 태그만 수정(메타데이터만 갱신)
+        for post_id in picked[:half]:
+            cursor.execute("UPDATE post SET content = content || ' (수정됨)', is_embedded = 'N' WHERE post_id = %s", (post_id,))
+        for post_id in picked[half:]:
+            cursor.execute("UPDATE post SET tags = tags || ',수정', is_embedded = 'N' WHERE post_id = %s", (post_id,))
+        conn.commit()
+        conn.close()
+        post_to_pinecone.process_new_postings(full_scan=True)
+
+    def delete_posts() -> None:
+        conn = bench_fakes.SqliteConnection(DB_PATH)
+        cursor = conn.cursor()
+        picked = random.Random(5).sample(range(1, rows + 1), int(rows * DELETE_RATIO))
+        cursor.execute(f"UPDATE post SET del = 'Y' WHERE post_id IN ({','.join(['%s'] * len(picked))})", picked)
+        conn.commit()
+        conn.close()
+        post_to_pinecone.sync_deletions()
+
+    phases = [
+        timed("initial", lambda: post_to_pinecone.process_new_postings(full_scan=True)),
+        timed("rescan", lambda: post_to_pinecone.process_new_postings(full_scan=True)),
+        timed("edits", edit_posts),
+        timed("deletions", delete_posts),
+    ]
+    post_to_pinecone.close_db_connection()
+    for phase in phases:
+        calls = ", ".join(f"{op} {c['calls']}회/{c['items']}개" for op, c in phase["calls"].items())
+        print_table(
+            f"ingest · {phase['phase']} ({rows} posts)",
+            {"seconds": phase["seconds"], "posts/s": phase["posts_per_sec"], "calls": calls or "-"},
+        )
+    return {"rows": rows, "phases": phases}
+
+
+def seed_policies(count: int) -> None:
+    """정책 인덱스(policy-chatbot)와 역색인을 합성 정책으로 채웁니다."""
+    from lexical_index import LexicalIndex
+
+    policies = bench_fakes.synthetic_policies(count)
+    index = bench_fakes.SlowLocalIndex("policy-chatbot")
+    vectors = [
+        {"id": p["id"], "values": bench_fakes.fake_vector(p["embedding_text"]),
+         "metadata": {**p["metadata"], "embedding_text": p["embedding_text"]}}
+        for p in policies
+    ]
+    for start in range(0, len(vectors), 500):
+        index.upsert(vectors[start:start + 500])
+    LexicalIndex("policy-chatbot").upsert((p["id"], p["embedding_text"], p["metadata"]) for p in policies)
+
+
+# ---------------------------------------------------------
+# 💬 RAG 서버 부하
+# ---------------------------------------------------------
+def start_server(app):
+    """uvicorn을 별도 스레드에서 띄우고 (서버, 포트)를 돌려줍니다. (실제 HTTP + SSE 경로)"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    # 구성 요소 초기화(lifespan 백그라운드)가 끝난 뒤부터 측정
+    import httpx
+    while True:
+        ready = httpx.get(f"http://127.0.0.1:{port}/readyz")
+        if ready.status_code == 200:
+            break
+        if ready.json().get("status") == "error":
+            raise RuntimeError(f"RAG 서버 초기화 실패: {ready.json().get('error')}")
+        time.sleep(0.1)
+    return server, thread, port
+
+
+def make_requests(count: int, seed: int) -> List[Dict[str, Any]]:
+    """지역 / 분야 / 말투를 섞은 질문 목록 (REPEAT_RATIO만큼은 앞에서 보낸 질문을 그대로 반복)"""
+    rng = random.Random(seed)
+    templates = ["{region} {category} 채용 공고 알려줘", "{region}에서 {category} 일자리 추천해줘",
+                 "내 조건에 맞는 {category} 공고 있어?", "{region} 청년 지원 정책 뭐 있어?", "{category} 신입 뽑는 곳 있나요"]
+    bodies = []
+    for i in range(count):
+        if bodies and rng.random() < REPEAT_RATIO:
+            bodies.append(rng.choice(bodies))
+            continue
+        message = rng.choice(templates).format(
+            region=rng.choice(bench_fakes.REGIONS), category=rng.choice(bench_fakes.JOB_CATEGORIES)
+        )
+        bodies.append({
+            "message": f"{message} ({seed}-{i})",
+            "history": [],
+            "user_profile": {"age": str(rng.randint(19, 70)), "region": rng.choice(bench_fakes.REGIONS)},
+        })
+    return bodies
+
+
+async def drive(port: int, bodies: List[Dict[str, Any]], stream: bool) -> Dict[str, Any]:
+    """CLIENTS개의 클라이언트가 bodies를 나눠 보내며 요청별 지연 시간을 잽니다."""
+    import httpx
+
+    latencies, first_tokens, errors = [], [], 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def client(http: "httpx.AsyncClient") -> None:
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                if stream:
+                    first_token = None
+                    async with http.stream("POST", "/ask/stream", json=body) as response:
+                        async for line in response.aiter_lines():
+                            if first_token is None and line.startswith("event: token"):
+                                first_token = time.perf_counter() - started
+                            if line.startswith("event: error"):
+                                errors += 1
+                    if first_token is not None:
+                        first_tokens.append(first_token)
+                else:
+                    response = await http.post("/ask", json=body)
+                    if response.status_code != 200 or response.json().get("source") is None:
+                        errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=CLIENTS, max_keepalive_connections=CLIENTS)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*[client(http) for _ in range(CLIENTS)])
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": len(bodies),
+        "clients": CLIENTS,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "rps": round(len(bodies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": percentiles(latencies),
+    }
+    if stream:
+        result["first_token_ms"] = percentiles(first_tokens)
+    return result
+
+
+def run_ask(stream_modes: List[bool]) -> List[Dict[str, Any]]:
+    import lexical_index
+
+    # ingest를 먼저 돌리지 않았으면 검색할 공고를 미리 채움
+    if not len(lexical_index.LexicalIndex("job-postings-index")):
+        bench_fakes.create_post_table(DB_PATH, CORPUS_ROWS)
+        import post_to_pinecone
+        post_to_pinecone.process_new_postings(full_scan=True)
+    seed_policies(POLICIES)
+
+    import rag_server
+
+    server, thread, port = start_server(rag_server.app)
+    results = []
+    try:
+        for stream in stream_modes:
+            # 모드마다 다른 질문 (앞 모드의 답변 캐시에 걸리지 않도록)
+            bodies = make_requests(REQUESTS, seed=13 + int(stream))
+            rag_server.stage_timer.histograms.clear()
+            bench_fakes.stats.reset()
+            with redirect_stdout(sys.stdout if VERBOSE else open(os.devnull, "w")):
+                result = asyncio.run(drive(port, bodies, stream))
+            # 서버 쪽 단계별 지연 (metrics.StageTimer)
+            result["stages_ms"] = {
+                stage: {f"p{int(q * 100)}": round(v * 1000, 1) for q, v in histogram.quantiles().items()}
+                for stage, histogram in sorted(rag_server.stage_timer.histograms.items())
+            }
+            # 대역 호출 수 (임베딩 묶음 / 같은 질문 합치기 효과 확인용)
+            result["calls"] = bench_fakes.stats.snapshot()
+            result["endpoint"] = "/ask/stream" if stream else "/ask"
+            results.append(result)
+
+            rows = {k: result[k] for k in ("requests", "clients", "errors", "seconds", "rps", "latency_ms")}
+            if stream:
+                rows["first_token_ms"] = result["first_token_ms"]
+            rows.update({f"stage · {stage}": q for stage, q in result["stages_ms"].items()})
+            rows.update({f"calls · {op}": c for op, c in result["calls"].items()})
+            print_table(f"{result['endpoint']} 부하 결과", rows)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return results
+
+
+# ---------------------------------------------------------
+# 🌲 Pinecone 클라이언트 경로
+# ---------------------------------------------------------
+def run_pinecone_path(queries: int) -> Dict[str, Any]:
+    """
+    ask / stream은 로컬 인덱스 대역만 쓰므로, 실제 pinecone 클라이언트 + PineconeVectorStore를
+    로컬 HTTP 대역(bench_fakes.FakePineconeServer)에 붙여 SharedEmbeddingRetriever.ainvoke를 반복합니다.
+    (첫 검색 뒤 연결 / 세션이 닫히는 식의 문제는 두 번째 요청부터 오류로 드러남)
+    """
+    from pinecone import Pinecone
+    from langchain_pinecone import PineconeVectorStore
+    from rag_cache import LRUTTLCache
+    from retrieval import SharedEmbeddingRetriever
+
+    documents = [
+        {"text": f"[{region}] 청년 지원 정책 {i}", "policy_name": f"정책 {i}", "region": region}
+        for i, region in enumerate(bench_fakes.REGIONS)
+    ]
+    server = bench_fakes.FakePineconeServer(documents, latency=INDEX_LATENCY)
+    client = Pinecone(api_key="benchmark")
+    embeddings = bench_fakes.FakeEmbeddings(EMBED_LATENCY, EMBED_ITEM_LATENCY)
+    retriever = SharedEmbeddingRetriever(
+        embeddings=embeddings,
+        vectorstores=[
+            PineconeVectorStore(index=client.Index(host=server.host), embedding=embeddings, text_key="text")
+            for _ in range(2)
+        ],
+        weights=[0.5, 0.5],
+        embedding_cache=LRUTTLCache(max_size=queries, ttl_seconds=600),
+    )
+    questions = [body["message"] for body in make_requests(queries, seed=29)]
+
+    async def run() -> Dict[str, Any]:
+        latencies, errors = [], []
+
+        async def ask(question: str) -> None:
+            started = time.perf_counter()
+            try:
+                docs = await retriever.ainvoke(question)
+                if not docs:
+                    raise RuntimeError("검색 결과 없음")
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+        # 앞의 3개는 하나씩 (연속 호출), 나머지는 CLIENTS개씩 동시에
+        for question in questions[:3]:
+            await ask(question)
+        limit = asyncio.Semaphore(CLIENTS)
+
+        async def limited(question: str) -> None:
+            async with limit:
+                await ask(question)
+
+        await asyncio.gather(*[limited(question) for question in questions[3:]])
+        return {"latencies": latencies, "errors": errors}
+
+    bench_fakes.stats.reset()
+    started = time.perf_counter()
+    try:
+        outcome = asyncio.run(run())
+    finally:
+        server.close()
+    result = {
+        "queries": len(questions),
+        "errors": len(outcome["errors"]),
+        "first_error": outcome["errors"][0] if outcome["errors"] else None,
+        "seconds": round(time.perf_counter() - started, 2),
+        "latency_ms": percentiles(outcome["latencies"]),
+        "calls": bench_fakes.stats.snapshot(),
+    }
+    print_table("Pinecone 클라이언트 경로 (비동기 검색)", {k: v for k, v in result.items() if v is not None})
+    if outcome["errors"]:
+        print(f"❌ Pinecone 경로 검색 실패 {len(outcome['errors'])}건: {outcome['errors'][0]}")
+    return result
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "all"
+    if mode not in ("ask", "stream", "ingest", "pinecone", "all"):
+        print("사용법: python benchmark.py [ask|stream|ingest|pinecone|all]")
+        sys.exit(1)
+
+    install_fakes()
+    print(f"🏁 벤치마크 시작 ({mode}) · 데이터 폴더: {os.environ['RAG_DATA_DIR']}")
+    report: Dict[str, Any] = {
+        "mode": mode,
+        "latency": {
+            "embed": EMBED_LATENCY, "embed_item": EMBED_ITEM_LATENCY, "index": INDEX_LATENCY,
+            "llm_first_token": LLM_FIRST_TOKEN, "llm_token": LLM_TOKEN_LATENCY, "llm_tokens": LLM_TOKENS,
+        },
+    }
+    if mode in ("ingest", "all"):
+        report["ingest"] = run_ingest(INGEST_ROWS)
+    if mode in ("ask", "stream", "all"):
+        modes = {"ask": [False], "stream": [True], "all": [False, True]}[mode]
+        report["ask"] = run_ask(modes)
+    if mode in ("pinecone", "all"):
+        report["pinecone"] = run_pinecone_path(REQUESTS)
+
+    if OUTPUT_PATH:
+        with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 결과 저장: {OUTPUT_PATH}")
+    if report.get("pinecone", {}).get("errors"):
+        sys.exit(1)
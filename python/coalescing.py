@@ -0,0 +1,182 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+# -----------------------------------------------
+# 🧲 요청 합치기 (트래픽이 몰릴 때 외부 API 호출 수 줄이기)
+# - BatchedEmbeddings: 몇 ms 안에 들어온 질문 임베딩을 한 번의 임베딩 API 호출로 묶음
+# - SingleFlight: 같은 질문(+ 프로필 / 대화 기록)이 이미 처리 중이면 새로 검색·생성하지 않고
+#   먼저 온 요청의 답변 조각을 함께 받음
+# 둘 다 워커 프로세스의 이벤트 루프 안에서만 동작합니다. (동기 호출은 그대로 통과)
+# -----------------------------------------------
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    📦 질문 임베딩 마이크로 배치
+    - aembed_query를 window초 동안 모았다가 aembed_documents 한 번으로 보냅니다.
+    - 같은 묶음 안의 같은 문장은 한 번만 보내고, max_batch개가 모이면 기다리지 않고 바로 보냅니다.
+    """
+
+    def __init__(self, embeddings: Embeddings, window: float = 0.005, max_batch: int = 64):
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.requests = 0 # aembed_query 호출 수
+        self.batches = 0  # 실제 임베딩 API 호출 수
+        self.texts = 0    # API로 보낸 문장 수 (묶음 안 중복 제외)
+
+    # 동기 경로는 묶지 않음 (rag_chain.invoke 등)
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.window <= 0:
+            return await self.embeddings.aembed_query(text)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._start_flush, loop)
+        return await future
+
+    def _start_flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        task = loop.create_task(self._flush(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, pending: Dict[str, List[asyncio.Future]]) -> None:
+        texts = list(pending)
+        self.batches += 1
+        self.texts += len(texts)
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except Exception as e:
+            for waiters in pending.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            for future in pending[text]:
+                if not future.done(): # 기다리던 요청이 취소된 경우 건너뜀
+                    future.set_result(vector)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class SharedAnswer:
+    """
+    진행 중인 답변 하나. 생성 작업이 조각을 publish하면 구독자들이 처음부터 이어 받습니다.
+    (sources / docs는 생성 작업이 검색을 끝낸 뒤 채움)
+    """
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.sources: List[Dict[str, str]] = []
+        self.docs: List[Any] = [] # 프롬프트에 들어간 문서 (sources와 함께 채움, 세션에 기억)
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    async def publish(self, chunk: str) -> None:
+        async with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            async with self._changed:
+                while i >= len(self.chunks) and not self.done:
+                    await self._changed.wait()
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done and i >= len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """
+    🛫 같은 키의 답변 생성은 한 번만
+    - join(key, produce): 처음 온 요청이면 produce(shared)를 백그라운드 작업으로 시작(leader),
+      이미 진행 중이면 그 SharedAnswer를 돌려줌(follower)
+    - 생성 작업은 요청과 따로 돌아가므로 먼저 온 요청이 끊겨도 뒤에 붙은 요청은 답변을 끝까지 받습니다.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[Hashable, SharedAnswer] = {}
+        self._tasks: set = set()
+        self.leaders = 0
+        self.followers = 0
+
+    def join(self, key: Hashable, produce: Callable[[SharedAnswer], Awaitable[None]]) -> Tuple[SharedAnswer, bool]:
+        shared = self._flights.get(key) if self.enabled else None
+        if shared is not None:
+            self.followers += 1
+            return shared, False
+
+        shared = SharedAnswer()
+        if self.enabled:
+            self._flights[key] = shared
+        self.leaders += 1
+        task = asyncio.get_running_loop().create_task(self._run(key, shared, produce))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return shared, True
+
+    async def _run(self, key: Hashable, shared: SharedAnswer, produce: Callable[[SharedAnswer], Awaitable[None]]) -> None:
+        try:
+            await produce(shared)
+        except BaseException as e:
+            await shared.finish(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            await shared.finish()
+        finally:
+            if self._flights.get(key) is shared:
+                del self._flights[key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
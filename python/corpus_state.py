@@ -0,0 +1,69 @@
+import os
+import json
+import time
+
+# -----------------------------------------------
+# 📁 RAG 서버와 공고 수집기(post_to_pinecone.py)가 함께 보는 로컬 데이터 폴더
+# (두 프로세스가 같은 서버에서 돌 때 RAG_DATA_DIR을 같은 경로로 맞춰주세요)
+# -----------------------------------------------
+DATA_DIR = os.getenv("RAG_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+CORPUS_VERSION_FILE = os.path.join(DATA_DIR, "corpus_version")
+
+# 벡터 저장소 백엔드: "pinecone"(기본) 또는 "local"(local_vector_store.py, 네트워크 없이 동작)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.path.join(DATA_DIR, "vector_index")
+
+# 인덱스 별칭: 코드에 적힌 인덱스 이름(예: job-postings-index) → 실제로 검색 / 수집에 쓰는 인덱스
+# reindex.py가 새 인덱스를 다 만든 뒤 이 파일만 바꿔 전환하고, 이전 대상은 되돌리기용으로 남겨 둡니다.
+INDEX_ALIAS_FILE = os.path.join(DATA_DIR, "index_aliases.json")
+
+
+def bump_corpus_version() -> str:
+    """공고가 새로 올라가거나 바뀌었음을 기록합니다. (답변 캐시 무효화 신호)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    version = str(time.time_ns())
+    tmp_path = CORPUS_VERSION_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, CORPUS_VERSION_FILE)
+    return version
+
+
+def read_corpus_version() -> str:
+    """현재 코퍼스 버전 (아직 한 번도 기록되지 않았다면 빈 문자열)"""
+    try:
+        with open(CORPUS_VERSION_FILE) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def read_index_aliases() -> dict:
+    """{별칭: {"target", "previous", "switched_at", ...}} (파일이 없으면 빈 dict)"""
+    try:
+        with open(INDEX_ALIAS_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def resolve_index(name: str) -> str:
+    """별칭이 가리키는 실제 인덱스 이름 (별칭이 없으면 그대로)"""
+    return read_index_aliases().get(name, {}).get("target") or name
+
+
+def set_index_alias(name: str, target: str, **info) -> dict:
+    """
+    별칭을 target으로 바꿉니다. 지금 대상은 previous로 남기고(되돌리기용), 파일은 한 번에 교체합니다.
+    코퍼스 버전도 올려 RAG 서버가 새 인덱스로 바꾸고 답변 캐시를 비우게 합니다.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    aliases = read_index_aliases()
+    entry = {**info, "target": target, "previous": resolve_index(name), "switched_at": time.time()}
+    aliases[name] = entry
+    tmp_path = INDEX_ALIAS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(aliases, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, INDEX_ALIAS_FILE)
+    bump_corpus_version()
+    return entry
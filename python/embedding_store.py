@@ -0,0 +1,295 @@
+import os
+import re
+import sys
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from corpus_state import DATA_DIR
+from fingerprints import text_fingerprint
+
+# -----------------------------------------------
+# 🧊 임베딩 보관소 ((모델, 입력 텍스트 해시) → 벡터)
+# - 한 번 돈을 내고 받은 임베딩은 다시 요청하지 않도록 디스크에 남겨 둡니다.
+#   (다시 임베딩 / reindex.py / 인덱스 재구축 / 서버 재시작 후의 질문 임베딩)
+# - 벡터는 모델별 float16 행렬 파일(vectors.bin)에 append만 하고, 해시 → 행 번호는 옆의 sqlite에 둡니다.
+#   수집기와 RAG 서버가 동시에 써도 행 번호는 sqlite 쓰기 잠금 안에서 정해집니다.
+# - 오래 쓰이지 않은 벡터(바뀌기 전 공고 본문, 예전 질문)는 압축할 때 새 세대 파일로 옮기지 않아 공간을 회수합니다.
+# -----------------------------------------------
+EMBEDDING_STORE_DIR = os.path.join(DATA_DIR, "embeddings")
+RETENTION_DAYS = float(os.getenv("EMBED_STORE_RETENTION_DAYS", 30)) # 이 기간 동안 쓰이지 않은 벡터는 압축 때 버림
+TOUCH_INTERVAL = 24 * 3600 # 마지막 사용 시각은 하루에 한 번만 갱신 (읽을 때마다 쓰지 않도록)
+COMPACT_MIN_DEAD_ROWS = 1000 # 버릴 행이 이보다 많고 남길 행보다 많으면 압축
+COPY_BLOCK_ROWS = 65536
+
+
+def _safe_name(model: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model)
+
+
+class EmbeddingStore:
+    """
+    모델 하나의 임베딩 보관소.
+    - get_many(texts): 보관된 벡터 (없으면 None)
+    - put_many(texts, vectors): 새 벡터 추가 (이미 있는 텍스트는 건너뜀)
+    - embed(texts, embed_fn): 보관소에 없는 텍스트만 embed_fn으로 임베딩하고 저장
+    """
+
+    def __init__(self, model: str, dimension: Optional[int] = None, root: str = EMBEDDING_STORE_DIR):
+        self.model = model
+        self.path = os.path.join(root, _safe_name(model))
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, "index.sqlite3"), check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " key TEXT PRIMARY KEY, row INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('generation', 0), ('rows', 0)")
+        if dimension:
+            self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dimension', ?)", (dimension,))
+        # 차원은 처음 만들 때 정해짐 (dimension 없이 열면 저장된 값을 사용)
+        self.dimension = self._meta().get("dimension") or dimension
+        if not self.dimension or (dimension and dimension != self.dimension):
+            raise ValueError(f"'{model}' 임베딩 보관소의 차원이 다릅니다: {self.dimension} != {dimension}")
+        self.row_bytes = self.dimension * np.dtype(np.float16).itemsize
+        self._mapped = None
+        self._mapped_generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return text_fingerprint(text, self.model)
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors-{generation}.bin")
+
+    def _meta(self) -> Dict[str, int]:
+        return dict(self._conn.execute("SELECT name, value FROM meta"))
+
+    def _matrix(self, generation: int, min_rows: int) -> np.ndarray:
+        """세대 파일의 메모리 매핑 (다른 프로세스가 행을 늘렸으면 다시 매핑)"""
+        if self._mapped_generation != generation or self._mapped is None or self._mapped.shape[0] < min_rows:
+            rows = os.path.getsize(self._vectors_path(generation)) // self.row_bytes
+            self._mapped = np.memmap(self._vectors_path(generation), dtype=np.float16, mode="r", shape=(rows, self.dimension))
+            self._mapped_generation = generation
+        return self._mapped
+
+    # ---------------------------------------------------------
+    # 📖 읽기
+    # ---------------------------------------------------------
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        keys = [self._key(text) for text in texts]
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            # 세대 번호와 행 번호를 한 스냅샷에서 읽음 (그 사이 압축되어도 이전 세대 파일은 남아 있음)
+            self._conn.execute("BEGIN")
+            try:
+                generation = self._meta()["generation"]
+                found: Dict[str, tuple] = {}
+                for start in range(0, len(unique), 500):
+                    chunk = unique[start:start + 500]
+                    found.update(
+                        (key, (row, used_at)) for key, row, used_at in self._conn.execute(
+                            f"SELECT key, row, used_at FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                        )
+                    )
+            finally:
+                self._conn.execute("COMMIT")
+            vectors: Dict[str, List[float]] = {}
+            if found:
+                matrix = self._matrix(generation, max(row for row, _ in found.values()) + 1)
+                vectors = {key: matrix[row].astype(np.float32).tolist() for key, (row, _) in found.items()}
+            stale = [(now, key) for key, (_, used_at) in found.items() if used_at < now - TOUCH_INTERVAL]
+            if stale:
+                self._conn.executemany("UPDATE vectors SET used_at = ? WHERE key = ?", stale)
+
+        results = [vectors.get(key) for key in keys]
+        hits = sum(v is not None for v in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    # ---------------------------------------------------------
+    # ✍️ 쓰기
+    # ---------------------------------------------------------
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> int:
+        entries = dict(zip((self._key(text) for text in texts), vectors))
+        if not entries:
+            return 0
+        now = time.time()
+        with self._lock:
+            # 쓰기 잠금을 먼저 잡고 행 번호를 정함 (다른 프로세스와 같은 행에 쓰지 않도록)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta()
+                keys = list(entries)
+                existing = set()
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    existing.update(
+                        row[0] for row in self._conn.execute(
+                            f"SELECT key FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                        )
+                    )
+                new_keys = [key for key in keys if key not in existing]
+                if new_keys:
+                    block = np.asarray([entries[key] for key in new_keys], dtype=np.float32)
+                    if block.shape[1] != self.dimension:
+                        raise ValueError(f"벡터 차원이 다릅니다: {block.shape[1]} != {self.dimension}")
+                    # 벡터를 먼저 쓰고 색인을 나중에 기록 (색인에 있는 행은 항상 다 쓰인 행)
+                    start_row = meta["rows"]
+                    path = self._vectors_path(meta["generation"])
+                    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                        f.seek(start_row * self.row_bytes)
+                        f.write(block.astype(np.float16).tobytes())
+                    self._conn.executemany(
+                        "INSERT INTO vectors (key, row, used_at) VALUES (?, ?, ?)",
+                        [(key, start_row + i, now) for i, key in enumerate(new_keys)],
+                    )
+                    self._conn.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (start_row + len(new_keys),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(new_keys)
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """보관소에 없는 텍스트만(중복 제외) embed_fn으로 임베딩해 저장하고, 입력 순서대로 돌려줍니다."""
+        vectors = self.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, embed_fn(missing)))
+            self.put_many(missing, [fresh[text] for text in missing])
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    # ---------------------------------------------------------
+    # 🧹 압축
+    # ---------------------------------------------------------
+    def dead_rows(self, retention_days: float = RETENTION_DAYS) -> Dict[str, int]:
+        """(전체 행, 남길 행). 남기지 않는 행은 보존 기간 동안 한 번도 쓰이지 않은 벡터"""
+        with self._lock:
+            rows = self._meta()["rows"]
+            keep = self._conn.execute(
+                "SELECT COUNT(*) FROM vectors WHERE used_at >= ?", (time.time() - retention_days * 86400,)
+            ).fetchone()[0]
+        return {"rows": rows, "keep": keep}
+
+    def maybe_compact(self, retention_days: float = RETENTION_DAYS) -> bool:
+        counts = self.dead_rows(retention_days)
+        dead = counts["rows"] - counts["keep"]
+        if dead > COMPACT_MIN_DEAD_ROWS and dead > counts["keep"]:
+            self.compact(retention_days)
+            return True
+        return False
+
+    def compact(self, retention_days: float = RETENTION_DAYS) -> int:
+        """보존 기간 안에 쓰인 벡터만 새 세대 파일로 옮겨 공간을 회수합니다."""
+        cutoff = time.time() - retention_days * 86400
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta()
+                old_generation, new_generation = meta["generation"], meta["generation"] + 1
+                kept = self._conn.execute(
+                    "SELECT key, row FROM vectors WHERE used_at >= ? ORDER BY row", (cutoff,)
+                ).fetchall()
+                new_path = self._vectors_path(new_generation)
+                with open(new_path, "wb") as f:
+                    if kept:
+                        mapped = self._matrix(old_generation, meta["rows"])
+                        for start in range(0, len(kept), COPY_BLOCK_ROWS):
+                            rows = [row for _, row in kept[start:start + COPY_BLOCK_ROWS]]
+                            f.write(np.ascontiguousarray(mapped[rows]).tobytes())
+                self._conn.execute("DELETE FROM vectors WHERE used_at < ?", (cutoff,))
+                self._conn.executemany(
+                    "UPDATE vectors SET row = ? WHERE key = ?", [(new_row, key) for new_row, (key, _) in enumerate(kept)]
+                )
+                self._conn.execute("UPDATE meta SET value = ? WHERE name = 'generation'", (new_generation,))
+                self._conn.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (len(kept),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._mapped, self._mapped_generation = None, None
+        # 한 세대 전까지는 남겨 두어, 압축 전에 행 번호를 읽은 다른 프로세스가 깨지지 않게 합니다.
+        old_path = self._vectors_path(old_generation - 1)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+        print(f"🧹 임베딩 보관소 압축 완료: {self.model} ({meta['rows']}개 → {len(kept)}개)")
+        return len(kept)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            meta = self._meta()
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        path = self._vectors_path(meta["generation"])
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model,
+            "size": entries,
+            "rows": meta["rows"],
+            "bytes": os.path.getsize(path) if os.path.exists(path) else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class StoredEmbeddings(Embeddings):
+    """
+    임베딩 보관소를 먼저 확인하는 Embeddings 래퍼 (RAG 서버의 질문 임베딩 / 의도 예문 임베딩용)
+    보관소 읽기/쓰기는 sqlite + 파일 I/O이므로 비동기 경로에서는 스레드로 넘깁니다.
+    """
+
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.store.embed(texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.store.embed([text], lambda missing: [self.embeddings.embed_query(missing[0])])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = await asyncio.to_thread(self.store.get_many, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if not missing:
+            return vectors
+        fresh = dict(zip(missing, await self.embeddings.aembed_documents(missing)))
+        await asyncio.to_thread(self.store.put_many, missing, [fresh[text] for text in missing])
+        return [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = (await asyncio.to_thread(self.store.get_many, [text]))[0]
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self.store.put_many, [text], [vector])
+        return vector
+
+
+if __name__ == "__main__":
+    # 사용법: python embedding_store.py [stats | compact] [모델 이름 ...]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    models = sys.argv[2:] or (sorted(os.listdir(EMBEDDING_STORE_DIR)) if os.path.isdir(EMBEDDING_STORE_DIR) else [])
+    for model in models:
+        path = os.path.join(EMBEDDING_STORE_DIR, _safe_name(model))
+        if not os.path.exists(os.path.join(path, "index.sqlite3")):
+            print(f"⚠️ '{model}' 보관소가 없습니다.")
+            continue
+        store = EmbeddingStore(model)
+        if command == "compact":
+            store.compact()
+        print(store.stats())
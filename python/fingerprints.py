@@ -0,0 +1,117 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from corpus_state import DATA_DIR
+
+# -----------------------------------------------
+# 🧾 공고 내용 지문 (변경 감지용)
+# - 임베딩 입력(제목/요약/내용)과 메타데이터를 따로 해시합니다.
+#   · 텍스트 해시가 바뀐 공고만 다시 임베딩
+#   · 메타데이터 해시만 바뀐 공고는 임베딩 없이 메타데이터만 갱신
+#   · 둘 다 같으면 아무것도 하지 않음 (재승인으로 is_embedded가 'N'이 되어도 비용 없음)
+# - 지문은 벡터 메타데이터(text_hash / meta_hash)에도 저장되고,
+#   수집기는 매번 Pinecone에 묻지 않도록 로컬 sqlite에 사본을 둡니다.
+# -----------------------------------------------
+FINGERPRINT_DB = os.path.join(DATA_DIR, "fingerprints.sqlite3")
+
+# 메타데이터 해시에서 빼는 키 (본문은 텍스트 해시가, 지문/청크 번호는 비교 대상이 아님)
+_UNHASHED_KEYS = ("context_text", "text_hash", "meta_hash", "chunk_index")
+
+
+def _digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def text_fingerprint(text: str, model: str) -> str:
+    """임베딩 입력 지문 (모델이 바뀌어도 다시 임베딩해야 하므로 모델 이름 포함)"""
+    return _digest(f"{model}\n{text}")
+
+
+def metadata_fingerprint(metadata: Dict) -> str:
+    """메타데이터 지문 (키 순서와 무관)"""
+    fields = {k: v for k, v in metadata.items() if k not in _UNHASHED_KEYS}
+    return _digest(json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class FingerprintStore:
+    """
+    post_id → (텍스트 해시, 메타데이터 해시, 청크 수).
+    읽기/업로드 스레드가 함께 쓰므로 잠금으로 보호합니다.
+    """
+
+    def __init__(self, path: str = FINGERPRINT_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " id TEXT PRIMARY KEY, text_hash TEXT NOT NULL, meta_hash TEXT NOT NULL,"
+            " chunk_count INTEGER NOT NULL DEFAULT 1)"
+        )
+        # 청크 수 컬럼이 생기기 전에 만든 파일
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(fingerprints)")]
+        if "chunk_count" not in columns:
+            self._conn.execute("ALTER TABLE fingerprints ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 1")
+        self._conn.commit()
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Tuple[str, str, int]]:
+        ids = [str(i) for i in ids]
+        found: Dict[str, Tuple[str, str, int]] = {}
+        with self._lock:
+            # sqlite 변수 개수 제한(999)을 넘지 않도록 나눠서 조회
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id, text_hash, meta_hash, chunk_count FROM fingerprints WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update((row[0], (row[1], row[2], row[3])) for row in rows)
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[str, str, str, int]]) -> None:
+        """(id, 텍스트 해시, 메타데이터 해시, 청크 수) 목록 저장"""
+        entries = [(str(i), t, m, int(n)) for i, t, m, n in entries]
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (id, text_hash, meta_hash, chunk_count) VALUES (?, ?, ?, ?)", entries
+            )
+            self._conn.commit()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        ids = [(str(i),) for i in ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM fingerprints WHERE id = ?", ids)
+            self._conn.commit()
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM fingerprints")]
+
+
+def fingerprints_from_index(
+    index, ids: List[str], model: str, namespace: Optional[str] = None, page_size: int = 100
+) -> Dict[str, Tuple[str, str, int]]:
+    """
+    로컬 사본에 없는 공고의 지문을 벡터 메타데이터에서 읽어옵니다. (ids는 공고의 첫 번째 청크 ID)
+    지문 필드가 생기기 전에 올라간 벡터는 저장된 본문(context_text)으로 텍스트 해시를 계산하고,
+    메타데이터 해시는 비워 둡니다. (→ 임베딩 없이 메타데이터만 갱신되면서 지문이 채워짐)
+    """
+    found = {}
+    # fetch는 id를 URL에 싣기 때문에 한 번에 page_size개씩 나눠서 요청
+    for start in range(0, len(ids), page_size):
+        fetched = index.fetch(ids=ids[start:start + page_size], namespace=namespace)
+        for vec_id, vector in fetched.vectors.items():
+            metadata = vector.metadata or {}
+            if metadata.get("text_hash"):
+                found[vec_id] = (metadata["text_hash"], metadata.get("meta_hash", ""), int(metadata.get("chunk_count", 1)))
+            elif metadata.get("context_text"):
+                found[vec_id] = (text_fingerprint(metadata["context_text"], model), "", 1)
+    return found
@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import math
+import heapq
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from corpus_state import DATA_DIR
+from metadata_filters import NO_DEADLINE_YMD
+
+# -----------------------------------------------
+# 📍 공고 위치 색인 ("내 근처 일자리")
+# - 게시판에 등록할 때 저장한 위도 / 경도(post.latitude / longitude)로 수집기가 로컬 sqlite에 위치 표를 갱신하고,
+#   RAG 서버는 이를 메모리의 격자(grid)로 올려 반경 / 가까운 순 검색을 네트워크 호출 없이 처리합니다.
+# - 격자 칸 하나는 CELL_KM 크기이고, 검색은 원이 걸치는 칸만 확인합니다. (전체를 훑지 않음)
+# - 찾은 공고 ID는 채용 공고 벡터 검색 필터(post_id $in)로 넘겨 기존 검색 한 번에 관련도와 함께 순위를 정합니다.
+# -----------------------------------------------
+GEO_DB = os.path.join(DATA_DIR, "geo.sqlite3")
+
+CELL_KM = float(os.getenv("GEO_CELL_KM", 2.0)) # 격자 칸 크기
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+PAYLOAD_KEYS = ("title", "company_name", "region", "job_category", "apply_link", "source_url", "apply_end_date")
+
+# 위치 기준으로 찾아 달라는 표현
+_NEARBY = re.compile(r"근처|가까운|가까이|주변|인근|근방|내 ?위치|현재 ?위치|여기서|여기 ?주변|반경|도보|걸어서|\d+(\.\d+)? ?(km|킬로)")
+_RADIUS = re.compile(r"(\d+(?:\.\d+)?) ?(km|킬로)")
+
+
+def is_nearby_question(text: str) -> bool:
+    return bool(_NEARBY.search(text or ""))
+
+
+def radius_in_question(text: str) -> Optional[float]:
+    """'3km 이내' → 3.0"""
+    match = _RADIUS.search((text or "").lower())
+    return float(match.group(1)) if match else None
+
+
+def valid_point(lat: Any, lng: Any) -> Optional[Tuple[float, float]]:
+    """숫자로 바꿀 수 있고 범위 안의 좌표면 (위도, 경도), 아니면 None (0, 0은 입력하지 않은 값으로 봄)"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    return lat, lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """
+    (post_id, 위도, 경도, 마감일) 목록의 메모리 격자.
+    칸 번호는 (위도 / 칸 높이, 경도 / 칸 너비)이고, 경도 방향 칸 너비는 위도에 따라 달라지므로
+    검색할 때는 원의 위/아래 끝 중 극에 가까운 쪽 기준으로 넉넉하게 칸 범위를 잡습니다.
+    """
+
+    def __init__(self, points: Iterable[Tuple[Any, float, float, int, Dict]], cell_km: float = CELL_KM):
+        self.cell_lat = cell_km / KM_PER_DEGREE_LAT
+        self.cell_lng = cell_km / KM_PER_DEGREE_LAT # 적도 기준 (칸이 고위도에서 좁아질 뿐 검색 결과는 같음)
+        self.cells: Dict[Tuple[int, int], List[Tuple[Any, float, float, int]]] = defaultdict(list)
+        self.payloads: Dict[Any, Dict] = {}
+        for post_id, lat, lng, end_ymd, payload in points:
+            self.cells[self._cell(lat, lng)].append((post_id, lat, lng, end_ymd))
+            self.payloads[post_id] = payload
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_lat)), int(math.floor(lng / self.cell_lng))
+
+    def within(self, lat: float, lng: float, radius_km: float, today_ymd: int = 0, limit: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """반경 radius_km 안의 (마감 전) 공고를 가까운 순으로 [(post_id, 거리 km)]"""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        edge = min(89.0, abs(lat) + dlat)
+        dlng = min(180.0, radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(edge))))
+        lat_lo, lng_lo = self._cell(lat - dlat, lng - dlng)
+        lat_hi, lng_hi = self._cell(lat + dlat, lng + dlng)
+
+        found = []
+        # 칸 수보다 공고가 적으면 칸을 도는 대신 있는 칸만 확인
+        if (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1) > len(self.cells):
+            keys = [key for key in self.cells if lat_lo <= key[0] <= lat_hi and lng_lo <= key[1] <= lng_hi]
+        else:
+            keys = [(i, j) for i in range(lat_lo, lat_hi + 1) for j in range(lng_lo, lng_hi + 1)]
+        for key in keys:
+            for post_id, plat, plng, end_ymd in self.cells.get(key, ()):
+                if today_ymd and end_ymd < today_ymd:
+                    continue
+                km = haversine_km(lat, lng, plat, plng)
+                if km <= radius_km:
+                    found.append((post_id, km))
+        found.sort(key=lambda item: item[1])
+        return found[:limit] if limit else found
+
+    def _ring(self, ci: int, cj: int, r: int) -> Iterable[Tuple[int, int]]:
+        """중심 칸에서 r칸 떨어진 고리의 칸들"""
+        if r == 0:
+            yield ci, cj
+            return
+        for j in range(cj - r, cj + r + 1):
+            yield ci - r, j
+            yield ci + r, j
+        for i in range(ci - r + 1, ci + r):
+            yield i, cj - r
+            yield i, cj + r
+
+    def nearest(self, lat: float, lng: float, k: int, today_ymd: int = 0, max_km: float = 500.0) -> List[Tuple[Any, float]]:
+        """
+        가까운 (마감 전) 공고 k개 [(post_id, 거리 km)].
+        중심 칸부터 고리 단위로 넓혀 가다가, 다음 고리까지의 최소 거리가 지금 k번째 거리보다 멀면 멈춥니다.
+        (공고가 드문 곳이라 고리의 칸 수가 공고가 있는 칸 수보다 많아지면, 남은 칸은 있는 칸만 한 번에 확인)
+        """
+        ci, cj = self._cell(lat, lng)
+        cell_km = self.cell_lat * KM_PER_DEGREE_LAT
+        best: List[Tuple[float, Any]] = [] # (-거리, post_id) 최대 힙
+
+        def visit(key):
+            for post_id, plat, plng, end_ymd in self.cells.get(key, ()):
+                if today_ymd and end_ymd < today_ymd:
+                    continue
+                km = haversine_km(lat, lng, plat, plng)
+                if km > max_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-km, post_id))
+                elif km < -best[0][0]:
+                    heapq.heapreplace(best, (-km, post_id))
+
+        ring = 0
+        while True:
+            if 8 * ring > len(self.cells):
+                for key in self.cells:
+                    if max(abs(key[0] - ci), abs(key[1] - cj)) >= ring:
+                        visit(key)
+                break
+            for key in self._ring(ci, cj, ring):
+                visit(key)
+            # 다음 고리의 점까지는 적어도 ring칸 (경도 방향 칸은 고위도일수록 좁으므로 고리 끝 위도 기준)
+            edge = min(89.0, abs(lat) + (ring + 1) * self.cell_lat)
+            reach = ring * cell_km * math.cos(math.radians(edge))
+            if (len(best) >= k and reach >= -best[0][0]) or reach > max_km:
+                break
+            ring += 1
+        return sorted(((post_id, -neg_km) for neg_km, post_id in best), key=lambda item: item[1])
+
+
+class GeoStore:
+    """
+    수집기가 쓰는 공고 위치 표 (post_id, 위도, 경도, 마감일, 답변용 메타데이터).
+    바뀔 때마다 revision이 올라가고, RAG 서버는 revision이 바뀌었을 때만 메모리 격자를 다시 만듭니다.
+    """
+
+    def __init__(self, path: str = GEO_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " post_id TEXT PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL,"
+            " apply_end_ymd INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('revision', 0)")
+        self._conn.commit()
+
+    def _bump(self) -> None:
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'revision'")
+
+    def put_jobs(self, posts: Iterable[Tuple[Any, Dict]]) -> None:
+        """(post_id, 공고 메타데이터) 목록 반영 (좌표가 없거나 지워진 공고는 표에서 뺌)"""
+        rows, missing = [], []
+        for post_id, metadata in posts:
+            point = valid_point(metadata.get("latitude"), metadata.get("longitude"))
+            if point is None:
+                missing.append((str(post_id),))
+                continue
+            payload = {k: metadata.get(k) or "" for k in PAYLOAD_KEYS}
+            rows.append((
+                str(post_id), point[0], point[1], int(metadata.get("apply_end_ymd") or NO_DEADLINE_YMD),
+                json.dumps(payload, ensure_ascii=False),
+            ))
+        if not rows and not missing:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (post_id, lat, lng, apply_end_ymd, payload) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.executemany("DELETE FROM jobs WHERE post_id = ?", missing)
+            self._bump()
+            self._conn.commit()
+
+    def remove_jobs(self, post_ids: Iterable[Any]) -> None:
+        ids = [(str(post_id),) for post_id in post_ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM jobs WHERE post_id = ?", ids)
+            self._bump()
+            self._conn.commit()
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT post_id FROM jobs")]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def revision(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()[0]
+
+    def load(self, cell_km: float = CELL_KM) -> Tuple[int, GeoIndex]:
+        """(revision, 메모리 격자). 두 값을 한 스냅샷에서 읽음"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                revision = self._conn.execute("SELECT value FROM meta WHERE name = 'revision'").fetchone()[0]
+                rows = self._conn.execute("SELECT post_id, lat, lng, apply_end_ymd, payload FROM jobs").fetchall()
+            finally:
+                self._conn.commit()
+        # post_id는 벡터 메타데이터와 같은 숫자로 (필터 $in 비교용)
+        points = (
+            (int(post_id) if post_id.isdigit() else post_id, lat, lng, end_ymd, json.loads(payload))
+            for post_id, lat, lng, end_ymd, payload in rows
+        )
+        return revision, GeoIndex(points, cell_km)
+
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, List, Optional
+
+# -----------------------------------------------
+# 🔔 공고 승인 / 수정 알림 받기 (post_to_pinecone.py의 주기 확인 대신)
+# - Node 서버(/setApprove)나 approve_latest_post.py가 POST /ingest {"post_ids": [...]} 로 알려주면
+#   debounce초 동안 더 오는 알림을 모아 한 번에 처리합니다. (첫 알림 후 max_wait초는 넘기지 않음)
+# - HTTP 스레드는 ID를 큐에 넣기만 하고, DB / 임베딩 / 업로드는 수집기 메인 루프 한 곳에서만 합니다.
+# 수집기가 꺼져 있어 알림을 놓쳐도 주기 확인(INGEST_POLL_INTERVAL)이 나중에 반영합니다.
+# -----------------------------------------------
+
+
+class PostNotifications:
+    """
+    📮 알림으로 받은 post_id 모음 (스레드 안전)
+    - add(post_ids): HTTP 스레드에서 호출
+    - wait(timeout): 메인 루프에서 호출. 알림이 오면 조용해질 때까지 조금 더 모아서 돌려주고,
+      timeout초 동안 아무 알림이 없으면 빈 목록 (→ 주기 확인 차례)
+    """
+
+    def __init__(self, debounce: float = 0.3, max_wait: float = 1.5, max_batch: int = 500):
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._pending: set = set()
+        self._first = 0.0 # 지금 모으는 묶음의 첫 알림 시각
+        self._last = 0.0  # 마지막 알림 시각
+        self._changed = threading.Condition()
+        self.received = 0 # 받은 ID 수 (중복 포함)
+        self.batches = 0
+        self.last_batch_at: Optional[float] = None
+
+    def add(self, post_ids: Iterable[int]) -> int:
+        post_ids = {int(post_id) for post_id in post_ids}
+        with self._changed:
+            now = time.monotonic()
+            if not self._pending:
+                self._first = now
+            self._last = now
+            self._pending.update(post_ids)
+            self.received += len(post_ids)
+            self._changed.notify_all()
+            return len(self._pending)
+
+    def wait(self, timeout: float) -> List[int]:
+        with self._changed:
+            deadline = time.monotonic() + timeout
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+            # 알림이 이어지는 동안은 조금 더 모음 (승인 버튼을 연달아 누르는 경우 등)
+            while len(self._pending) < self.max_batch:
+                until = min(self._last + self.debounce, self._first + self.max_wait)
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+
+            batch = sorted(self._pending)[:self.max_batch]
+            self._pending.difference_update(batch)
+            self._first = time.monotonic() # 남은 ID는 다음 묶음으로
+            self.batches += 1
+            self.last_batch_at = time.time()
+            return batch
+
+    def __len__(self) -> int:
+        with self._changed:
+            return len(self._pending)
+
+
+def parse_post_ids(body: dict) -> List[int]:
+    """{"post_ids": [1, 2]} 또는 {"post_id": 1} → [1, 2]. 숫자가 아니면 ValueError"""
+    post_ids = body.get("post_ids")
+    if post_ids is None:
+        post_ids = [body["post_id"]] if body.get("post_id") is not None else []
+    if not isinstance(post_ids, list):
+        raise ValueError("post_ids는 목록이어야 합니다.")
+    return [int(post_id) for post_id in post_ids]
+
+
+def serve_notifications(notifications: PostNotifications, host: str, port: int, token: str = "") -> ThreadingHTTPServer:
+    """
+    알림 HTTP 서버를 백그라운드 스레드로 띄웁니다.
+    - POST /ingest: {"post_ids": [...]} → 202 {"queued": 대기 중인 ID 수}
+    - GET /healthz: 대기 중인 ID 수와 처리한 묶음 수
+    token이 있으면 X-Ingest-Token 헤더가 같아야 받습니다.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/healthz":
+                return self._reply(404, {"error": "not found"})
+            self._reply(200, {
+                "status": "ok",
+                "pending": len(notifications),
+                "received": notifications.received,
+                "batches": notifications.batches,
+                "last_batch_at": notifications.last_batch_at,
+            })
+
+        def do_POST(self):
+            if self.path != "/ingest":
+                return self._reply(404, {"error": "not found"})
+            if token and self.headers.get("X-Ingest-Token") != token:
+                return self._reply(403, {"error": "invalid token"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                post_ids = parse_post_ids(json.loads(self.rfile.read(length) or b"{}"))
+            except (ValueError, TypeError, KeyError) as e:
+                return self._reply(400, {"error": f"잘못된 요청: {e}"})
+            self._reply(202, {"queued": notifications.add(post_ids) if post_ids else len(notifications)})
+
+        def log_message(self, format, *args): # 요청마다 찍히는 기본 접근 로그는 끔
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ingest-notify", daemon=True).start()
+    return server
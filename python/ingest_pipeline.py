@@ -0,0 +1,272 @@
+import time
+import queue
+import random
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+# -----------------------------------------------
+# 🚰 공고 수집 파이프라인
+# DB 읽기 → 임베딩 워커 N개 → Pinecone 업로드 → DB 반영(is_embedded='Y')
+# 단계 사이는 크기가 제한된 큐로 연결되어, 뒤 단계가 밀리면 앞 단계가 자동으로 기다립니다.
+# -----------------------------------------------
+
+_STOP = object()
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """OpenAI(RateLimitError) / Pinecone(status 429) 속도 제한 오류인지 확인"""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    for attr in ("status_code", "status"):
+        if getattr(error, attr, None) == 429:
+            return True
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """응답 헤더의 Retry-After 값 (없으면 None)"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    ⏱️ 토큰 버킷 + 동시성 자동 조절
+    - 초당 rate개의 요청만 통과시키고, 동시에 진행 중인 요청 수도 제한합니다.
+    - 429를 받으면 속도와 동시성을 절반으로 줄이고, 성공이 이어지면 조금씩 다시 올립니다.
+    """
+
+    def __init__(self, rate: float, max_concurrency: int, min_rate: float = 0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                self._refill()
+                if self.in_flight < max(1, int(self.concurrency)) and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.05
+                self._cond.wait(timeout=max(wait, 0.001))
+
+    def release(self, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.concurrency = max(1.0, self.concurrency / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+                self.concurrency = min(float(self.max_concurrency), self.concurrency + 0.2)
+            self._cond.notify_all()
+
+    def call(self, fn: Callable, *args, max_retries: int = 6, **kwargs):
+        """fn을 속도 제한 아래에서 호출하고, 429면 Retry-After/지수 백오프 후 재시도합니다."""
+        for attempt in range(max_retries + 1):
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                self.release(throttled=throttled)
+                if not throttled or attempt == max_retries:
+                    raise
+                delay = retry_after_seconds(e) or min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                print(f"⏳ 속도 제한(429) 감지 → {delay:.1f}초 후 재시도 (현재 {self.rate:.1f} req/s)")
+                time.sleep(delay)
+                continue
+            self.release()
+            return result
+
+
+class StageStats:
+    """단계별 처리량 집계 (처리 행 수 / 실제 작업 시간 / 실패 수)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, rows: int, seconds: float) -> None:
+        with self._lock:
+            self.rows += rows
+            self.busy_seconds += seconds
+
+    def fail(self, rows: int) -> None:
+        with self._lock:
+            self.failures += rows
+
+    def summary(self, wall_seconds: float) -> Dict[str, float]:
+        return {
+            "rows": self.rows,
+            "failures": self.failures,
+            # 전체 실행 시간 기준 처리량
+            "rows_per_sec": round(self.rows / wall_seconds, 1) if wall_seconds else 0.0,
+            # 실제 작업 시간 기준 처리량 (이 단계만의 처리 능력, 워커 1개 기준)
+            "busy_rows_per_sec": round(self.rows / self.busy_seconds, 1) if self.busy_seconds else 0.0,
+            "busy_seconds": round(self.busy_seconds, 2),
+        }
+
+
+class IngestPipeline:
+    """
+    batches(임베딩 요청 단위로 묶인 (벡터 id, text, metadata) 목록)를 받아
+    embed_fn → upsert_fn → ack_fn 순서로 단계별 스레드에서 동시에 처리합니다.
+    - parent_fn: 벡터 id → 공고 id. 한 공고의 청크는 한 번의 업로드에 함께 실리고,
+      DB 반영은 공고 id 단위로 합니다. (batches도 한 공고의 청크를 한 묶음에 넣어야 함)
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        upsert_fn: Callable[[List[dict]], None],
+        ack_fn: Callable[[List[int]], None],
+        embed_workers: int = 4,
+        queue_size: int = 8,
+        upsert_chunk_size: int = 100,
+        parent_fn: Callable[[str], int] = int,
+    ):
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.ack_fn = ack_fn
+        self.embed_workers = embed_workers
+        self.upsert_chunk_size = upsert_chunk_size
+        self.parent_fn = parent_fn
+        self.embed_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.upsert_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.ack_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(name) for name in ("read", "embed", "upsert", "ack")}
+        self._reader_error: Optional[BaseException] = None
+
+    # (1) DB 읽기
+    def _read(self, batches: Iterable[list]) -> None:
+        try:
+            started = time.monotonic()
+            for batch in batches:
+                self.stats["read"].record(len(batch), time.monotonic() - started)
+                self.embed_queue.put(batch)
+                started = time.monotonic()
+        except BaseException as e:
+            self._reader_error = e
+        finally:
+            for _ in range(self.embed_workers):
+                self.embed_queue.put(_STOP)
+
+    # (2) 임베딩 (워커 여러 개)
+    def _embed(self) -> None:
+        while True:
+            batch = self.embed_queue.get()
+            if batch is _STOP:
+                self.upsert_queue.put(_STOP)
+                return
+            started = time.monotonic()
+            try:
+                vectors = self.embed_fn([text for _, text, _ in batch])
+            except Exception as e:
+                print(f"❌ 임베딩 묶음 실패 (ID {batch[0][0]}~{batch[-1][0]}, {len(batch)}개): {e}")
+                self.stats["embed"].fail(len(batch))
+                continue
+            self.stats["embed"].record(len(batch), time.monotonic() - started)
+            self.upsert_queue.put([
+                {"id": str(vec_id), "values": vector, "metadata": metadata}
+                for (vec_id, _, metadata), vector in zip(batch, vectors)
+            ])
+
+    # (3) Pinecone 업로드 (고정 크기 청크)
+    def _upsert(self) -> None:
+        pending: List[dict] = []
+        stopped_workers = 0
+
+        def flush(chunk: List[dict]) -> None:
+            started = time.monotonic()
+            try:
+                self.upsert_fn(chunk)
+            except Exception as e:
+                print(f"❌ 업로드 묶음 실패 ({len(chunk)}개): {e}")
+                self.stats["upsert"].fail(len(chunk))
+                return
+            self.stats["upsert"].record(len(chunk), time.monotonic() - started)
+            self.ack_queue.put(list(dict.fromkeys(self.parent_fn(v["id"]) for v in chunk)))
+
+        while stopped_workers < self.embed_workers:
+            vectors = self.upsert_queue.get()
+            if vectors is _STOP:
+                stopped_workers += 1
+                continue
+            pending.extend(vectors)
+            while len(pending) >= self.upsert_chunk_size:
+                # 한 공고의 청크가 두 번의 업로드로 나뉘지 않도록 경계를 공고 끝까지 늘림
+                cut = self.upsert_chunk_size
+                parent = self.parent_fn(pending[cut - 1]["id"])
+                while cut < len(pending) and self.parent_fn(pending[cut]["id"]) == parent:
+                    cut += 1
+                chunk, pending = pending[:cut], pending[cut:]
+                flush(chunk)
+
+        if pending:
+            flush(pending)
+        self.ack_queue.put(_STOP)
+
+    # (4) DB 반영
+    def _ack(self) -> None:
+        while True:
+            post_ids = self.ack_queue.get()
+            if post_ids is _STOP:
+                return
+            started = time.monotonic()
+            try:
+                self.ack_fn(post_ids)
+            except Exception as e:
+                print(f"❌ DB 반영 실패 ({len(post_ids)}개): {e}")
+                self.stats["ack"].fail(len(post_ids))
+                continue
+            self.stats["ack"].record(len(post_ids), time.monotonic() - started)
+
+    def acknowledge(self, post_ids: List[int]) -> None:
+        """임베딩/업로드가 필요 없는 공고를 바로 DB 반영 단계로 보냅니다. (batches를 만드는 쪽에서 호출)"""
+        if post_ids:
+            self.ack_queue.put(list(post_ids))
+
+    def run(self, batches: Iterable[list]) -> Dict[str, Dict[str, float]]:
+        """파이프라인을 끝까지 실행하고 단계별 처리량을 돌려줍니다."""
+        started = time.monotonic()
+        threads = [threading.Thread(target=self._read, args=(batches,), name="ingest-read")]
+        threads += [threading.Thread(target=self._embed, name=f"ingest-embed-{i}") for i in range(self.embed_workers)]
+        threads += [
+            threading.Thread(target=self._upsert, name="ingest-upsert"),
+            threading.Thread(target=self._ack, name="ingest-ack"),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if self._reader_error is not None:
+            raise self._reader_error
+
+        wall = time.monotonic() - started
+        return {name: stage.summary(wall) for name, stage in self.stats.items()}
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from corpus_state import DATA_DIR
+from metadata_filters import normalize_region
+from rag_cache import normalize_query
+from recommendations import is_generic_recommendation
+
+# -----------------------------------------------
+# 🚦 질문 의도 분류 (검색 / LLM 앞단)
+# - greeting: 인사 / 자기소개 요청 → 정해진 인사말 (검색·LLM 없음)
+# - faq:      서비스 사용법 등 고정 질문 → 정해진 답변 (검색·LLM 없음)
+# - chitchat: 감사 / 맞장구 / 작별 → 검색 없이 LLM만
+# - recommend: 지역 / 나이 말고 다른 조건이 없는 "추천해줘" → 미리 계산된 추천 목록 + LLM (recommendations.py)
+# - info:     정책 / 채용 정보 요청 → 전체 RAG 경로 (판단이 애매하면 항상 여기로)
+# 1) 키워드 규칙으로 먼저 판단하고, 2) 안 되면 질문 임베딩과 의도별 예문 중심 벡터의 코사인 유사도로 판단합니다.
+# 예문 임베딩은 DATA_DIR에 저장해 두고 예문이 바뀌었을 때만 다시 계산합니다.
+# -----------------------------------------------
+INTENT_CACHE_FILE = os.path.join(DATA_DIR, "intent_examples.json")
+
+RULE_MAX_CHARS = 20 # 인사 / 잡담 규칙은 이보다 짧은 질문에만 적용 (긴 문장은 정보 요청일 가능성이 큼)
+FAQ_MAX_CHARS = 30
+
+GREETING_ANSWER = (
+    "안녕하세요! 저는 Jobs입니다. 사용자님의 나이와 사는 곳을 분석해서 딱 맞는 정책과 일자리를 찾아드리는 역할을 합니다."
+)
+
+# 고정 답변 (patterns: 공백을 뺀 질문에 포함되면 바로 적용 / examples: 중심 벡터용 예문)
+FAQS = {
+    "capabilities": {
+        "patterns": ["뭘할수있", "뭐할수있", "무엇을할수있", "뭐해줄수있", "사용법", "어떻게써", "어떻게사용", "도움말", "기능이뭐"],
+        "examples": ["너 뭐 할 수 있어?", "어떻게 사용하는 거야?", "사용법 알려줘", "무슨 기능이 있어?"],
+        "answer": (
+            "저는 지역 청년 정책과 채용 공고를 찾아드려요. '서울 IT 채용 공고 알려줘', '내 조건에 맞는 정책 추천해줘'처럼 "
+            "지역, 분야, 나이를 넣어 물어보시면 마감일과 신청 방법, 링크까지 함께 안내해 드립니다."
+        ),
+    },
+    "profile": {
+        "patterns": ["내정보어떻게", "내나이어떻게", "나이랑지역", "나이와지역", "프로필어떻게", "개인정보"],
+        "examples": ["내 나이랑 지역은 어떻게 알아?", "내 정보는 어디서 가져와?", "개인정보는 어떻게 쓰여?"],
+        "answer": (
+            "로그인하시면 회원 정보에 있는 나이와 거주지를 참고해서 지원 가능한 정책과 공고를 먼저 찾아드려요. "
+            "로그인하지 않으셨다면 질문에 나이와 지역을 함께 적어 주세요."
+        ),
+    },
+    "sources": {
+        "patterns": ["정보어디서", "데이터어디서", "출처가어디", "출처가뭐", "믿을수있"],
+        "examples": ["이 정보 어디서 가져온 거야?", "데이터 출처가 뭐야?", "답변 믿을 수 있어?"],
+        "answer": (
+            "지역 청년 정책 자료와 게시판에 등록되어 승인된 채용 공고를 검색해서 답변해 드려요. "
+            "정확한 자격 요건과 마감일은 안내해 드린 링크에서 꼭 한 번 더 확인해 주세요."
+        ),
+    },
+    "post_job": {
+        "patterns": ["공고어떻게올", "공고올리", "공고등록", "구인글올리", "구인글어떻게"],
+        "examples": ["채용 공고는 어떻게 올려?", "구인글 등록하고 싶어요", "우리 회사 공고 올리는 방법"],
+        "answer": (
+            "게시판의 글쓰기에서 채용 공고를 등록하실 수 있어요. 관리자 승인이 끝나면 챗봇 검색에도 자동으로 반영됩니다."
+        ),
+    },
+}
+
+# 이 단어가 있으면 정보 요청으로 보고 전체 RAG 경로로 보냄
+INFO_KEYWORDS = [
+    "공고", "채용", "일자리", "취업", "구인", "모집", "정책", "지원", "수당", "혜택", "마감", "신청", "자격",
+    "추천", "알려", "찾아", "보여", "어디", "언제", "얼마", "구체적", "자세히", "링크", "급여", "연봉", "근무", "면접",
+    "아르바이트", "알바", "회사", "구해", "뽑", "잡", "job", "hiring",
+]
+
+
+def _only(words: str) -> re.Pattern:
+    """메시지 전체가 words의 말(과 사이의 공백 / 문장부호)로만 이루어졌을 때 맞는 정규식 (fullmatch로 사용)"""
+    return re.compile(rf"(?:(?:{words})[\s!?.,~^]*)+")
+
+
+# 인사 / 잡담은 메시지 전체가 이런 말일 때만 ("아르바이트"의 "바이", "최고 대우 회사"의 "최고", "hiring"의 "hi" 제외)
+_GREETING = _only(
+    r"안녕(?:하세요|하십니까|하신가요|요)?|하이|헬로|hello|hi|hey|ㅎㅇ|반가워(?:요)?|반갑(?:습니다|네요|다)"
+    r"|처음 (?:뵙겠습니다|왔어요|왔습니다)|(?:너는?|넌|당신은?) ?누구(?:야|세요|니|예요|에요)|누구(?:야|세요|니|예요|에요)"
+    r"|(?:너|네) ?이름이 뭐(?:야|예요|에요|니)?|이름이 뭐(?:야|예요|에요|니)?|자기소개(?: ?좀)?(?: ?해 ?줘| ?해 ?주세요)?"
+)
+_CHITCHAT = _only(
+    r"고마워(?:요)?|고맙(?:습니다|네요|다)|감사(?:합니다|해요|드려요)?|땡큐|thank you|thanks?|thx|ㄳ|ㅋ+|ㅎ+"
+    r"|잘 ?가(?:요)?|잘 ?있어(?:요)?|안녕히 ?(?:계세요|가세요)|바이(?:바이)?|bye|수고(?:하세요|했어요?|하셨습니다|많으셨습니다)?"
+    r"|좋아요|좋네(?:요)?|굿+|최고(?:예요|에요|야|네요)?|재밌네(?:요)?|정말|진짜|너무|완전|많이"
+)
+
+INTENT_EXAMPLES = {
+    "greeting": ["안녕하세요", "안녕", "반가워요", "너는 누구야?", "자기소개 해줘", "처음 왔어요"],
+    "chitchat": ["고마워요", "감사합니다", "ㅋㅋㅋ 재밌네", "잘 있어", "수고했어", "좋아요 최고예요"],
+    "info": [
+        "서울 청년 정책 알려줘", "부산 IT 채용 공고 있어?", "내 조건에 맞는 일자리 추천해줘",
+        "청년 월세 지원 신청 방법이 뭐야?", "마감 임박한 공고 보여줘", "그 공고 더 자세히 알려줘",
+    ],
+    **{f"faq:{faq_id}": faq["examples"] for faq_id, faq in FAQS.items()},
+}
+
+
+def _unit(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class IntentRouter:
+    """
+    규칙 → 중심 벡터 순서로 의도를 판단합니다.
+    결과는 {"intent", "method"(rule / centroid / default), "score", "answer"(템플릿 답변 또는 None)} dict.
+    """
+
+    def __init__(self, embeddings: Optional[Embeddings] = None, threshold: float = 0.8, cache_path: str = INTENT_CACHE_FILE):
+        self.threshold = threshold
+        self.cache_path = cache_path
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: Counter = Counter() # (intent, method) → 횟수
+        if embeddings is not None:
+            try:
+                self.load_centroids(embeddings)
+            except Exception as e:
+                print(f"⚠️ 의도 예문 임베딩 실패 → 키워드 규칙만 사용합니다: {e}")
+
+    # ---------------------------------------------------------
+    # 🧮 의도별 중심 벡터 (예문 임베딩 평균)
+    # ---------------------------------------------------------
+    def load_centroids(self, embeddings: Embeddings) -> None:
+        texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+        # 예문이나 임베딩 모델이 바뀌면 저장본을 버리고 다시 계산
+        signature = hashlib.sha1(
+            json.dumps([getattr(embeddings, "model", ""), texts], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+        vectors = None
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("signature") == signature:
+                vectors = saved["vectors"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        if vectors is None:
+            vectors = embeddings.embed_documents(texts)
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature, "vectors": vectors}, f)
+            os.replace(tmp_path, self.cache_path)
+            print(f"🚦 의도 예문 {len(texts)}개 임베딩 완료")
+
+        units = _unit(vectors)
+        centroids, start = [], 0
+        for label, examples in INTENT_EXAMPLES.items():
+            centroids.append(units[start:start + len(examples)].mean(axis=0))
+            start += len(examples)
+        self.labels = list(INTENT_EXAMPLES)
+        self.centroids = _unit(centroids)
+
+    # ---------------------------------------------------------
+    # 🔤 1단계: 키워드 규칙 (임베딩 없이)
+    # ---------------------------------------------------------
+    def classify_rules(self, message: str) -> Optional[Dict[str, Any]]:
+        """규칙으로 판단되면 결과, 애매하면 None (→ classify_vector)"""
+        text = normalize_query(message)
+        compact = text.replace(" ", "")
+        if not text:
+            return self._route("chitchat", "rule")
+
+        if len(text) <= FAQ_MAX_CHARS:
+            for faq_id, faq in FAQS.items():
+                if any(pattern in compact for pattern in faq["patterns"]):
+                    return self._route(f"faq:{faq_id}", "rule")
+
+        if is_generic_recommendation(text):
+            return self._route("recommend", "rule")
+
+        if any(keyword in compact for keyword in INFO_KEYWORDS) or normalize_region(text) or re.search(r"\d", text):
+            return self._route("info", "rule")
+
+        if len(text) <= RULE_MAX_CHARS:
+            if _GREETING.fullmatch(text):
+                return self._route("greeting", "rule")
+            if _CHITCHAT.fullmatch(text):
+                return self._route("chitchat", "rule")
+        return None
+
+    # ---------------------------------------------------------
+    # 🧭 2단계: 가장 가까운 의도 중심 벡터
+    # ---------------------------------------------------------
+    def classify_vector(self, vector: List[float]) -> Dict[str, Any]:
+        if self.centroids is None:
+            return self._route("info", "default")
+        similarities = self.centroids @ _unit(vector)
+        best = int(np.argmax(similarities))
+        score = float(similarities[best])
+        if self.labels[best] == "info" or score < self.threshold:
+            return self._route("info", "centroid" if self.labels[best] == "info" else "default", score)
+        return self._route(self.labels[best], "centroid", score)
+
+    def _route(self, intent: str, method: str, score: Optional[float] = None) -> Dict[str, Any]:
+        if intent == "greeting":
+            answer = GREETING_ANSWER
+        elif intent.startswith("faq:"):
+            answer = FAQS[intent.split(":", 1)[1]]["answer"]
+        else:
+            answer = None
+        return {"intent": intent, "method": method, "score": score, "answer": answer}
+
+    def record(self, route: Dict[str, Any]) -> None:
+        """최종 결정을 /metrics 집계에 반영 (FAQ는 항목별로)"""
+        self.counts[(route["intent"], route["method"])] += 1
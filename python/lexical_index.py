@@ -0,0 +1,270 @@
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from corpus_state import DATA_DIR
+from local_vector_store import matches_filter
+
+# -----------------------------------------------
+# 🔤 로컬 BM25 역색인 (한국어 글자 2-gram)
+# - 회사명 / 지역명 / 태그처럼 정확히 일치해야 하는 검색어를 벡터 검색이 놓치는 경우를 보완합니다.
+# - 수집기가 문서를 추가/삭제하면 로그(jsonl)에 한 줄씩 기록하고, RAG 서버는 새 줄만 읽어 반영합니다.
+# -----------------------------------------------
+LEXICAL_INDEX_DIR = os.path.join(DATA_DIR, "lexical")
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMPACT_MIN_DEAD_ENTRIES = 5000
+MAX_DOC_FREQ_RATIO = 0.5 # 이보다 많은 문서에 나오는 토큰은 (다른 토큰이 있으면) 점수 계산에서 제외
+
+# 제목/회사명/지역/태그는 본문보다 중요하므로 색인할 때 한 번 더 반복해서 가중치를 줍니다.
+BOOSTED_FIELDS = ("title", "policy_name", "company_name", "region", "tags")
+
+_HANGUL = re.compile(r"[가-힣]+")
+_WORD = re.compile(r"[가-힣]+|[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    형태소 분석기 없이 쓰는 한국어 토크나이저.
+    - 한글 덩어리는 글자 2-gram으로 쪼갭니다. ("서울특별시" → 서울, 울특, 특별, 별시)
+      한 글자 덩어리는 그대로 둡니다.
+    - 영문/숫자는 단어 단위로 둡니다.
+    """
+    text = unicodedata.normalize("NFC", text or "").lower()
+    tokens = []
+    for word in _WORD.findall(text):
+        if _HANGUL.fullmatch(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def indexed_text(text: str, metadata: Dict) -> str:
+    """색인에 넣을 텍스트 = 본문 + 가중치 필드"""
+    boosted = []
+    for field in BOOSTED_FIELDS:
+        value = metadata.get(field)
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        if value:
+            boosted.append(str(value))
+    return f"{text}\n{' '.join(boosted)}"
+
+
+class LexicalIndex:
+    """BM25 역색인. add / remove는 로그에 기록되고, search 전에 다른 프로세스의 변경분을 반영합니다."""
+
+    def __init__(self, name: str, root: str = LEXICAL_INDEX_DIR):
+        self.name = name
+        self.path = os.path.join(root, f"{name}.jsonl")
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._inode = None
+        self._reset()
+        self.refresh()
+
+    def _reset(self) -> None:
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict) # 토큰 → {문서 id: 등장 횟수}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.docs: Dict[str, Tuple[str, Dict]] = {} # 문서 id → (본문, 메타데이터)
+        self.total_len = 0
+        self.dead_entries = 0
+        self._offset = 0
+
+    # ---------------------------------------------------------
+    # 📖 로그 재생
+    # ---------------------------------------------------------
+    def refresh(self) -> None:
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            # 압축으로 파일이 교체되었으면 처음부터 다시 읽습니다.
+            if stat.st_ino != self._inode:
+                self._inode = stat.st_ino
+                self._reset()
+            if stat.st_size <= self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            end = data.rfind(b"\n")
+            if end < 0:
+                return
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._offset += end + 1
+
+    def _apply(self, entry: Dict) -> None:
+        doc_id = entry["id"]
+        if doc_id in self.docs:
+            self._unindex(doc_id)
+            self.dead_entries += 1
+        if entry["op"] == "add":
+            self._index(doc_id, entry["text"], entry.get("metadata") or {})
+        else:
+            self.dead_entries += 1
+
+    def _index(self, doc_id: str, text: str, metadata: Dict) -> None:
+        terms = Counter(tokenize(indexed_text(text, metadata)))
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        self.docs[doc_id] = (text, metadata)
+
+    def _unindex(self, doc_id: str) -> None:
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+
+    # ---------------------------------------------------------
+    # ✍️ 변경 기록 (수집기에서 호출)
+    # ---------------------------------------------------------
+    def _append(self, entries: List[Dict]) -> None:
+        with self._lock:
+            self.refresh()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+            self.refresh()
+            if self.dead_entries > COMPACT_MIN_DEAD_ENTRIES and self.dead_entries > len(self.docs):
+                self.compact()
+
+    def upsert(self, docs: Iterable[Tuple[str, str, Dict]]) -> None:
+        """(문서 id, 본문, 메타데이터) 목록을 추가하거나 교체합니다."""
+        entries = [{"op": "add", "id": str(doc_id), "text": text, "metadata": metadata} for doc_id, text, metadata in docs]
+        if entries:
+            self._append(entries)
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            self.refresh()
+            entries = [{"op": "remove", "id": str(i)} for i in doc_ids if str(i) in self.docs]
+        if entries:
+            self._append(entries)
+
+    def compact(self) -> None:
+        """살아있는 문서만 새 로그로 다시 써서 교체합니다."""
+        with self._lock:
+            self.refresh()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for doc_id, (text, metadata) in self.docs.items():
+                    f.write(json.dumps({"op": "add", "id": doc_id, "text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+            self._inode = None
+            self.refresh()
+
+    # ---------------------------------------------------------
+    # 🔍 BM25 검색
+    # ---------------------------------------------------------
+    def search(self, query: str, k: int = 3, filter: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """(문서 id, BM25 점수) 목록을 점수 내림차순으로 돌려줍니다."""
+        with self._lock:
+            self.refresh()
+            n_docs = len(self.docs)
+            if n_docs == 0 or k <= 0:
+                return []
+            avgdl = self.total_len / n_docs
+
+            term_postings = [self.postings[t] for t in set(tokenize(query)) if t in self.postings]
+            # 거의 모든 문서에 나오는 토큰(예: "회사", "채용")은 점수 기여가 미미하므로,
+            # 더 변별력 있는 토큰이 있을 때는 건너뛰어 긴 포스팅 목록 순회를 피합니다.
+            selective = [p for p in term_postings if len(p) <= n_docs * MAX_DOC_FREQ_RATIO]
+            if selective:
+                term_postings = selective
+
+            scores: Dict[str, float] = defaultdict(float)
+            doc_len = self.doc_len
+            len_factor = BM25_K1 * BM25_B / avgdl
+            base_norm = BM25_K1 * (1 - BM25_B)
+            for postings in term_postings:
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                boost = idf * (BM25_K1 + 1)
+                for doc_id, tf in postings.items():
+                    scores[doc_id] += boost * tf / (tf + base_norm + len_factor * doc_len[doc_id])
+
+            if not filter:
+                return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+            results = []
+            for doc_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                if matches_filter(self.docs[doc_id][1], filter):
+                    results.append((doc_id, score))
+                    if len(results) == k:
+                        break
+            return results
+
+    def documents(self, query: str, k: int = 3, filter: Optional[Dict] = None) -> List[Document]:
+        """search 결과를 LangChain Document로 변환 (page_content는 벡터 검색 결과와 같은 본문)"""
+        with self._lock:
+            hits = self.search(query, k=k, filter=filter)
+            return [
+                Document(id=doc_id, page_content=self.docs[doc_id][0], metadata=dict(self.docs[doc_id][1]))
+                for doc_id, _ in hits
+            ]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+def rebuild_from_vector_index(index, name: str, text_key: str, namespace: Optional[str] = None, page_size: int = 100) -> int:
+    """
+    벡터 인덱스(Pinecone 또는 LocalIndex)에 있는 문서로 역색인을 새로 만듭니다.
+    (정책 데이터처럼 수집기를 거치지 않는 인덱스를 처음 색인할 때 사용)
+    """
+    lexical = LexicalIndex(name)
+    stale = set(lexical.docs)
+    total = 0
+    for ids in index.list(namespace=namespace, limit=page_size):
+        fetched = index.fetch(ids=ids, namespace=namespace)
+        docs = []
+        for vec_id, vector in fetched.vectors.items():
+            metadata = dict(vector.metadata or {})
+            text = metadata.pop(text_key, None)
+            if text is not None:
+                docs.append((vec_id, text, metadata))
+                stale.discard(vec_id)
+        lexical.upsert(docs)
+        total += len(docs)
+    lexical.remove(stale)
+    lexical.compact()
+    return total
+
+
+if __name__ == "__main__":
+    # 사용법: python lexical_index.py policy-chatbot:embedding_text job-postings-index:context_text
+    from dotenv import load_dotenv
+    from corpus_state import VECTOR_BACKEND
+    from local_vector_store import LocalIndex
+
+    load_dotenv()
+    for arg in sys.argv[1:]:
+        index_name, text_key = arg.split(":")
+        if VECTOR_BACKEND == "local":
+            source = LocalIndex(index_name)
+        else:
+            from pinecone import Pinecone
+            source = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(index_name)
+        count = rebuild_from_vector_index(source, index_name, text_key)
+        print(f"✅ '{index_name}' 역색인 생성 완료 ({count}개 문서)")
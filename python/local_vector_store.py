@@ -0,0 +1,593 @@
+import os
+import sys
+import asyncio
+import json
+import shutil
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from corpus_state import LOCAL_INDEX_DIR
+
+# -----------------------------------------------
+# 🗂️ 로컬 벡터 인덱스 (Pinecone 대체용)
+# - 네임스페이스마다 정규화된 벡터를 연속된 행렬 파일(vectors.bin)에 append하고,
+#   메타데이터는 옆의 로그 파일(log.jsonl)에 기록합니다.
+# - 검색은 메모리 매핑된 행렬에 대한 행렬곱 한 번으로 top-k 코사인 유사도를 구합니다.
+# - 수집기(쓰기)와 RAG 서버(읽기)가 다른 프로세스여도, 서버는 로그의 새 줄만 읽어 반영합니다.
+# -----------------------------------------------
+DEFAULT_NAMESPACE_DIR = "__default__"
+COMPACT_MIN_DEAD_ROWS = 1000 # 죽은 행이 이보다 많고 살아있는 행보다 많으면 압축
+SEARCH_BLOCK_ROWS = 65536 # float16 저장 시 한 번에 float32로 변환하는 행 수
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def matches_filter(metadata: Dict[str, Any], flt: Optional[Dict[str, Any]]) -> bool:
+    """
+    Pinecone 메타데이터 필터 문법을 그대로 평가합니다.
+    ($eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $exists, $and, $or / 리스트 값은 원소 중 하나만 맞아도 일치)
+    """
+    if not flt:
+        return True
+
+    for key, condition in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        present = key in metadata
+        values = _as_list(metadata.get(key))
+        for op, target in condition.items():
+            if op == "$exists":
+                ok = present == bool(target)
+            elif not present:
+                ok = op in ("$ne", "$nin")
+            elif op == "$eq":
+                ok = target in values
+            elif op == "$ne":
+                ok = target not in values
+            elif op == "$in":
+                ok = any(v in target for v in values)
+            elif op == "$nin":
+                ok = not any(v in target for v in values)
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                try:
+                    ok = any(
+                        (op == "$gt" and v > target) or (op == "$gte" and v >= target)
+                        or (op == "$lt" and v < target) or (op == "$lte" and v <= target)
+                        for v in values
+                    )
+                except TypeError:
+                    ok = False
+            else:
+                raise ValueError(f"지원하지 않는 필터 연산자: {op}")
+            if not ok:
+                return False
+    return True
+
+
+class _NamespaceStore:
+    """네임스페이스 하나의 벡터 행렬 + 메타데이터 로그"""
+
+    def __init__(self, path: str, dimension: int, dtype: str):
+        self.path = path
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.dimension * self.dtype.itemsize
+        self._lock = threading.RLock()
+        self._generation: Optional[int] = None
+        self._reset()
+        self.refresh()
+
+    # ---------------------------------------------------------
+    # 📖 읽기: 로그 재생
+    # ---------------------------------------------------------
+    def _reset(self) -> None:
+        self.ids: List[Optional[str]] = [] # 행 번호 → id (삭제/덮어쓴 행은 None)
+        self.metadata: List[Optional[dict]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.dead_rows = 0
+        self._log_offset = 0
+        self._matrix = None
+        self._matrix_rows = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._alive_dirty = True
+
+    def _read_generation(self) -> int:
+        try:
+            with open(os.path.join(self.path, "CURRENT")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def gen_dir(self) -> str:
+        return os.path.join(self.path, f"gen_{self._generation}")
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.gen_dir, "vectors.bin")
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.gen_dir, "log.jsonl")
+
+    def refresh(self) -> None:
+        """다른 프로세스가 추가한 로그 줄을 반영합니다. (압축으로 세대가 바뀌면 처음부터 다시 읽음)"""
+        with self._lock:
+            generation = self._read_generation()
+            if generation != self._generation:
+                self._generation = generation
+                self._reset()
+
+            try:
+                with open(self.log_path, "rb") as f:
+                    f.seek(self._log_offset)
+                    data = f.read()
+            except FileNotFoundError:
+                return
+
+            end = data.rfind(b"\n")
+            if end < 0:
+                return
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._log_offset += end + 1
+
+    def _apply(self, entry: dict) -> None:
+        op = entry["op"]
+        vec_id = entry["id"]
+        if op == "upsert":
+            self._kill(vec_id)
+            row = entry["row"]
+            while len(self.ids) <= row:
+                self.ids.append(None)
+                self.metadata.append(None)
+            self.ids[row] = vec_id
+            self.metadata[row] = entry.get("metadata") or {}
+            self.id_to_row[vec_id] = row
+        elif op == "delete":
+            self._kill(vec_id)
+        elif op == "update":
+            row = self.id_to_row.get(vec_id)
+            if row is not None:
+                self.metadata[row].update(entry.get("metadata") or {})
+        self._alive_dirty = True
+
+    def _kill(self, vec_id: str) -> None:
+        row = self.id_to_row.pop(vec_id, None)
+        if row is not None:
+            self.ids[row] = None
+            self.metadata[row] = None
+            self.dead_rows += 1
+
+    def matrix(self) -> np.ndarray:
+        """(행 수, 차원) 행렬. float32는 파일을 그대로 메모리 매핑, float16은 float32로 변환해 보관"""
+        rows = len(self.ids)
+        if rows == 0:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        if self._matrix is None or self._matrix_rows != rows:
+            mapped = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dimension))
+            if self.dtype == np.float32:
+                self._matrix = mapped
+            else:
+                # 새로 늘어난 행만 변환해서 이어 붙입니다.
+                done = 0 if self._matrix is None or self._matrix_rows > rows else self._matrix_rows
+                converted = np.empty((rows, self.dimension), dtype=np.float32)
+                if done:
+                    converted[:done] = self._matrix[:done]
+                for start in range(done, rows, SEARCH_BLOCK_ROWS):
+                    stop = min(rows, start + SEARCH_BLOCK_ROWS)
+                    converted[start:stop] = mapped[start:stop]
+                self._matrix = converted
+            self._matrix_rows = rows
+        return self._matrix
+
+    def alive_mask(self) -> np.ndarray:
+        if self._alive_dirty:
+            self._alive = np.fromiter((i is not None for i in self.ids), dtype=bool, count=len(self.ids))
+            self._alive_dirty = False
+        return self._alive
+
+    def live_count(self) -> int:
+        return len(self.id_to_row)
+
+    # ---------------------------------------------------------
+    # ✍️ 쓰기: 행렬 append + 로그 append
+    # ---------------------------------------------------------
+    def _append_log(self, entries: List[dict]) -> None:
+        os.makedirs(self.gen_dir, exist_ok=True)
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(payload)
+
+    def upsert(self, records: List[Tuple[str, List[float], dict]]) -> int:
+        if not records:
+            return 0
+        with self._lock:
+            self.refresh()
+            os.makedirs(self.gen_dir, exist_ok=True)
+
+            block = np.asarray([values for _, values, _ in records], dtype=np.float32)
+            if block.shape[1] != self.dimension:
+                raise ValueError(f"벡터 차원이 다릅니다: {block.shape[1]} != {self.dimension}")
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            block /= np.where(norms == 0, 1.0, norms)
+
+            # 로그에 기록된 마지막 행 바로 뒤에 씁니다. (기록 도중 중단되어 남은 꼬리 행은 덮어씀)
+            start = len(self.ids)
+            mode = "r+b" if os.path.exists(self.vectors_path) else "wb"
+            with open(self.vectors_path, mode) as f:
+                f.seek(start * self.row_bytes)
+                f.write(block.astype(self.dtype).tobytes())
+
+            self._append_log([
+                {"op": "upsert", "id": vec_id, "row": start + i, "metadata": metadata or {}}
+                for i, (vec_id, _, metadata) in enumerate(records)
+            ])
+            self.refresh()
+            self._maybe_compact()
+            return len(records)
+
+    def delete(self, ids: Iterable[str]) -> int:
+        with self._lock:
+            self.refresh()
+            existing = [i for i in ids if i in self.id_to_row]
+            if existing:
+                self._append_log([{"op": "delete", "id": i} for i in existing])
+                self.refresh()
+                self._maybe_compact()
+            return len(existing)
+
+    def update(self, vec_id: str, metadata: dict) -> None:
+        with self._lock:
+            self.refresh()
+            if vec_id in self.id_to_row:
+                self._append_log([{"op": "update", "id": vec_id, "metadata": metadata}])
+                self.refresh()
+
+    def _maybe_compact(self) -> None:
+        if self.dead_rows > COMPACT_MIN_DEAD_ROWS and self.dead_rows > self.live_count():
+            self.compact()
+
+    def compact(self) -> None:
+        """살아있는 행만 새 세대 폴더로 옮겨 공간을 회수합니다."""
+        with self._lock:
+            self.refresh()
+            rows = [row for row, vec_id in enumerate(self.ids) if vec_id is not None]
+            mapped = (
+                np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(len(self.ids), self.dimension))
+                if self.ids else None
+            )
+
+            old_generation = self._generation
+            new_dir = os.path.join(self.path, f"gen_{old_generation + 1}")
+            shutil.rmtree(new_dir, ignore_errors=True)
+            os.makedirs(new_dir)
+            with open(os.path.join(new_dir, "vectors.bin"), "wb") as f:
+                for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+                    f.write(np.ascontiguousarray(mapped[rows[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+            with open(os.path.join(new_dir, "log.jsonl"), "w", encoding="utf-8") as f:
+                for new_row, row in enumerate(rows):
+                    entry = {"op": "upsert", "id": self.ids[row], "row": new_row, "metadata": self.metadata[row]}
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+            tmp_path = os.path.join(self.path, "CURRENT.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(str(old_generation + 1))
+            os.replace(tmp_path, os.path.join(self.path, "CURRENT"))
+
+            # 한 세대 전까지는 남겨 두어, 아직 옛 파일을 읽는 다른 프로세스가 깨지지 않게 합니다.
+            shutil.rmtree(os.path.join(self.path, f"gen_{old_generation - 1}"), ignore_errors=True)
+            self.refresh()
+            print(f"🧹 로컬 인덱스 압축 완료: {self.path} ({len(rows)}개 유지)")
+
+    # ---------------------------------------------------------
+    # 🔍 검색
+    # ---------------------------------------------------------
+    def query(self, vector: List[float], top_k: int, flt: Optional[dict] = None) -> List[Tuple[int, str, float, dict]]:
+        """
+        (행 번호, id, 코사인 유사도, 메타데이터) 목록을 점수 내림차순으로 돌려줍니다.
+        id / 메타데이터는 행렬과 같은 시점의 사본에서 읽습니다. (검색 도중 다른 스레드의 refresh / 압축이 행을 비워도 안전)
+        """
+        with self._lock:
+            self.refresh()
+            matrix = self.matrix()
+            alive = self.alive_mask()
+            ids = list(self.ids)
+            metadata = list(self.metadata)
+
+        if matrix.shape[0] == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = np.asarray(matrix @ query, dtype=np.float32)
+        scores[~alive] = -np.inf
+
+        rows = matrix.shape[0]
+        # 필터가 있으면 넉넉하게 후보를 뽑고, 부족하면 후보를 넓혀 다시 거릅니다.
+        n_candidates = min(rows, top_k if not flt else max(top_k * 4, 32))
+        while True:
+            if n_candidates >= rows:
+                candidates = np.argsort(-scores)
+            else:
+                candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+                candidates = candidates[np.argsort(-scores[candidates])]
+
+            results = []
+            for row in candidates:
+                score = scores[row]
+                if score == -np.inf:
+                    break
+                if flt and not matches_filter(metadata[row], flt):
+                    continue
+                results.append((int(row), ids[row], float(score), metadata[row]))
+                if len(results) == top_k:
+                    return results
+
+            if n_candidates >= rows:
+                return results
+            n_candidates = min(rows, n_candidates * 4)
+
+    def values(self, row: int) -> List[float]:
+        return self.matrix()[row].astype(np.float32).tolist()
+
+
+class LocalIndex:
+    """
+    Pinecone Index와 같은 호출 방식(upsert / query / delete / fetch / update / list /
+    describe_index_stats)을 지원하는 로컬 인덱스.
+    """
+
+    def __init__(self, name: str, dimension: int = 1536, dtype: Optional[str] = None, root: str = LOCAL_INDEX_DIR):
+        self.name = name
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+
+        info_path = os.path.join(self.path, "index.json")
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                info = json.load(f)
+        else:
+            info = {"dimension": dimension, "dtype": dtype or os.getenv("LOCAL_INDEX_DTYPE", "float32")}
+            with open(info_path, "w") as f:
+                json.dump(info, f)
+        self.dimension = info["dimension"]
+        self.dtype = info["dtype"]
+        self._namespaces: Dict[str, _NamespaceStore] = {}
+        self._lock = threading.Lock()
+
+    def _ns(self, namespace: Optional[str]) -> _NamespaceStore:
+        key = namespace or ""
+        with self._lock:
+            store = self._namespaces.get(key)
+            if store is None:
+                store = _NamespaceStore(os.path.join(self.path, key or DEFAULT_NAMESPACE_DIR), self.dimension, self.dtype)
+                self._namespaces[key] = store
+            return store
+
+    def _namespace_names(self) -> List[str]:
+        names = []
+        for entry in sorted(os.listdir(self.path)):
+            if os.path.isdir(os.path.join(self.path, entry)):
+                names.append("" if entry == DEFAULT_NAMESPACE_DIR else entry)
+        return names
+
+    def upsert(self, vectors: List[Any], namespace: Optional[str] = None, **kwargs) -> Dict[str, int]:
+        records = []
+        for v in vectors:
+            if isinstance(v, dict):
+                records.append((str(v["id"]), v["values"], v.get("metadata") or {}))
+            else:
+                vec_id, values, *rest = v
+                records.append((str(vec_id), values, rest[0] if rest else {}))
+        return {"upserted_count": self._ns(namespace).upsert(records)}
+
+    def query(
+        self,
+        vector: Optional[List[float]] = None,
+        top_k: int = 10,
+        namespace: Optional[str] = None,
+        filter: Optional[dict] = None,
+        include_metadata: bool = True,
+        include_values: bool = False,
+        id: Optional[str] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        store = self._ns(namespace)
+        if vector is None:
+            if id is None:
+                raise ValueError("vector 또는 id 중 하나는 필요합니다.")
+            store.refresh()
+            vector = store.values(store.id_to_row[id])
+
+        matches = []
+        for row, vec_id, score, metadata in store.query(vector, top_k, filter):
+            match = {"id": vec_id, "score": score}
+            if include_metadata:
+                match["metadata"] = dict(metadata)
+            if include_values:
+                match["values"] = store.values(row)
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: Optional[str] = None,
+        filter: Optional[dict] = None,
+        **kwargs,
+    ) -> Dict[str, Any]:
+        store = self._ns(namespace)
+        store.refresh()
+        if delete_all:
+            targets = list(store.id_to_row)
+        elif filter:
+            targets = [i for i, row in store.id_to_row.items() if matches_filter(store.metadata[row], filter)]
+        else:
+            targets = [str(i) for i in ids or []]
+        store.delete(targets)
+        return {}
+
+    def update(self, id: str, set_metadata: Optional[dict] = None, namespace: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if set_metadata:
+            self._ns(namespace).update(str(id), set_metadata)
+        return {}
+
+    def fetch(self, ids: List[str], namespace: Optional[str] = None, **kwargs) -> SimpleNamespace:
+        store = self._ns(namespace)
+        store.refresh()
+        vectors = {}
+        for vec_id in ids:
+            row = store.id_to_row.get(str(vec_id))
+            if row is not None:
+                vectors[str(vec_id)] = SimpleNamespace(
+                    id=str(vec_id), values=store.values(row), metadata=dict(store.metadata[row])
+                )
+        return SimpleNamespace(vectors=vectors, namespace=namespace or "")
+
+    def list(self, prefix: Optional[str] = None, namespace: Optional[str] = None, limit: int = 100, **kwargs) -> Iterator[List[str]]:
+        store = self._ns(namespace)
+        store.refresh()
+        ids = sorted(i for i in store.id_to_row if prefix is None or i.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        namespaces = {}
+        for name in self._namespace_names():
+            store = self._ns(name)
+            store.refresh()
+            namespaces[name] = {"vector_count": store.live_count()}
+        return {
+            "dimension": self.dimension,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+            "namespaces": namespaces,
+        }
+
+
+class LocalVectorStore(VectorStore):
+    """LocalIndex를 LangChain VectorStore로 감싼 것 (PineconeVectorStore와 같은 text_key 규칙)"""
+
+    def __init__(self, index: LocalIndex, embedding: Embeddings, text_key: str = "text", namespace: Optional[str] = None):
+        self._index = index
+        self._embedding = embedding
+        self._text_key = text_key
+        self._namespace = namespace
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(i) for i in range(len(texts))]
+        vectors = self._embedding.embed_documents(texts)
+        self._index.upsert(
+            [
+                {"id": vec_id, "values": vector, "metadata": {**metadata, self._text_key: text}}
+                for vec_id, vector, metadata, text in zip(ids, vectors, metadatas, texts)
+            ],
+            namespace=kwargs.get("namespace", self._namespace),
+        )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> None:
+        self._index.delete(ids=ids, namespace=kwargs.get("namespace", self._namespace), **kwargs)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], *, k: int = 4, filter: Optional[dict] = None, namespace: Optional[str] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        results = self._index.query(
+            vector=embedding, top_k=k, filter=filter, namespace=namespace or self._namespace, include_metadata=True
+        )
+        docs = []
+        for match in results["matches"]:
+            metadata = match["metadata"]
+            if self._text_key not in metadata:
+                continue
+            text = metadata.pop(self._text_key)
+            docs.append((Document(id=match["id"], page_content=text, metadata=metadata), match["score"]))
+        return docs
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs)]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        # 로그 재생(refresh)과 전체 행렬 계산이 이벤트 루프를 막지 않도록 스레드에서 실행합니다. (numpy 계산 중에는 GIL도 풀림)
+        return await asyncio.to_thread(self.similarity_search_by_vector, embedding, k=k, filter=filter, **kwargs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        vector = await self._embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(vector, k=k, filter=filter, **kwargs)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        index_name: str = "local-index",
+        text_key: str = "text",
+        **kwargs,
+    ) -> "LocalVectorStore":
+        store = cls(LocalIndex(index_name), embedding, text_key=text_key)
+        store.add_texts(texts, metadatas=metadatas, **kwargs)
+        return store
+
+
+def copy_from_pinecone(index_name: str, namespace: Optional[str] = None, page_size: int = 100) -> int:
+    """Pinecone 인덱스 내용을 그대로 로컬 인덱스로 복사합니다. (오프라인 실행/벤치마크용)"""
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    remote = pc.Index(index_name)
+    dimension = remote.describe_index_stats()["dimension"]
+    local = LocalIndex(index_name, dimension=dimension)
+
+    copied = 0
+    for ids in remote.list(namespace=namespace, limit=page_size):
+        fetched = remote.fetch(ids=ids, namespace=namespace)
+        local.upsert(
+            [{"id": v.id, "values": v.values, "metadata": v.metadata or {}} for v in fetched.vectors.values()],
+            namespace=namespace,
+        )
+        copied += len(ids)
+        print(f"📥 {index_name}: {copied}개 복사됨")
+    return copied
+
+
+if __name__ == "__main__":
+    # 사용법: python local_vector_store.py policy-chatbot job-postings-index
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    for name in sys.argv[1:]:
+        total = copy_from_pinecone(name)
+        print(f"✅ '{name}' → 로컬 인덱스 복사 완료 ({total}개)")
@@ -0,0 +1,113 @@
+import re
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+# -----------------------------------------------
+# 🧭 검색 메타데이터 필터
+# - 수집기는 공고 메타데이터에 정규화된 필드(region_key / audience_keys / apply_end_ymd)를 함께 저장하고,
+# - RAG 서버는 사용자 프로필과 오늘 날짜로 같은 필드에 대한 Pinecone 필터를 만듭니다.
+# (정규화 규칙을 양쪽이 공유해야 하므로 이 파일 한 곳에 둡니다)
+# -----------------------------------------------
+
+# 지역 별칭 → 표준 이름 (긴 별칭부터 확인)
+REGION_ALIASES = {
+    "서울특별시": "서울", "서울시": "서울", "서울": "서울",
+    "부산광역시": "부산", "부산": "부산",
+    "대구광역시": "대구", "대구": "대구",
+    "인천광역시": "인천", "인천": "인천",
+    "광주광역시": "광주", "광주": "광주",
+    "대전광역시": "대전", "대전": "대전",
+    "울산광역시": "울산", "울산": "울산",
+    "세종특별자치시": "세종", "세종": "세종",
+    "경기도": "경기", "경기": "경기",
+    "강원특별자치도": "강원", "강원도": "강원", "강원": "강원",
+    "충청북도": "충북", "충북": "충북",
+    "충청남도": "충남", "충남": "충남",
+    "전북특별자치도": "전북", "전라북도": "전북", "전북": "전북",
+    "전라남도": "전남", "전남": "전남",
+    "경상북도": "경북", "경북": "경북",
+    "경상남도": "경남", "경남": "경남",
+    "제주특별자치도": "제주", "제주도": "제주", "제주": "제주",
+    "전국": "전국",
+}
+_REGION_PATTERN = re.compile("|".join(sorted(map(re.escape, REGION_ALIASES), key=len, reverse=True)))
+
+# 공고의 대상(target_audience) 표현 → 연령대 구분
+AUDIENCE_KEYWORDS = {
+    "청년": "청년", "대학생": "청년", "졸업": "청년", "사회초년": "청년",
+    "청소년": "청소년",
+    "신중년": "중장년", "중장년": "중장년", "장년": "중장년",
+    "노인": "노인", "어르신": "노인", "고령": "노인", "시니어": "노인",
+}
+ALL_AUDIENCE = "전체" # 연령 제한이 없는 공고
+NO_DEADLINE_YMD = 99991231 # 마감일이 없는 공고
+CLOSED_STATUSES = ["closed", "draft", "마감"] # 검색에서 제외할 공고 상태
+
+
+def normalize_region(text: Any) -> str:
+    """'서울특별시 강남구' → '서울'. 알 수 없으면 빈 문자열"""
+    match = _REGION_PATTERN.search(str(text or ""))
+    return REGION_ALIASES[match.group(0)] if match else ""
+
+
+def audience_keys(target_audience: List[str]) -> List[str]:
+    """공고 대상 목록을 연령대 구분으로 변환 (해당 없음 → ['전체'])"""
+    keys = []
+    for audience in target_audience:
+        for keyword, key in AUDIENCE_KEYWORDS.items():
+            if keyword in audience and key not in keys:
+                keys.append(key)
+    return keys or [ALL_AUDIENCE]
+
+
+def audiences_for_age(age: Any) -> List[str]:
+    """
+    사용자 나이 → 지원 가능한 연령대 구분 ('25세', 25 모두 허용)
+    청년 정책 대부분이 만 39세까지를 청년으로 보므로 35~39세는 청년과 중장년 둘 다
+    """
+    match = re.search(r"\d+", str(age or ""))
+    if not match:
+        return []
+    years = int(match.group(0))
+    if years < 19:
+        return ["청소년"]
+    if years <= 34:
+        return ["청년"]
+    if years <= 39:
+        return ["청년", "중장년"]
+    if years < 65:
+        return ["중장년"]
+    return ["노인"]
+
+
+def date_ymd(value: Optional[date]) -> int:
+    """날짜 → 20250131 같은 정수 (Pinecone 범위 필터는 숫자만 비교 가능)"""
+    return int(value.strftime("%Y%m%d")) if value else NO_DEADLINE_YMD
+
+
+def _or_missing(field: str, condition: Dict[str, Any]) -> Dict[str, Any]:
+    """필드가 없는 예전 벡터는 통과시키는 조건"""
+    return {"$or": [{field: condition}, {field: {"$exists": False}}]}
+
+
+def build_job_filter(user_profile: Dict[str, Any], question: str, today: date) -> Dict[str, Any]:
+    """
+    채용 공고 인덱스용 필터
+    - 마감일이 지난 공고, 닫힌 상태의 공고 제외
+    - 질문에 지역이 있으면 그 지역, 없으면 프로필 거주지 (+ 전국 공고)
+    - 나이를 알면 해당 연령대 또는 연령 제한이 없는 공고
+    """
+    clauses = [
+        _or_missing("apply_end_ymd", {"$gte": date_ymd(today)}),
+        {"status": {"$nin": CLOSED_STATUSES}},
+    ]
+
+    region = normalize_region(question) or normalize_region((user_profile or {}).get("region"))
+    if region and region != "전국":
+        clauses.append(_or_missing("region_key", {"$in": [region, "전국", ""]}))
+
+    audiences = audiences_for_age((user_profile or {}).get("age"))
+    if audiences:
+        clauses.append(_or_missing("audience_keys", {"$in": audiences + [ALL_AUDIENCE]}))
+
+    return {"$and": clauses}
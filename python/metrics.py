@@ -0,0 +1,169 @@
+import time
+import bisect
+import threading
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# -----------------------------------------------
+# 📊 단계별 지연 시간 측정 + Prometheus 텍스트 형식 내보내기
+# - span("embed") 처럼 감싼 구간의 시간을 단계별 히스토그램에 쌓습니다.
+# - 최근 RECENT_WINDOW개 측정값으로 p50/p95/p99도 계산합니다. (프로세스별 값)
+# - 요청마다 start_request()를 부르면 그 요청의 단계별 시간 합계도 따로 모읍니다. (응답 헤더용)
+# 외부 라이브러리(prometheus_client) 없이 /metrics 응답 문자열을 직접 만듭니다.
+# -----------------------------------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+RECENT_WINDOW = 1024
+
+_current_breakdown: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "rag_stage_breakdown", default=None
+)
+
+
+class Histogram:
+    """누적 버킷 히스토그램 + 최근 측정값 창(분위수 계산용)"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1) # 마지막 칸은 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque = deque(maxlen=RECENT_WINDOW)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        with self._lock:
+            values = sorted(self.recent)
+        if not values:
+            return {q: 0.0 for q in qs}
+        return {q: values[min(int(q * len(values)), len(values) - 1)] for q in qs}
+
+    def snapshot(self) -> Tuple[List[Tuple[str, int]], int, float]:
+        """(누적 버킷 [(le, 개수)], 전체 개수, 합계)"""
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, n in zip(self.buckets, self.counts):
+                running += n
+                cumulative.append((repr(bound), running))
+            cumulative.append(("+Inf", self.count))
+            return cumulative, self.count, self.sum
+
+
+class StageTimer:
+    """
+    ⏱️ 단계별 시간 측정기
+    - span(stage) / aspan(stage): 구간 시간을 히스토그램에 기록
+    - observe(stage, seconds): 이미 잰 시간을 기록 (예: LLM 첫 토큰까지 걸린 시간)
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> Histogram:
+        with self._lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram(self.buckets)
+            return self.histograms[stage]
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.histogram(stage).observe(seconds)
+        breakdown = _current_breakdown.get()
+        if breakdown is not None:
+            breakdown[stage] = breakdown.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def aspan(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @staticmethod
+    def start_request() -> Dict[str, float]:
+        """현재 요청(컨텍스트)의 단계별 시간을 모을 dict를 만듭니다. (asyncio 작업/스레드로 전파됨)"""
+        breakdown: Dict[str, float] = {}
+        _current_breakdown.set(breakdown)
+        return breakdown
+
+
+def server_timing_header(breakdown: Dict[str, float]) -> str:
+    """단계별 시간 → Server-Timing 헤더 값 (예: 'embed;dur=12.3, llm_total;dur=840.1', 밀리초)"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in breakdown.items())
+
+
+# ---------------------------------------------------------
+# 📤 Prometheus 텍스트 형식
+# ---------------------------------------------------------
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render_stage_metrics(timer: StageTimer, name: str = "rag_stage_duration_seconds") -> List[str]:
+    lines = [
+        f"# HELP {name} Latency of each RAG request stage.",
+        f"# TYPE {name} histogram",
+    ]
+    quantile_lines = [
+        f"# HELP {name}_recent Recent latency quantiles of each stage (last {RECENT_WINDOW} samples, this process).",
+        f"# TYPE {name}_recent gauge",
+    ]
+    for stage, histogram in sorted(timer.histograms.items()):
+        cumulative, count, total = histogram.snapshot()
+        for le, n in cumulative:
+            lines.append(f"{name}_bucket{_labels({'stage': stage, 'le': le})} {n}")
+        lines.append(f"{name}_sum{_labels({'stage': stage})} {total}")
+        lines.append(f"{name}_count{_labels({'stage': stage})} {count}")
+        for q, value in histogram.quantiles().items():
+            quantile_lines.append(f"{name}_recent{_labels({'stage': stage, 'quantile': q})} {value}")
+    return lines + quantile_lines
+
+
+def render_gauges(name: str, help_text: str, samples: List[Tuple[Dict[str, str], float]], kind: str = "gauge") -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_labels(labels)} {value}" for labels, value in samples]
+    return lines
+
+
+def render_cache_metrics(caches: Dict[str, Callable[[], Dict]]) -> List[str]:
+    """cache.stats() 형식(hits / misses / hit_rate / size)의 캐시들을 내보냅니다."""
+    stats = {name: fn() for name, fn in caches.items()}
+    lines = []
+    lines += render_gauges(
+        "rag_cache_hits_total", "Cache hits.", [({"cache": n}, s["hits"]) for n, s in stats.items()], "counter"
+    )
+    lines += render_gauges(
+        "rag_cache_misses_total", "Cache misses.", [({"cache": n}, s["misses"]) for n, s in stats.items()], "counter"
+    )
+    lines += render_gauges(
+        "rag_cache_hit_ratio", "Cache hit ratio since start.", [({"cache": n}, s["hit_rate"]) for n, s in stats.items()]
+    )
+    lines += render_gauges(
+        "rag_cache_entries", "Entries currently cached.", [({"cache": n}, s["size"]) for n, s in stats.items()]
+    )
+    return lines
@@ -2,9 +2,22 @@ import mysql.connector
 from openai import OpenAI
 from pinecone import Pinecone, ServerlessSpec
 import os
+import re
+import json
 from dotenv import load_dotenv
 import time
 from datetime import datetime
+from corpus_state import DATA_DIR, VECTOR_BACKEND, bump_corpus_version, resolve_index
+from local_vector_store import LocalIndex
+from lexical_index import LexicalIndex
+from metadata_filters import audience_keys, date_ymd, normalize_region
+from token_utils import count_tokens, split_tokens, truncate_tokens
+from ingest_pipeline import AdaptiveRateLimiter, IngestPipeline
+from fingerprints import FINGERPRINT_DB, FingerprintStore, fingerprints_from_index, metadata_fingerprint, text_fingerprint
+from recommendations import RecommendationStore, backfill_jobs, sync_policies
+from ingest_notify import PostNotifications, serve_notifications
+from embedding_store import EmbeddingStore
+from geo_index import GeoStore, valid_point
 
 # -----------------------------------------------
 # 0. 설정 로드
@@ -20,6 +33,7 @@ EMBEDDING_DIMENSION = 1536
 # Pinecone 설정
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = "job-postings-index"
+POLICY_INDEX_NAME = "policy-chatbot" # 추천 목록 계산용 (정책 역색인만 읽음)
 
 # DB 설정 (AWS RDS)
 db_config = {
@@ -35,131 +49,870 @@ print(f"👀 현재 파이썬이 접속하려는 주소: {db_config['host']}")
 print(f"--------------------------------------------------")
 
 TABLE_NAME = "post"
-BATCH_SIZE = 100 
-CHECK_INTERVAL = 30 # 30초마다 확인
+BATCH_SIZE = 100 # 임베딩 API 1회 호출당 최대 청크 수
+EMBED_BATCH_MAX_TOKENS = 100_000 # 임베딩 API 1회 호출당 최대 토큰 합계
+EMBED_MAX_INPUT_TOKENS = 8_000 # 청크 1개 임베딩 입력 상한 (모델 한도 8191)
+
+# 긴 공고는 토큰 단위로 겹치게 잘라 청크마다 따로 임베딩합니다.
+# (프롬프트에는 질문과 가장 가까운 청크만 들어가므로 공고 길이와 상관없이 크기가 일정)
+CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", 400)) # 청크 1개 크기 (제목/요약 머리말 포함)
+CHUNK_OVERLAP_TOKENS = int(os.getenv("INGEST_CHUNK_OVERLAP_TOKENS", 60)) # 이웃한 청크끼리 겹치는 토큰 수
+MAX_CHUNKS_PER_POST = 20 # 공고 1개당 최대 청크 수 (그 뒤는 버림)
+# 여러 청크로 나뉜 공고의 텍스트 지문에 들어가는 값 (청크 설정이 바뀌면 다시 임베딩)
+CHUNKED_EMBEDDING_VERSION = f"{EMBEDDING_MODEL}/chunk-{CHUNK_TOKENS}-{CHUNK_OVERLAP_TOKENS}"
+UPSERT_CHUNK_SIZE = 100 # Pinecone upsert 1회당 벡터 수
+CHECK_INTERVAL = 30 # 30초마다 확인 (알림 서버를 끈 경우)
+
+# 승인 / 수정 알림 (ingest_notify.py)
+# 알림을 받으면 그 공고만 바로 반영하고, 주기 확인은 놓친 알림을 잡는 느린 안전망으로만 돌립니다.
+INGEST_HOST = os.getenv("INGEST_HOST", "127.0.0.1")
+INGEST_PORT = int(os.getenv("INGEST_PORT", 8002)) # 0이면 알림 서버 없이 CHECK_INTERVAL마다 확인 (예전 방식)
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "") # 지정하면 X-Ingest-Token 헤더가 같은 알림만 받음
+INGEST_DEBOUNCE_MS = int(os.getenv("INGEST_DEBOUNCE_MS", 300)) # 마지막 알림 후 이만큼 조용하면 처리 시작
+INGEST_MAX_WAIT_MS = int(os.getenv("INGEST_MAX_WAIT_MS", 1500)) # 알림이 계속 와도 첫 알림 후 이 시간 안에는 처리
+INGEST_POLL_INTERVAL = int(os.getenv("INGEST_POLL_INTERVAL", 300)) # 알림 서버가 있을 때의 주기 확인 간격(초)
+
+# 증분 동기화 설정
+# - incremental: 저장된 워터마크 이후의 변경분만 키셋 페이지네이션으로 조회
+# - full: 매 주기 승인된 공고 전체를 조회해 내용 지문으로 변경분만 반영
+SYNC_MODE = os.getenv("SYNC_MODE", "incremental")
+# 워터마크 컬럼: 기본은 post_id. 수정 시각 컬럼(ON UPDATE CURRENT_TIMESTAMP, 예: updated_at)이 있으면
+# 그 컬럼을 지정해야 예전 글의 뒤늦은 승인/수정도 다음 주기에 바로 잡힙니다.
+# (post_id 모드에서는 그런 행을 FULL_SCAN_INTERVAL마다 도는 전체 확인이 처리)
+# 수정 여부는 is_embedded가 아니라 내용 지문(fingerprints.py)으로 판단하므로,
+# 이미 임베딩된 글이 수정되어도 다시 반영되고, 내용이 그대로인 재승인 글은 다시 임베딩하지 않습니다.
+SYNC_WATERMARK_COLUMN = os.getenv("SYNC_WATERMARK_COLUMN", "post_id")
+SYNC_PAGE_SIZE = 500 # 한 번에 읽어오는 최대 행 수
+# 안전망은 주기 횟수가 아니라 초 단위로 잡습니다. (알림을 켜면 주기가 CHECK_INTERVAL → INGEST_POLL_INTERVAL로
+# 길어지는데 횟수로 세면 전체 확인 / 대조도 그만큼 드물어짐) 주기 확인 때 시간이 지났으면 함께 돌리므로
+# 실제 간격은 주기 확인 간격 단위로 올림됩니다. (기본값 + 알림 사용: 두 번째 주기마다 전체 확인, 12번째마다 대조)
+FULL_SCAN_INTERVAL = int(os.getenv("INGEST_FULL_SCAN_INTERVAL", 600)) # 워터마크 없이 전체 확인하는 간격(초, 놓친 행 복구용)
+RECONCILE_INTERVAL = int(os.getenv("INGEST_RECONCILE_INTERVAL", 3600)) # 인덱스 ID 전체를 DB와 대조하는 간격(초)
+DELETE_CHUNK_SIZE = 1000 # Pinecone delete 1회당 최대 ID 수
+WATERMARK_FILE = os.path.join(DATA_DIR, "sync_watermark.json")
+
+# 파이프라인 설정 (DB 읽기 → 임베딩 워커 → 업로드 → DB 반영)
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", 4)) # 동시에 임베딩 요청을 보내는 워커 수
+PIPELINE_QUEUE_SIZE = 8 # 단계 사이 큐에 쌓일 수 있는 최대 묶음 수 (backpressure)
+OPENAI_EMBED_RPS = float(os.getenv("OPENAI_EMBED_RPS", 50)) # 임베딩 API 초당 요청 상한
+PINECONE_UPSERT_RPS = float(os.getenv("PINECONE_UPSERT_RPS", 20)) # Pinecone upsert 초당 요청 상한
+# 한 번 받은 임베딩은 DATA_DIR에 보관해 두고 같은 텍스트는 다시 요청하지 않음 (다시 임베딩 / reindex.py / 재구축)
+EMBED_STORE = os.getenv("INGEST_EMBED_STORE", "1") == "1"
+
+if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", SYNC_WATERMARK_COLUMN):
+    raise ValueError(f"잘못된 워터마크 컬럼 이름: {SYNC_WATERMARK_COLUMN}")
+
+# 임베딩/메타데이터에 실제로 필요한 컬럼만 조회 (SELECT * 대신)
+EMBED_COLUMNS = [
+    "post_id", "title", "summary", "content", "status",
+    "job_category", "employment_type", "required_experience", "region",
+    "company_name", "source_url", "apply_method", "apply_link",
+    "tags", "target_audience", "apply_start_date", "apply_end_date", "latitude", "longitude",
+]
 
 # -----------------------------------------------
 # 1. Pinecone 초기화 (최초 1회)
 # -----------------------------------------------
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-if PINECONE_INDEX_NAME not in pc.list_indexes().names():
-    print(f"'{PINECONE_INDEX_NAME}' 인덱스 생성 중...")
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=EMBEDDING_DIMENSION,
-        metric="cosine",
-        spec=ServerlessSpec(cloud='aws', region='us-east-1')
-    )
-    while not pc.describe_index(PINECONE_INDEX_NAME).status['ready']:
-        time.sleep(1)
+# 별칭(reindex.py가 전환)을 따라가는 실제 인덱스 이름. 인덱스 / 역색인 / 지문 사본은 실제 인덱스별로 따로 둡니다.
+ALIAS_CHECK_INTERVAL = 10 # 별칭이 바뀌었는지 확인하는 간격(초)
+pc = None if VECTOR_BACKEND == "local" else Pinecone(api_key=PINECONE_API_KEY)
+
+
+def open_vector_index(name):
+    """실제 인덱스에 연결합니다. (Pinecone에 없으면 만들고 준비될 때까지 대기)"""
+    if VECTOR_BACKEND == "local":
+        # 로컬 인덱스: 네트워크 없이 RAG 서버와 같은 데이터 폴더에 저장
+        return LocalIndex(name, dimension=EMBEDDING_DIMENSION)
+
+    if name not in pc.list_indexes().names():
+        print(f"'{name}' 인덱스 생성 중...")
+        pc.create_index(
+            name=name,
+            dimension=EMBEDDING_DIMENSION,
+            metric="cosine",
+            spec=ServerlessSpec(cloud='aws', region='us-east-1')
+        )
+        while not pc.describe_index(name).status['ready']:
+            time.sleep(1)
+    return pc.Index(name)
+
+
+def fingerprint_path(name):
+    """실제 인덱스별 지문 사본 경로 (원래 인덱스는 예전 경로 그대로)"""
+    if name == PINECONE_INDEX_NAME:
+        return FINGERPRINT_DB
+    return os.path.join(DATA_DIR, f"fingerprints-{name}.sqlite3")
+
+
+def open_target(name):
+    """이후의 업로드 / 삭제 / 지문 비교가 모두 이 실제 인덱스를 향하도록 바꿉니다."""
+    global index, lexical_index, fingerprint_store, active_index_name
+    index = open_vector_index(name)
+    # 회사명/지역/태그 정확 일치 검색용 로컬 역색인 (RAG 서버가 같은 데이터 폴더에서 읽음)
+    lexical_index = LexicalIndex(name)
+    # 공고별 내용 지문 (텍스트 / 메타데이터 해시) 로컬 사본
+    fingerprint_store = FingerprintStore(fingerprint_path(name))
+    active_index_name = name
+
+
+def follow_index_alias():
+    """별칭이 다른 인덱스로 바뀌었으면(reindex.py switch / rollback) 그 인덱스로 옮기고 True"""
+    target = resolve_index(PINECONE_INDEX_NAME)
+    if target == active_index_name:
+        return False
+    print(f"🔀 인덱스 별칭 변경: {active_index_name} → {target}")
+    open_target(target)
+    return True
+
+
+open_target(resolve_index(PINECONE_INDEX_NAME))
+if VECTOR_BACKEND == "local":
+    print("✅ 로컬 벡터 인덱스 연결 완료. 자동화 시스템을 가동합니다.\n")
+else:
+    print("✅ Pinecone 인덱스 연결 완료. 자동화 시스템을 가동합니다.\n")
+if active_index_name != PINECONE_INDEX_NAME:
+    print(f"🔀 별칭 {PINECONE_INDEX_NAME} → {active_index_name}")
 
-index = pc.Index(PINECONE_INDEX_NAME)
-print("✅ Pinecone 인덱스 연결 완료. 자동화 시스템을 가동합니다.\n")
+# (지역 × 연령대)별 추천 목록 (RAG 서버가 "추천해줘" 질문에 벡터 검색 없이 사용)
+recommendation_store = RecommendationStore()
+# 좌표가 있는 공고의 위치 표 (RAG 서버가 "근처 공고" 질문에 메모리 격자로 사용)
+geo_store = GeoStore()
+policy_lexical_index = LexicalIndex(POLICY_INDEX_NAME)
+
+# 429를 받으면 속도/동시성을 줄이고, 성공이 이어지면 다시 올리는 속도 제한기
+openai_limiter = AdaptiveRateLimiter(rate=OPENAI_EMBED_RPS, max_concurrency=EMBED_WORKERS)
+pinecone_limiter = AdaptiveRateLimiter(rate=PINECONE_UPSERT_RPS, max_concurrency=2)
+embedding_store = EmbeddingStore(EMBEDDING_MODEL, EMBEDDING_DIMENSION) if EMBED_STORE else None
 
 # -----------------------------------------------
 # 2. 공고 처리 함수
 # -----------------------------------------------
-def process_new_postings():
-    conn = None
+def build_embedding_text(row):
+    """임베딩할 텍스트 조합 (제목 / 요약 / 내용)"""
+    return f"제목: {row['title']}\n요약: {row.get('summary', '')}\n내용: {row['content']}"
+
+
+def build_metadata(row):
+    """Pinecone에 함께 저장할 메타데이터 (공고 단위, 청크 본문은 chunk_records에서 추가)"""
+    tags_list = [t.strip() for t in row['tags'].split(',')] if row.get('tags') else []
+    audience_list = [a.strip() for a in row['target_audience'].split(',')] if row.get('target_audience') else []
+
+    metadata = {
+        "title": row.get('title') or "",
+        "status": row.get('status') or "",
+        "summary": row.get('summary') or "",
+        
+        "job_category": row.get('job_category') or "",
+        "employment_type": row.get('employment_type') or "",
+        "required_experience": row.get('required_experience') or "",
+        "region": row.get('region') or "",
+        "company_name": row.get('company_name') or "",
+        "source_url": row.get('source_url') or "",      
+        "apply_method": row.get('apply_method') or "",  
+        "apply_link": row.get('apply_link') or "",      
+        "tags": tags_list,
+        "target_audience": audience_list,
+        "apply_start_date": row['apply_start_date'].isoformat() if row.get('apply_start_date') else "",
+        "apply_end_date": row['apply_end_date'].isoformat() if row.get('apply_end_date') else "",
+
+        # 🔎 검색 필터용 정규화 필드 (metadata_filters.py 참고)
+        "region_key": normalize_region(row.get('region')),
+        "audience_keys": audience_keys(audience_list),
+        "apply_end_ymd": date_ymd(row.get('apply_end_date')),
+    }
+
+    # 📍 게시판 지도에서 고른 근무지 좌표 (없으면 넣지 않음, "근처 공고" 검색용 → geo_index.py)
+    point = valid_point(row.get('latitude'), row.get('longitude'))
+    if point is not None:
+        metadata["latitude"], metadata["longitude"] = point
+    return metadata
+
+
+def build_chunks(row):
+    """
+    공고 → 임베딩할 청크 목록.
+    - 짧은 공고는 예전과 같은 텍스트 한 덩어리
+    - 긴 공고는 내용을 CHUNK_TOKENS 단위로 겹치게 자르고, 청크마다 제목/요약 머리말을 붙임
+    """
+    full_text = build_embedding_text(row)
+    if count_tokens(full_text) <= CHUNK_TOKENS:
+        return [full_text]
+
+    header = f"제목: {row['title']}\n요약: {row.get('summary', '')}\n"
+    body_tokens = max(CHUNK_TOKENS - count_tokens(header), CHUNK_TOKENS // 2)
+    pieces = split_tokens(row['content'] or "", body_tokens, CHUNK_OVERLAP_TOKENS)[:MAX_CHUNKS_PER_POST]
+    return [
+        truncate_tokens(f"{header}내용 ({n + 1}/{len(pieces)}): {piece}", EMBED_MAX_INPUT_TOKENS)
+        for n, piece in enumerate(pieces)
+    ]
+
+
+def chunk_id(post_id, chunk_index):
+    """청크 벡터 ID: 첫 청크는 공고 ID 그대로(예전 벡터와 호환), 나머지는 '공고ID#번호'"""
+    return str(post_id) if chunk_index == 0 else f"{post_id}#{chunk_index}"
+
+
+def post_id_of(vec_id):
+    """청크 벡터 ID → 공고 ID (숫자가 아니면 ValueError)"""
+    return int(str(vec_id).split("#", 1)[0])
+
+
+def chunk_records(post_id, chunks, metadata):
+    """공고 하나 → (벡터 ID, 청크 본문, 청크 메타데이터) 목록"""
+    return [
+        (
+            chunk_id(post_id, n),
+            text,
+            # 🌟 [핵심 수정] 챗봇이 답변할 때 읽을 '본문'을 저장합니다. (청크마다 자기 본문)
+            {**metadata, "context_text": text, "chunk_index": n},
+        )
+        for n, text in enumerate(chunks)
+    ]
+
+
+def iter_embedding_batches(posts):
+    """
+    (post_id, 청크 목록, metadata) 목록을 임베딩 요청 단위로 나눕니다.
+    - 한 요청에 최대 BATCH_SIZE개 청크, 토큰 합계 EMBED_BATCH_MAX_TOKENS 이하
+    - 한 공고의 청크는 항상 같은 요청에 들어갑니다. (업로드/DB 반영이 공고 단위로 맞도록)
+    """
+    batch, batch_tokens = [], 0
+    for post_id, chunks, metadata in posts:
+        records = chunk_records(post_id, chunks, metadata)
+        tokens = sum(count_tokens(text) for text in chunks)
+        if batch and (len(batch) + len(records) > BATCH_SIZE or batch_tokens + tokens > EMBED_BATCH_MAX_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.extend(records)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def request_embeddings(texts):
+    """여러 텍스트를 한 번의 API 호출로 임베딩합니다. (입력 순서 유지, 429 시 재시도)"""
+    response = openai_limiter.call(
+        openai_client.embeddings.create,
+        input=texts,
+        model=EMBEDDING_MODEL
+    )
+    return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
+
+def embed_texts(texts):
+    """임베딩 보관소에 없는 텍스트만 API로 임베딩합니다. (보관소를 끄면 모두 API로)"""
+    if embedding_store is None:
+        return request_embeddings(texts)
+    return embedding_store.embed(texts, request_embeddings)
+
+
+def mark_embedded(conn, post_ids):
+    """업로드에 성공한 공고만 is_embedded = 'Y'로 표시"""
+    format_strings = ','.join(['%s'] * len(post_ids))
+    update_query = f"UPDATE {TABLE_NAME} SET is_embedded = 'Y' WHERE post_id IN ({format_strings})"
+
+    cursor = conn.cursor()
+    cursor.execute(update_query, tuple(post_ids))
+    conn.commit()
+    cursor.close()
+
+
+def upsert_vectors(vectors):
+    """
+    벡터 묶음 하나를 Pinecone에 업로드하고, 로컬 역색인과 지문에도 반영합니다. (429 시 재시도)
+    (파이프라인이 한 공고의 청크를 한 묶음에 모아 주므로 지문은 공고가 다 올라간 뒤에만 기록됨)
+    """
+    pinecone_limiter.call(index.upsert, vectors=vectors)
+    lexical_index.upsert(
+        (v["id"], v["metadata"]["context_text"], {k: m for k, m in v["metadata"].items() if k != "context_text"})
+        for v in vectors
+    )
+    first_chunks = [v["metadata"] for v in vectors if v["metadata"]["chunk_index"] == 0]
+    delete_extra_chunks(first_chunks)
+    fingerprint_store.put_many((m["post_id"], m["text_hash"], m["meta_hash"], m["chunk_count"]) for m in first_chunks)
+    recommendation_store.put_jobs((m["post_id"], m["context_text"], m) for m in first_chunks)
+    geo_store.put_jobs((m["post_id"], m) for m in first_chunks)
+
+
+def update_metadata_only(posts):
+    """
+    본문은 그대로이고 메타데이터만 바뀐 공고: 임베딩 없이 모든 청크의 메타데이터만 덮어씁니다.
+    (임베딩 보관소를 끈 경우만. update는 벡터 1개씩이라 느리므로 보관소가 있으면 업로드 단계로 보냄)
+    """
+    for post_id, chunks, metadata in posts:
+        for n in range(len(chunks)):
+            pinecone_limiter.call(index.update, id=chunk_id(post_id, n), set_metadata={**metadata, "chunk_index": n})
+        lexical_index.upsert(
+            (vec_id, text, {k: m for k, m in chunk_metadata.items() if k != "context_text"})
+            for vec_id, text, chunk_metadata in chunk_records(post_id, chunks, metadata)
+        )
+    fingerprint_store.put_many(
+        (post_id, m["text_hash"], m["meta_hash"], m["chunk_count"]) for post_id, _, m in posts
+    )
+    # 지역 / 대상 / 마감일이 바뀌었을 수 있으므로 추천 순위도 다시 계산
+    recommendation_store.put_jobs((post_id, chunks[0], m) for post_id, chunks, m in posts)
+    geo_store.put_jobs((post_id, m) for post_id, _, m in posts)
+
+
+def delete_extra_chunks(first_chunks):
+    """
+    다시 임베딩하면서 청크 수가 줄어든 공고의 남는 청크를 지웁니다. (이전 청크 수는 지문 사본 기준)
+    새 청크가 올라간 뒤에 부르므로, 임베딩 / 업로드가 실패해도 공고가 검색에서 빠지지 않습니다.
+    """
+    known = fingerprint_store.get_many(m["post_id"] for m in first_chunks)
+    delete_vectors(
+        chunk_id(m["post_id"], n)
+        for m in first_chunks
+        for n in range(m["chunk_count"], known.get(str(m["post_id"]), (None, None, 0))[2])
+    )
+
+
+def classify_changes(items, fetch_missing=True):
+    """
+    지문을 비교해 공고를 나눕니다.
+    - to_embed: 새 공고 또는 텍스트가 바뀐 공고 (임베딩 필요)
+    - metadata_only: 메타데이터만 바뀐 공고
+    - unchanged: 바뀐 것이 없는 공고
+    fetch_missing=False면 지문 사본에 없는 공고를 인덱스에 묻지 않고 새 공고로 봅니다. (새로 만드는 인덱스)
+    """
+    ids = [str(post_id) for post_id, _, _ in items]
+    known = fingerprint_store.get_many(ids)
+    missing = [i for i in ids if i not in known]
+    if missing and fetch_missing:
+        # 로컬 사본이 없으면(처음 실행, 데이터 폴더 이동) 벡터 메타데이터에서 확인
+        # (공고의 첫 청크 ID가 공고 ID와 같으므로 그대로 조회)
+        fetched = pinecone_limiter.call(fingerprints_from_index, index, missing, EMBEDDING_MODEL)
+        fingerprint_store.put_many((i, t, m, n) for i, (t, m, n) in fetched.items() if m)
+        known.update(fetched)
+
+    to_embed, metadata_only, unchanged = [], [], []
+    for item in items:
+        post_id, chunks, metadata = item
+        previous = known.get(str(post_id))
+        if previous is None or previous[0] != metadata["text_hash"]:
+            to_embed.append(item) # 줄어든 청크는 업로드 뒤 upsert_vectors가 지움
+        elif previous[1] != metadata["meta_hash"]:
+            metadata_only.append(item)
+        else:
+            unchanged.append(item)
+    return to_embed, metadata_only, unchanged
+
+
+# -----------------------------------------------
+# 3. 증분 동기화 (워터마크 + 키셋 페이지네이션)
+# -----------------------------------------------
+_db_conn = None
+
+def get_db_connection():
+    """주기마다 새로 접속하지 않고 연결 하나를 재사용합니다. (끊겼으면 재접속)"""
+    global _db_conn
+    if _db_conn is None:
+        _db_conn = mysql.connector.connect(**db_config)
+    else:
+        _db_conn.ping(reconnect=True, attempts=3, delay=1)
+    return _db_conn
+
+
+def close_db_connection():
+    global _db_conn
+    if _db_conn is not None and _db_conn.is_connected():
+        _db_conn.close()
+    _db_conn = None
+
+
+def load_watermark():
+    """마지막으로 처리한 (워터마크 값, post_id). 컬럼이 바뀌었거나 기록이 없으면 None"""
+    try:
+        with open(WATERMARK_FILE) as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if saved.get("column") != SYNC_WATERMARK_COLUMN:
+        return None
+    return saved["value"], saved["post_id"]
+
+
+def save_watermark(watermark):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    value, post_id = watermark
+    tmp_path = WATERMARK_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"column": SYNC_WATERMARK_COLUMN, "value": value, "post_id": post_id}, f)
+    os.replace(tmp_path, WATERMARK_FILE)
+
+
+def watermark_value(row):
+    value = row[SYNC_WATERMARK_COLUMN]
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+def fetch_page(conn, after, pending_only=True):
+    """
+    승인된 공고를 (워터마크, post_id) 순서로 한 페이지 읽습니다.
+    (마감일이 이미 지난 공고는 올리지 않습니다)
+    - pending_only: 아직 임베딩되지 않은(is_embedded='N') 공고만. False면 수정된 공고 확인을 위해 전부
+    - after가 주어지면 그 지점 이후만 조회 (키셋 페이지네이션, OFFSET 없음)
+    """
+    wm = SYNC_WATERMARK_COLUMN
+    columns = EMBED_COLUMNS + ["is_embedded"] + ([wm] if wm not in EMBED_COLUMNS else [])
+    query = f"""
+        SELECT {', '.join(columns)} FROM {TABLE_NAME}
+        WHERE
+        approved = 'Y'
+        AND del = 'N'
+        AND (apply_end_date IS NULL OR apply_end_date >= CURDATE())
+    """
+    if pending_only:
+        query += " AND (is_embedded = 'N' OR is_embedded IS NULL)"
+    params = ()
+    if after is not None:
+        if wm == "post_id":
+            query += " AND post_id > %s"
+            params = (after[1],)
+        else:
+            query += f" AND ({wm} > %s OR ({wm} = %s AND post_id > %s))"
+            params = (after[0], after[0], after[1])
+    order_by = "post_id" if wm == "post_id" else f"{wm}, post_id"
+    query += f" ORDER BY {order_by} LIMIT {SYNC_PAGE_SIZE}"
+
+    # 버퍼 없는 커서로 서버에서 조금씩 받아옵니다. (페이지 전체를 한 번에 버퍼링하지 않음)
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute(query, params)
+    rows = []
+    while True:
+        chunk = cursor.fetchmany(BATCH_SIZE)
+        if not chunk:
+            break
+        rows.extend(chunk)
+    cursor.close()
+    return rows
+
+
+def prepare_items(rows):
+    """행을 (post_id, 청크 목록, 공고 메타데이터)로 변환"""
+    items = []
+    for row in rows:
+        try:
+            chunks = build_chunks(row)
+            metadata = build_metadata(row)
+            metadata["post_id"] = row['post_id']
+            metadata["chunk_count"] = len(chunks)
+            # 한 덩어리 공고는 예전 지문(모델 이름만)과 같게 두어, 청크 도입 전 벡터를 다시 임베딩하지 않음
+            version = EMBEDDING_MODEL if len(chunks) == 1 else CHUNKED_EMBEDDING_VERSION
+            metadata["text_hash"] = text_fingerprint("\n".join(chunks) if len(chunks) > 1 else chunks[0], version)
+            metadata["meta_hash"] = metadata_fingerprint(metadata)
+            items.append((row['post_id'], chunks, metadata))
+        except Exception as e:
+            print(f"❌ ID {row['post_id']} 처리 중 에러: {e}")
+    return items
+
+
+def iter_pending_batches(conn, after, progress, pipeline, pending_only=True):
+    """
+    (파이프라인 1단계) 페이지 단위로 공고를 읽어 지문을 비교하고,
+    텍스트가 바뀐 공고만 임베딩 요청 묶음으로 흘려보냅니다.
+    - 메타데이터만 바뀐 공고도 임베딩 보관소에서 벡터를 받아 함께 업로드 (보관소를 끄면 여기서 바로 메타데이터만 갱신)
+    - 임베딩이 필요 없는 공고 중 is_embedded='N'인 것은 바로 DB 반영 단계로 보냄
+    progress에 발견한 행 수, 분류 결과, 마지막 키셋 위치를 기록합니다.
+    """
+    while True:
+        rows = fetch_page(conn, after, pending_only)
+        if not rows:
+            return
+        yield from iter_row_batches(rows, progress, pipeline)
+
+        after = (watermark_value(rows[-1]), rows[-1]['post_id'])
+        progress["after"] = after
+
+        if len(rows) < SYNC_PAGE_SIZE:
+            return
+
+
+def iter_row_batches(rows, progress, pipeline, fetch_missing=True):
+    """
+    읽어 온 행들의 지문을 비교해 텍스트가 바뀐 공고만 임베딩 요청 묶음으로 흘려보냅니다.
+    (주기 확인의 페이지 / 알림으로 받은 공고 / reindex.py 공통)
+    """
+    progress["scanned"] += len(rows)
+
+    to_embed, metadata_only, unchanged = classify_changes(prepare_items(rows), fetch_missing)
+    changed = len(to_embed) + len(metadata_only)
+    if changed and progress["found"] == 0:
+        print("\n📢 새로 게시되었거나 수정된 공고 발견! 처리 시작...")
+    progress["found"] += changed
+    progress["unchanged"] += len(unchanged)
+
+    if metadata_only and embedding_store is not None:
+        # 본문 임베딩은 보관소에 있으므로 임베딩 단계를 API 호출 없이 지나고,
+        # 업로드 단계가 청크를 UPSERT_CHUNK_SIZE개씩 묶어 덮어씀 (보관 기간이 지나 빠진 청크만 다시 임베딩)
+        progress["metadata_only"] += len(metadata_only)
+        to_embed += metadata_only
+    elif metadata_only:
+        try:
+            update_metadata_only(metadata_only)
+            progress["metadata_only"] += len(metadata_only)
+            unchanged += metadata_only
+        except Exception as e:
+            # 실패한 공고는 is_embedded가 그대로 남아 다음 확인에서 다시 시도됩니다.
+            print(f"❌ 메타데이터 갱신 실패 ({len(metadata_only)}개): {e}")
+
+    pending = {row['post_id'] for row in rows if row.get('is_embedded') != 'Y'}
+    pipeline.acknowledge([post_id for post_id, _, _ in unchanged if post_id in pending])
+    yield from iter_embedding_batches(to_embed)
+
+
+def new_pipeline(ack_fn):
+    """읽기 뒤의 임베딩 / 업로드 / DB 반영 단계 (DB 반영은 별도 스레드이므로 연결을 따로 쓰는 ack_fn을 받음)"""
+    return IngestPipeline(
+        embed_fn=embed_texts,
+        upsert_fn=upsert_vectors,
+        ack_fn=ack_fn,
+        embed_workers=EMBED_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        upsert_chunk_size=UPSERT_CHUNK_SIZE,
+        parent_fn=post_id_of,
+    )
+
+
+def process_new_postings(full_scan=False):
+    """
+    승인된 공고 중 새로 올라왔거나 바뀐 것을 반영합니다.
+    - incremental 모드: 저장된 워터마크 이후만 페이지 단위로 조회하고, 끝나면 워터마크 저장
+      (워터마크가 post_id면 미임베딩 공고만, 수정 시각 컬럼이면 그 이후 바뀐 공고 전부)
+    - full_scan=True 또는 full 모드: 워터마크 없이 승인된 공고 전체를 지문으로 비교
+    - 읽기 / 임베딩(EMBED_WORKERS개) / 업로드 / DB 반영이 큐로 연결되어 동시에 진행됩니다.
+    """
+    incremental = SYNC_MODE == "incremental" and not full_scan
+    uploaded_count = 0
+    ack_conn = None
     try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor(dictionary=True)
-
-        query = f"""
-            SELECT * FROM {TABLE_NAME} 
-            WHERE
-            approved = 'Y' 
-            AND del = 'N' 
-            AND (is_embedded = 'N' OR is_embedded IS NULL)
-        """
-        cursor.execute(query)
-        new_data = cursor.fetchall()
-
-        if not new_data:
+        conn = get_db_connection()
+        # DB 반영 단계는 별도 스레드이므로 연결을 따로 사용
+        ack_conn = mysql.connector.connect(**db_config)
+
+        progress = {"found": 0, "scanned": 0, "metadata_only": 0, "unchanged": 0, "after": None}
+        after = load_watermark() if incremental else None
+        # post_id 워터마크로는 수정된 글을 알 수 없으므로 미임베딩 공고만 보고, 수정 확인은 전체 확인에 맡김
+        pending_only = incremental and SYNC_WATERMARK_COLUMN == "post_id"
+
+        pipeline = new_pipeline(lambda post_ids: mark_embedded(ack_conn, post_ids))
+        started = time.monotonic()
+        stats = pipeline.run(iter_pending_batches(conn, after, progress, pipeline, pending_only))
+        uploaded_count = stats["upsert"]["rows"] + progress["metadata_only"]
+
+        # 실패한 행은 is_embedded='N'으로 남으며, 주기적인 전체 확인에서 다시 시도됩니다.
+        if incremental and progress["after"] is not None:
+            save_watermark(progress["after"])
+
+        if not progress["found"]:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] 새로운 게시 공고 없음. 대기 중...")
             return
 
-        print(f"\n📢 {len(new_data)}개의 '게시됨(published)' 공고 발견! 처리 시작...")
-
-        vectors_to_upsert = []
-        processed_ids = [] 
-
-        for row in new_data:
-            try:
-                # (A) 임베딩 텍스트 조합
-                text_to_embed = f"제목: {row['title']}\n요약: {row.get('summary', '')}\n내용: {row['content']}"
-
-                # (B) 임베딩 생성
-                response = openai_client.embeddings.create(
-                    input=text_to_embed,
-                    model=EMBEDDING_MODEL
-                )
-                vector = response.data[0].embedding
-
-                # (C) 메타데이터 준비
-                tags_list = [t.strip() for t in row['tags'].split(',')] if row.get('tags') else []
-                audience_list = [a.strip() for a in row['target_audience'].split(',')] if row.get('target_audience') else []
-
-                metadata = {
-                    "title": row.get('title') or "",
-                    "status": row.get('status') or "",
-                    "summary": row.get('summary') or "",
-                    
-                    # 🌟 [핵심 수정] 챗봇이 답변할 때 읽을 '본문'을 저장합니다.
-                    "context_text": text_to_embed, 
-                    
-                    "job_category": row.get('job_category') or "",
-                    "employment_type": row.get('employment_type') or "",
-                    "required_experience": row.get('required_experience') or "",
-                    "region": row.get('region') or "",
-                    "company_name": row.get('company_name') or "",
-                    "source_url": row.get('source_url') or "",      
-                    "apply_method": row.get('apply_method') or "",  
-                    "apply_link": row.get('apply_link') or "",      
-                    "tags": tags_list,
-                    "target_audience": audience_list,
-                    "apply_start_date": row['apply_start_date'].isoformat() if row.get('apply_start_date') else "",
-                    "apply_end_date": row['apply_end_date'].isoformat() if row.get('apply_end_date') else "",
-                }
-
-                vectors_to_upsert.append({
-                    "id": str(row['post_id']),
-                    "values": vector,
-                    "metadata": metadata
-                })
-                
-                processed_ids.append(row['post_id'])
-
-            except Exception as e:
-                print(f"❌ ID {row['post_id']} 처리 중 에러: {e}")
-
-        # (D) Pinecone 업로드 & DB 업데이트
-        if vectors_to_upsert:
-            index.upsert(vectors=vectors_to_upsert)
-            print(f"✅ Pinecone에 {len(vectors_to_upsert)}개 데이터 업로드 완료.")
-
-            if processed_ids:
-                format_strings = ','.join(['%s'] * len(processed_ids))
-                update_query = f"UPDATE {TABLE_NAME} SET is_embedded = 'Y' WHERE post_id IN ({format_strings})"
-                
-                cursor = conn.cursor()
-                cursor.execute(update_query, tuple(processed_ids))
-                conn.commit()
-                print(f"✅ DB 업데이트 완료: {len(processed_ids)}개 공고 'is_embedded' -> 'Y'")
+        elapsed = time.monotonic() - started
+        print(
+            f"✅ 이번 주기 처리 완료: 바뀐 공고 {progress['found']}개 ({elapsed:.1f}초) "
+            f"| 업로드한 청크 {stats['upsert']['rows']} · 메타데이터만 {progress['metadata_only']} "
+            f"· 변경 없음 {progress['unchanged']} (확인한 공고 {progress['scanned']})"
+        )
+        for name, stage in stats.items():
+            print(
+                f"   - {name:<6} {stage['rows']:>6}행 | {stage['rows_per_sec']:>8} rows/s "
+                f"(작업 시간 기준 {stage['busy_rows_per_sec']} rows/s) | 실패 {stage['failures']}"
+            )
+
+    except mysql.connector.Error as err:
+        print(f"⚠️ DB 연결 오류: {err}")
+        close_db_connection()
+    finally:
+        if ack_conn is not None and ack_conn.is_connected():
+            ack_conn.close()
+        # 새 공고가 반영되었으므로 RAG 서버의 답변 캐시를 무효화
+        if uploaded_count:
+            bump_corpus_version()
+
+# -----------------------------------------------
+# 4. 삭제 동기화 (삭제 / 승인 취소 / 마감된 공고를 인덱스에서 제거)
+# -----------------------------------------------
+# 검색에 남아 있으면 안 되는 공고: 삭제(del != 'N'), 승인 취소(approved != 'Y'), 마감일 지남
+DEAD_POST_CONDITION = "(del <> 'N' OR approved <> 'Y' OR (apply_end_date IS NOT NULL AND apply_end_date < CURDATE()))"
+
+
+def delete_vectors(vec_ids):
+    """벡터를 DELETE_CHUNK_SIZE개씩 묶어 지우고, 로컬 역색인에서도 뺍니다."""
+    vec_ids = [str(i) for i in vec_ids]
+    for start in range(0, len(vec_ids), DELETE_CHUNK_SIZE):
+        chunk = vec_ids[start:start + DELETE_CHUNK_SIZE]
+        pinecone_limiter.call(index.delete, ids=chunk)
+        lexical_index.remove(chunk)
+
+
+def delete_posts(post_ids):
+    """공고의 모든 청크 벡터와 지문을 지웁니다. (청크 수는 지문 사본 기준, 남는 청크는 인덱스 대조가 정리)"""
+    known = fingerprint_store.get_many(post_ids)
+    delete_vectors(
+        chunk_id(post_id, n)
+        for post_id in post_ids
+        for n in range(known.get(str(post_id), (None, None, 1))[2])
+    )
+    fingerprint_store.remove(post_ids)
+    recommendation_store.remove_jobs(post_ids)
+    geo_store.remove_jobs(post_ids)
+
+
+def mark_removed(conn, post_ids):
+    """인덱스에서 지운 공고는 is_embedded = 'N'으로 되돌림 (다시 승인되면 새로 임베딩)"""
+    format_strings = ','.join(['%s'] * len(post_ids))
+    cursor = conn.cursor()
+    cursor.execute(f"UPDATE {TABLE_NAME} SET is_embedded = 'N' WHERE post_id IN ({format_strings})", tuple(post_ids))
+    conn.commit()
+    cursor.close()
 
+
+def fetch_tombstones(conn, ids):
+    """
+    지문 사본에 있는(= 인덱스에 올라간) 공고 ID 중 더 이상 검색되면 안 되는 공고 ID.
+    is_embedded 표시는 보지 않으므로 'N'으로 되돌린 뒤 지운 공고, DB에서 행이 아예 지워진 공고도 포함합니다.
+    """
+    post_ids = []
+    for vec_id in ids:
+        try:
+            post_ids.append(post_id_of(vec_id))
+        except ValueError:
+            continue # 형식이 다른 ID는 인덱스 대조가 정리
+    live = live_post_ids(conn, post_ids)
+    return [post_id for post_id in post_ids if post_id not in live]
+
+
+def sync_deletions():
+    """
+    (매 주기) 삭제/승인 취소/마감된 공고의 벡터를 묶음으로 지웁니다.
+    인덱스에 올라간 공고 목록은 DB 표시(is_embedded)가 아니라 지문 사본 기준이고,
+    지운 공고는 지문도 지워지므로 다음 주기에는 다시 나오지 않습니다.
+    """
+    removed = 0
+    try:
+        conn = get_db_connection()
+        ids = fingerprint_store.ids()
+        for start in range(0, len(ids), SYNC_PAGE_SIZE):
+            post_ids = fetch_tombstones(conn, ids[start:start + SYNC_PAGE_SIZE])
+            if not post_ids:
+                continue
+            delete_posts(post_ids)
+            mark_removed(conn, post_ids)
+            removed += len(post_ids)
+    except mysql.connector.Error as err:
+        print(f"⚠️ DB 연결 오류: {err}")
+        close_db_connection()
+    except Exception as e:
+        print(f"❌ 삭제 동기화 실패: {e}")
+    if removed:
+        print(f"🗑️ 삭제/승인 취소/마감된 공고 {removed}개를 인덱스에서 제거했습니다.")
+    return removed
+
+
+def live_post_ids(conn, post_ids):
+    """주어진 ID 중 지금 검색되어야 하는(승인됨, 삭제 안 됨, 마감 전) 공고 ID"""
+    if not post_ids:
+        return set()
+    format_strings = ','.join(['%s'] * len(post_ids))
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT post_id FROM {TABLE_NAME} WHERE post_id IN ({format_strings}) AND NOT {DEAD_POST_CONDITION}",
+        tuple(post_ids),
+    )
+    live = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return live
+
+
+def stale_ids(conn, vec_ids):
+    """DB에 살아 있는 공고가 아닌 벡터(청크) ID (DB에서 아예 지워진 행, 형식이 다른 ID 포함)"""
+    post_ids = {}
+    for vec_id in vec_ids:
+        try:
+            post_ids[vec_id] = post_id_of(vec_id)
+        except ValueError:
+            post_ids[vec_id] = None
+    live = live_post_ids(conn, sorted({p for p in post_ids.values() if p is not None}))
+    return [vec_id for vec_id, post_id in post_ids.items() if post_id not in live]
+
+
+def reconcile_index():
+    """
+    (RECONCILE_INTERVAL마다) 인덱스 ID를 페이지 단위로 훑어 DB와 대조하고, 살아 있지 않은 벡터를 지웁니다.
+    is_embedded 표시가 어긋났거나 DB에서 행이 아예 지워진 경우를 바로잡는 안전망입니다.
+    로컬 역색인과 지문 사본, 추천 목록에만 남은 ID도 함께 정리합니다.
+    """
+    removed = 0
+    try:
+        conn = get_db_connection()
+        stale = []
+        # 목록을 훑는 동안 지우면 페이지 위치가 흔들리므로, 모아 두었다가 마지막에 지움
+        for page in index.list(limit=UPSERT_CHUNK_SIZE):
+            stale.extend(stale_ids(conn, list(page)))
+        delete_vectors(stale)
+        removed = len(stale)
+
+        lexical_index.refresh()
+        for ids, remove in (
+            (list(lexical_index.docs), lexical_index.remove),
+            (fingerprint_store.ids(), fingerprint_store.remove),
+            (recommendation_store.ids(), recommendation_store.remove_jobs),
+            (geo_store.ids(), geo_store.remove_jobs),
+        ):
+            for start in range(0, len(ids), SYNC_PAGE_SIZE):
+                remove(stale_ids(conn, ids[start:start + SYNC_PAGE_SIZE]))
+    except mysql.connector.Error as err:
+        print(f"⚠️ DB 연결 오류: {err}")
+        close_db_connection()
+    except Exception as e:
+        print(f"❌ 인덱스 대조 실패: {e}")
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] 🔁 인덱스 대조 완료: 살아 있지 않은 벡터 {removed}개 제거")
+    return removed
+
+
+# -----------------------------------------------
+# 5. 추천 목록 (지역 × 연령대별 순위, 공고는 위의 업로드/삭제 때 공고 단위로 갱신)
+# -----------------------------------------------
+def sync_recommendations():
+    """
+    (매 주기) 정책 역색인이 바뀌었으면 정책 추천 목록을 다시 계산하고,
+    추천 표가 비어 있으면 이미 올라간 공고로 채웁니다. 바뀐 것이 있으면 True
+    """
+    changed = False
+    try:
+        backfilled = backfill_jobs(recommendation_store, lexical_index)
+        if backfilled:
+            print(f"⭐ 추천 목록에 기존 공고 {backfilled}개를 채웠습니다.")
+            changed = True
+        policies = sync_policies(recommendation_store, policy_lexical_index)
+        if policies is not None:
+            print(f"⭐ 정책 추천 목록 갱신: {policies}개")
+            changed = True
+    except Exception as e:
+        print(f"❌ 추천 목록 갱신 실패: {e}")
+    return changed
+
+
+# -----------------------------------------------
+# 6. 알림으로 받은 공고 바로 반영 (ingest_notify.py)
+# -----------------------------------------------
+def fetch_posts(conn, post_ids):
+    """주어진 ID 중 검색되어야 하는(승인됨, 삭제 안 됨, 마감 전) 공고 행"""
+    columns = EMBED_COLUMNS + ["is_embedded"]
+    rows = []
+    cursor = conn.cursor(dictionary=True)
+    for start in range(0, len(post_ids), SYNC_PAGE_SIZE):
+        chunk = post_ids[start:start + SYNC_PAGE_SIZE]
+        format_strings = ','.join(['%s'] * len(chunk))
+        cursor.execute(
+            f"SELECT {', '.join(columns)} FROM {TABLE_NAME} "
+            f"WHERE post_id IN ({format_strings}) AND NOT {DEAD_POST_CONDITION} ORDER BY post_id",
+            tuple(chunk),
+        )
+        rows.extend(cursor.fetchall())
+    cursor.close()
+    return rows
+
+
+def process_posts(post_ids):
+    """
+    알림으로 받은 공고만 바로 반영합니다. (워터마크 / 전체 확인과 상관없이)
+    - 살아 있는 공고: 지문을 비교해 바뀐 것만 임베딩 또는 메타데이터 갱신
+    - 삭제 / 승인 취소 / 마감된 공고: 인덱스에 있으면 제거
+    반영한 공고 수를 돌려줍니다.
+    """
+    post_ids = sorted({int(post_id) for post_id in post_ids})
+    changed = 0
+    ack_conn = None
+    try:
+        conn = get_db_connection()
+        started = time.monotonic()
+        rows = fetch_posts(conn, post_ids)
+        live = {row['post_id'] for row in rows}
+
+        known = fingerprint_store.get_many([post_id for post_id in post_ids if post_id not in live])
+        dead = [post_id for post_id in post_ids if str(post_id) in known]
+        if dead:
+            delete_posts(dead)
+            mark_removed(conn, dead)
+            changed += len(dead)
+
+        if rows:
+            ack_conn = mysql.connector.connect(**db_config)
+            progress = {"found": 0, "scanned": 0, "metadata_only": 0, "unchanged": 0, "after": None}
+            pipeline = new_pipeline(lambda post_ids: mark_embedded(ack_conn, post_ids))
+            pipeline.run(iter_row_batches(rows, progress, pipeline))
+            changed += progress["found"]
+
+        print(
+            f"[{datetime.now().strftime('%H:%M:%S')}] 🔔 알림 {len(post_ids)}건 반영 "
+            f"({time.monotonic() - started:.1f}초): 살아 있는 공고 {len(rows)} · 바뀐 공고 {changed - len(dead)} · 제거 {len(dead)}"
+        )
     except mysql.connector.Error as err:
         print(f"⚠️ DB 연결 오류: {err}")
+        close_db_connection()
+    except Exception as e:
+        print(f"❌ 알림 처리 실패 (다음 주기 확인에서 다시 반영): {e}")
     finally:
-        if conn and conn.is_connected():
-            conn.close()
+        if ack_conn is not None and ack_conn.is_connected():
+            ack_conn.close()
+        if changed:
+            bump_corpus_version()
+    return changed
+
+
+def run_poll_cycle(full_scan, reconcile):
+    """주기 확인 한 번: 새 공고(full_scan이면 전체 확인) / 삭제 / (reconcile이면) 인덱스 대조 / 추천 목록"""
+    process_new_postings(full_scan=full_scan)
+    removed = sync_deletions()
+    if reconcile:
+        removed += reconcile_index()
+        if embedding_store is not None:
+            embedding_store.maybe_compact()
+    # 검색 결과가 바뀌었으므로 RAG 서버의 답변 캐시를 무효화
+    if sync_recommendations() or removed:
+        bump_corpus_version()
+
 
 if __name__ == "__main__":
     print("🚀 실시간 공고 감시 시스템(AWS RDS 연결) 시작 (Ctrl+C로 종료)")
+    notifications = None
+    if INGEST_PORT:
+        notifications = PostNotifications(
+            debounce=INGEST_DEBOUNCE_MS / 1000, max_wait=INGEST_MAX_WAIT_MS / 1000, max_batch=SYNC_PAGE_SIZE
+        )
+        serve_notifications(notifications, INGEST_HOST, INGEST_PORT, INGEST_TOKEN)
+        print(f"🔔 승인 알림 대기: http://{INGEST_HOST}:{INGEST_PORT}/ingest (주기 확인은 {INGEST_POLL_INTERVAL}초마다)")
+    poll_interval = INGEST_POLL_INTERVAL if notifications else CHECK_INTERVAL
     try:
+        # 시작 직후에는 전체 확인 + 인덱스 대조부터
+        next_poll = next_full_scan = next_reconcile = 0.0
         while True:
-            process_new_postings()
-            time.sleep(CHECK_INTERVAL)
+            if follow_index_alias():
+                # 전환 / 되돌리기 사이에 놓친 변경을 새 인덱스 기준으로 바로 전체 확인 + 인덱스 대조
+                next_poll = next_full_scan = next_reconcile = 0.0
+            wait = max(0.0, min(next_poll - time.monotonic(), ALIAS_CHECK_INTERVAL))
+            if notifications is None:
+                time.sleep(wait)
+            else:
+                # 다음 주기 확인 전까지는 알림만 기다림 (알림이 없으면 DB를 건드리지 않음)
+                post_ids = notifications.wait(wait)
+                if post_ids:
+                    process_posts(post_ids)
+                    continue
+            if time.monotonic() < next_poll:
+                continue
+            started = time.monotonic()
+            full_scan, reconcile = started >= next_full_scan, started >= next_reconcile
+            run_poll_cycle(full_scan, reconcile)
+            if full_scan:
+                next_full_scan = started + FULL_SCAN_INTERVAL
+            if reconcile:
+                next_reconcile = started + RECONCILE_INTERVAL
+            next_poll = time.monotonic() + poll_interval
     except KeyboardInterrupt:
 
         print("\n🛑 시스템을 종료합니다.")
+    finally:
+        close_db_connection()
@@ -0,0 +1,202 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from rag_cache import LRUTTLCache
+from token_utils import count_tokens, truncate_tokens
+
+# -----------------------------------------------
+# 🧮 프롬프트 토큰 예산
+# - 대화 기록: 최근 몇 턴은 그대로, 그보다 오래된 턴은 대화별로 캐시된 요약(rolling summary)으로 대체
+# - 검색 문서: 순위대로 넣다가 예산을 넘으면 나머지를 버림
+# - 요약은 답변이 끝난 뒤 백그라운드에서 갱신되므로 응답 지연에 더해지지 않습니다.
+#   (아직 요약되지 않은 오래된 턴은 그동안 앞부분만 짧게 잘라서 넣음)
+# -----------------------------------------------
+PENDING_TURN_TOKENS = 60 # 아직 요약에 반영되지 않은 오래된 턴 1개에 허용하는 토큰 수
+
+Turn = Tuple[str, str] # (사용자 메시지, 봇 답변)
+
+
+def split_turns(history: List[Dict[str, Any]]) -> List[Turn]:
+    """클라이언트가 보낸 history(sender/text 목록)를 (사용자, 봇) 턴 목록으로 묶습니다."""
+    turns = []
+    user_msg = None
+    for turn in history:
+        if turn.get("sender") == "user":
+            user_msg = turn.get("text", "")
+        elif turn.get("sender") == "bot" and user_msg is not None:
+            turns.append((user_msg, turn.get("text", "")))
+            user_msg = None
+    return turns
+
+
+def format_turns(turns: List[Turn]) -> str:
+    return "".join(f"User: {user}\nBot: {bot}\n" for user, bot in turns)
+
+
+def conversation_key(turns: List[Turn], user_profile: Dict[str, Any], conversation_id: Optional[str] = None) -> str:
+    """
+    요약 캐시 키. 클라이언트가 conversation_id를 보내면 그대로 쓰고,
+    없으면 프로필 + 첫 턴으로 만듭니다. (history는 뒤에만 붙으므로 대화 내내 같은 값)
+    """
+    if conversation_id:
+        return f"id:{conversation_id}"
+    seed = json.dumps([user_profile or {}, turns[:1]], ensure_ascii=False, sort_keys=True, default=str)
+    return "h:" + hashlib.sha1(seed.encode("utf-8")).hexdigest()
+
+
+class PromptBudgeter:
+    """
+    프롬프트 구역별 토큰을 세고 max_tokens 안에 맞춥니다.
+    - 고정 구역(템플릿 / 프로필 / 질문)은 그대로 두고 남는 예산을 대화 기록과 검색 문서에 나눕니다.
+    - summarize_fn(이전 요약, 새로 밀려난 턴 텍스트) → 새 요약 (LLM 호출, 비동기)
+    """
+
+    def __init__(
+        self,
+        template_tokens: int,
+        max_tokens: int,
+        history_max_tokens: int,
+        recent_turns: int,
+        summary_max_tokens: int,
+        summary_cache: LRUTTLCache,
+        summarize_fn: Callable[[str, str], Awaitable[str]],
+    ):
+        self.template_tokens = template_tokens
+        self.max_tokens = max_tokens
+        self.history_max_tokens = history_max_tokens
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_cache = summary_cache
+        self.summarize_fn = summarize_fn
+        self._refreshing: set = set()
+        self.summary_refreshes = 0
+        self.summary_failures = 0
+
+    # ---------------------------------------------------------
+    # 💬 대화 기록
+    # ---------------------------------------------------------
+    def history_section(self, key: str, turns: List[Turn], budget: int) -> Tuple[str, Dict[str, int]]:
+        """최근 턴은 그대로, 오래된 턴은 요약으로. (요약 / 최근 턴 텍스트, 구역별 토큰 수)"""
+        recent = turns[-self.recent_turns:] if self.recent_turns > 0 else []
+        older = turns[: len(turns) - len(recent)]
+
+        # 최근 턴이 예산을 넘으면 오래된 쪽부터 요약 대상으로 넘김 (마지막 턴은 잘라서라도 유지)
+        recent_text = format_turns(recent)
+        while len(recent) > 1 and count_tokens(recent_text) > budget:
+            older.append(recent.pop(0))
+            recent_text = format_turns(recent)
+        recent_text = truncate_tokens(recent_text, budget)
+        recent_tokens = count_tokens(recent_text) if recent_text else 0
+
+        summary_text = ""
+        if older:
+            summarized_turns, summary = self.summary_cache.get(key) or (0, "")
+            if summarized_turns > len(older): # 다른 대화와 키가 겹친 경우 → 요약 무시
+                summarized_turns, summary = 0, ""
+            pending = [
+                (truncate_tokens(user, PENDING_TURN_TOKENS), truncate_tokens(bot, PENDING_TURN_TOKENS))
+                for user, bot in older[summarized_turns:]
+            ]
+            parts = []
+            if summary:
+                parts.append(f"(이전 대화 요약) {summary}")
+            if pending:
+                parts.append(format_turns(pending))
+            summary_text = truncate_tokens("\n".join(parts), max(budget - recent_tokens, 0))
+
+        text = (summary_text + "\n" if summary_text else "") + recent_text
+        return text, {
+            "summary": count_tokens(summary_text) if summary_text else 0,
+            "recent": recent_tokens,
+            "older_turns": len(older),
+            "recent_turns": len(recent),
+        }
+
+    def needs_summary(self, key: str, turns: List[Turn]) -> bool:
+        older_count = max(len(turns) - self.recent_turns, 0)
+        summarized_turns, _ = self.summary_cache.get(key) or (0, "")
+        return older_count > summarized_turns
+
+    async def refresh_summary(self, key: str, turns: List[Turn]) -> None:
+        """최근 턴 창 밖으로 밀려난 턴을 요약에 반영합니다. (대화별로 한 번에 하나만 실행)"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        try:
+            older = turns[: max(len(turns) - self.recent_turns, 0)]
+            summarized_turns, summary = self.summary_cache.get(key) or (0, "")
+            if summarized_turns > len(older):
+                summarized_turns, summary = 0, ""
+            new_turns = older[summarized_turns:]
+            if not new_turns:
+                return
+            updated = await self.summarize_fn(summary, format_turns(new_turns))
+            self.summary_cache.set(key, (len(older), truncate_tokens(updated.strip(), self.summary_max_tokens)))
+            self.summary_refreshes += 1
+        except Exception as e:
+            self.summary_failures += 1
+            print(f"⚠️ 대화 요약 갱신 실패: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def schedule_refresh(self, key: str, turns: List[Turn]) -> None:
+        """이벤트 루프 안에서 호출되면 요약 갱신을 백그라운드 작업으로 예약합니다."""
+        if not self.needs_summary(key, turns):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.create_task(self.refresh_summary(key, turns))
+
+    # ---------------------------------------------------------
+    # 📄 검색 문서
+    # ---------------------------------------------------------
+    @staticmethod
+    def context_section(doc_blocks: List[str], budget: int) -> Tuple[List[str], int]:
+        """순위가 높은 문서부터 예산 안에 들어가는 만큼만 남깁니다. (첫 문서는 잘라서라도 포함)"""
+        kept, used = [], 0
+        for block in doc_blocks:
+            tokens = count_tokens(block)
+            if used + tokens > budget:
+                if not kept and budget > 0:
+                    block = truncate_tokens(block, budget)
+                    kept.append(block)
+                    used += count_tokens(block)
+                break
+            kept.append(block)
+            used += tokens
+        return kept, used
+
+    # ---------------------------------------------------------
+    # 🧾 전체 배분
+    # ---------------------------------------------------------
+    def fit(
+        self, key: str, turns: List[Turn], doc_blocks: List[str], question: str, user_context: str
+    ) -> Tuple[str, List[str], Dict[str, int]]:
+        """(대화 기록 텍스트, 남긴 문서 블록 목록, 토큰 보고서)"""
+        fixed = self.template_tokens + count_tokens(question) + count_tokens(user_context)
+        remaining = max(self.max_tokens - fixed, 0)
+
+        # 대화 기록은 history_max_tokens까지 쓰되, 검색 문서 몫을 남기기 위해 남은 예산의 1/3 이상은
+        # 문서가 다 들어가고 남는 만큼만 씁니다. (문서가 답변 품질에 더 중요)
+        context_need = sum(count_tokens(block) for block in doc_blocks)
+        history_budget = min(self.history_max_tokens, max(remaining - context_need, remaining // 3))
+        history_text, history_report = self.history_section(key, turns, history_budget)
+        history_tokens = history_report["summary"] + history_report["recent"]
+        kept, context_tokens = self.context_section(doc_blocks, remaining - history_tokens)
+
+        report = {
+            "template": self.template_tokens,
+            "profile": count_tokens(user_context),
+            "question": count_tokens(question),
+            "history": history_tokens,
+            **{f"history_{k}": v for k, v in history_report.items()},
+            "context": context_tokens,
+            "docs_kept": len(kept),
+            "docs_total": len(doc_blocks),
+        }
+        report["total"] = fixed + history_tokens + context_tokens
+        return history_text, kept, report
@@ -0,0 +1,189 @@
+import re
+import time
+import itertools
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 질문 정규화: 유니코드(NFC) 통일, 소문자, 공백 정리, 끝 문장부호 제거"""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.strip(" ?!.~,")
+
+
+class LRUTTLCache:
+    """
+    크기 제한(LRU) + 유효기간(TTL)을 가진 단순 메모리 캐시.
+    - 가장 오래 안 쓴 항목부터 밀어내고, TTL이 지난 항목은 조회 시 버립니다.
+    - hits / misses 카운터로 캐시 크기를 가늠할 수 있습니다.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SemanticAnswerCache:
+    """
+    💬 의미 기반 답변 캐시
+    - 같은 조건(context_key: 사용자 프로필 + 대화 기록) 안에서 질문 임베딩의
+      코사인 유사도가 threshold 이상인 이전 답변을 그대로 돌려줍니다.
+    - 크기 초과 시 가장 오래 안 쓴 답변부터 제거(LRU), TTL이 지나면 만료됩니다.
+    - version_fn이 돌려주는 코퍼스 버전이 바뀌면(새 공고 업로드) 전체를 비웁니다.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        ttl_seconds: float = 600,
+        threshold: float = 0.95,
+        version_fn: Optional[Callable[[], str]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.version_fn = version_fn
+        self._version = version_fn() if version_fn else ""
+        # entry_id -> (context_key, 단위 벡터, 값, 만료 시각)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._by_context: Dict[Hashable, List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self) -> None:
+        if not self.version_fn:
+            return
+        current = self.version_fn()
+        if current != self._version:
+            self._version = current
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._by_context.clear()
+
+    def _remove(self, entry_id: int) -> None:
+        context_key = self._entries.pop(entry_id)[0]
+        ids = self._by_context.get(context_key)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._by_context[context_key]
+
+    def lookup(self, vector: List[float], context_key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_version()
+
+            now = time.monotonic()
+            for entry_id in list(self._by_context.get(context_key, [])):
+                if self._entries[entry_id][3] < now:
+                    self._remove(entry_id)
+
+            ids = self._by_context.get(context_key)
+            if not ids:
+                self.misses += 1
+                return None
+
+            query = np.array(vector, dtype=np.float32)
+            query /= (np.linalg.norm(query) or 1.0)
+            matrix = np.stack([self._entries[i][1] for i in ids])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return self._entries[entry_id][2]
+
+    def store(self, vector: List[float], context_key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._check_version()
+
+            unit = np.array(vector, dtype=np.float32)
+            unit /= (np.linalg.norm(unit) or 1.0)
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (context_key, unit, value, time.monotonic() + self.ttl_seconds)
+            self._by_context.setdefault(context_key, []).append(entry_id)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
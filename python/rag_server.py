@@ -1,30 +1,48 @@
 import os
-from fastapi import FastAPI
+import json
+import time
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import date
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware # 🌟 [추가] CORS 미들웨어
 from pydantic import BaseModel
 from uvicorn import run
 from dotenv import load_dotenv
-from operator import itemgetter
 
-# 1. 임베딩은 OpenAI 유지
-from langchain_openai import OpenAIEmbeddings 
-
-# 2. LLM은 Google Gemini 사용
-from langchain_google_genai import ChatGoogleGenerativeAI 
-
-from langchain_pinecone import PineconeVectorStore
+# 임베딩은 OpenAI, LLM은 Google Gemini (SDK는 RagComponents 안에서 import)
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-from langchain.retrievers import EnsembleRetriever 
-from typing import List, Dict, Any
+from langchain_core.documents import Document
+from typing import List, Dict, Any, Optional
+
+from rag_cache import LRUTTLCache, SemanticAnswerCache, normalize_query
+from coalescing import BatchedEmbeddings, SingleFlight
+from embedding_store import EmbeddingStore, StoredEmbeddings
+from geo_index import GeoStore, is_nearby_question, radius_in_question, valid_point
+from intent_router import IntentRouter
+from recommendations import JOB, POLICY, RecommendationStore, segment_for
+from retrieval import SharedEmbeddingRetriever
+from corpus_state import VECTOR_BACKEND, read_corpus_version, resolve_index
+from session_store import SESSION_DB, SessionStore, compact, dicts_to_docs, docs_to_dicts, doc_key, is_followup, merge_docs
+from local_vector_store import LocalIndex, LocalVectorStore
+from lexical_index import LexicalIndex
+from metadata_filters import build_job_filter, date_ymd, normalize_region
+from prompt_budget import PromptBudgeter, conversation_key, format_turns, split_turns
+from token_utils import count_tokens
+from metrics import StageTimer, render_cache_metrics, render_gauges, render_stage_metrics, server_timing_header
 
 # --- 1. .env 파일에서 API 키 로드 ---
 load_dotenv()
 
 if not os.getenv("OPENAI_API_KEY"):
     raise ValueError("OPENAI_API_KEY가 .env 파일에 설정되지 않았습니다.")
-if not os.getenv("PINECONE_API_KEY"):
+if VECTOR_BACKEND == "pinecone" and not os.getenv("PINECONE_API_KEY"):
     raise ValueError("PINECONE_API_KEY가 .env 파일에 설정되지 않았습니다.")
 if not os.getenv("GOOGLE_API_KEY"):
     raise ValueError("GOOGLE_API_KEY가 .env 파일에 설정되지 않았습니다.")
@@ -35,99 +53,150 @@ INDEX_NAME_POLICY = "policy-chatbot"      # 기존 정책 데이터
 INDEX_NAME_JOB = "job-postings-index"     # 신규 채용 공고
 # ---------------------------------------------
 
+# --- 동시 처리 설정 ---
+# 한 워커가 동시에 처리할 최대 챗 수 (초과분은 대기열에서 기다림)
+MAX_CONCURRENT_CHATS = int(os.getenv("RAG_MAX_CONCURRENT_CHATS", 32))
+# 대기열에서 자리를 기다리는 최대 시간 (초) — 넘으면 503 반환
+QUEUE_TIMEOUT = float(os.getenv("RAG_QUEUE_TIMEOUT", 10))
+# 검색 + LLM 생성 전체에 허용하는 최대 시간 (초)
+REQUEST_TIMEOUT = float(os.getenv("RAG_REQUEST_TIMEOUT", 60))
+# ---------------------------------------------
 
-# --- 3. RAG 챗봇 핵심 구성 요소 초기화 ---
-try:
-    print("RAG 챗봇 구성 요소를 초기화합니다...")
+# --- 검색 개수 설정 ---
+DENSE_K = int(os.getenv("RAG_DENSE_K", 3))       # 인덱스별 벡터 검색 개수
+LEXICAL_K = int(os.getenv("RAG_LEXICAL_K", 3))   # 인덱스별 BM25 역색인 검색 개수
+MAX_CHUNKS_PER_DOC = int(os.getenv("RAG_MAX_CHUNKS_PER_DOC", 2)) # 긴 공고에서 프롬프트에 넣을 최대 청크 수
+# ---------------------------------------------
 
-    # 🌟 [모델] Gemini 2.0 Flash Exp
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-exp", 
-        temperature=0.0
-    )
+# --- 쿼리 임베딩 캐시 설정 ---
+EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", 2048))
+EMBED_CACHE_TTL = float(os.getenv("RAG_EMBED_CACHE_TTL", 3600))
+# 1이면 질문 임베딩을 DATA_DIR의 임베딩 보관소에도 남겨 재시작 / 다른 워커에서도 재사용
+EMBED_STORE = os.getenv("RAG_EMBED_STORE", "1") == "1"
+# ---------------------------------------------
 
-    # ⚠️ [임베딩] OpenAI
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-
-    # ---------------------------------------------------------
-    # 🔍 1번 검색기: 정책 데이터
-    # ---------------------------------------------------------
-    print(f"📡 인덱스 1 연결 중: {INDEX_NAME_POLICY}")
-    vectorstore_policy = PineconeVectorStore.from_existing_index(
-        index_name=INDEX_NAME_POLICY,
-        embedding=embeddings,
-        text_key="embedding_text"
-    )
-    retriever_policy = vectorstore_policy.as_retriever(
-        search_type="similarity",
-        search_kwargs={'k': 3} 
-    )
+# --- 요청 합치기 설정 ---
+# 이 시간(ms) 안에 들어온 질문 임베딩을 한 번의 API 호출로 묶음 (0이면 끔)
+EMBED_BATCH_WINDOW_MS = float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", 5))
+EMBED_BATCH_MAX = int(os.getenv("RAG_EMBED_BATCH_MAX", 64)) # 이만큼 모이면 기다리지 않고 바로 보냄
+# 1이면 같은 질문(+ 프로필 / 대화 기록)이 처리 중일 때 새로 생성하지 않고 그 답변을 함께 받음
+SINGLE_FLIGHT = os.getenv("RAG_SINGLE_FLIGHT", "1") == "1"
+# ---------------------------------------------
+
+# --- 질문 의도 분류 설정 ---
+# 1이면 인사 / 고정 질문은 템플릿으로 바로 답하고, 잡담은 검색 없이 LLM만 사용
+INTENT_ROUTING = os.getenv("RAG_INTENT_ROUTING", "1") == "1"
+# 질문 임베딩과 의도 예문 중심 벡터의 코사인 유사도가 이 값 이상일 때만 정보 요청이 아닌 것으로 판단
+INTENT_THRESHOLD = float(os.getenv("RAG_INTENT_THRESHOLD", 0.8))
+# ---------------------------------------------
+
+# --- 추천 목록 설정 ---
+# "추천해줘" 질문에 벡터 검색 대신 쓰는 미리 계산된 목록에서 꺼낼 개수 (post_to_pinecone.py가 갱신)
+RECOMMEND_JOBS = int(os.getenv("RAG_RECOMMEND_JOBS", 5))
+RECOMMEND_POLICIES = int(os.getenv("RAG_RECOMMEND_POLICIES", 3))
+# ---------------------------------------------
+
+# --- 의미 기반 답변 캐시 설정 ---
+# 질문 임베딩 코사인 유사도가 이 값 이상이고 프로필/대화 기록이 같으면 이전 답변 재사용
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", 512))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", 600))
+# ---------------------------------------------
+
+# --- 프롬프트 토큰 예산 설정 ---
+PROMPT_MAX_TOKENS = int(os.getenv("RAG_PROMPT_MAX_TOKENS", 6000))     # 프롬프트 전체 상한
+HISTORY_MAX_TOKENS = int(os.getenv("RAG_HISTORY_MAX_TOKENS", 1500))   # 대화 기록(요약 + 최근 턴) 상한
+HISTORY_RECENT_TURNS = int(os.getenv("RAG_HISTORY_RECENT_TURNS", 3))  # 그대로 넣는 최근 턴 수
+SUMMARY_MAX_TOKENS = int(os.getenv("RAG_SUMMARY_MAX_TOKENS", 300))    # 오래된 턴 요약 길이 상한
+SUMMARY_CACHE_SIZE = int(os.getenv("RAG_SUMMARY_CACHE_SIZE", 1024))   # 요약을 보관하는 대화 수
+SUMMARY_CACHE_TTL = float(os.getenv("RAG_SUMMARY_CACHE_TTL", 6 * 3600))
+# ---------------------------------------------
+
+# --- 대화 세션 설정 (session_store.py) ---
+# 요청에 session_id가 있으면 서버에 보관한 대화(요약 + 최근 턴)와 마지막 답변 문서를 씀 (history는 첫 요청에만 필요)
+SESSION_CACHE_SIZE = int(os.getenv("RAG_SESSION_CACHE_SIZE", 4096))
+SESSION_TTL = float(os.getenv("RAG_SESSION_TTL", 6 * 3600))
+SESSION_BACKEND = os.getenv("RAG_SESSION_BACKEND", "memory")      # sqlite면 DATA_DIR에도 저장 (재시작 / 여러 워커 공유)
+SESSION_MAX_TURNS = int(os.getenv("RAG_SESSION_MAX_TURNS", 20))   # 요약이 밀려도 세션에 남기는 최대 턴 수
+SESSION_CARRY_DOCS = int(os.getenv("RAG_SESSION_CARRY_DOCS", 2))  # 새 검색 결과 뒤에 이어 붙일 이전 답변 문서 수
+# ---------------------------------------------
+
+# --- 근처 공고 검색 설정 (요청에 location이 있고 "근처" 질문일 때, geo_index.py) ---
+GEO_SEARCH = os.getenv("RAG_GEO_SEARCH", "1") == "1"
+GEO_RADIUS_KM = float(os.getenv("RAG_GEO_RADIUS_KM", 10))          # 질문에 거리가 없을 때의 반경
+GEO_MAX_CANDIDATES = int(os.getenv("RAG_GEO_MAX_CANDIDATES", 200)) # 채용 공고 검색 필터로 넘길 최대 공고 수 (가까운 순)
+GEO_NEAREST_K = int(os.getenv("RAG_GEO_NEAREST_K", 20))            # 반경 안에 없으면 대신 쓰는 가장 가까운 공고 수
+GEO_WEIGHT = float(os.getenv("RAG_GEO_WEIGHT", 0.5))               # 최종 순위에서 거리 비중 (나머지는 검색 관련도)
+# ---------------------------------------------
+
+# --- 서버 / 워커 설정 ---
+HOST = os.getenv("RAG_HOST", "0.0.0.0")
+PORT = int(os.getenv("RAG_PORT", 8001))
+WORKERS = int(os.getenv("RAG_WORKERS", 1))                       # 워커 프로세스 수 (코어 수만큼까지)
+WORKER_MAX_REQUESTS = int(os.getenv("RAG_WORKER_MAX_REQUESTS", 0)) # N건 처리한 워커는 재시작 (0이면 끔)
+KEEP_ALIVE_TIMEOUT = int(os.getenv("RAG_KEEP_ALIVE_TIMEOUT", 65)) # Node 프록시의 keep-alive(60초)보다 길게
+EAGER_INIT = os.getenv("RAG_EAGER_INIT", "1") == "1"               # 0이면 첫 요청(또는 /readyz) 때 초기화
+# ---------------------------------------------
+
+# --- 외부 API 연결 풀 ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("RAG_HTTP_MAX_KEEPALIVE", 20))       # 재사용을 위해 열어 두는 연결 수
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("RAG_HTTP_KEEPALIVE_EXPIRY", 30)) # 쉬는 연결을 닫기까지 (초)
+PINECONE_POOL_THREADS = int(os.getenv("RAG_PINECONE_POOL_THREADS", 4))
+# ---------------------------------------------
+
+# --- 지연 시간 측정 설정 ---
+# 1이면 모든 응답에 단계별 시간(Server-Timing 헤더 / 스트리밍 done 이벤트의 timings)을 붙입니다.
+# 0이어도 요청 헤더에 X-Timing: 1이 있으면 그 요청에만 붙입니다. (/metrics는 항상 켜져 있음)
+TIMING_HEADER = os.getenv("RAG_TIMING_HEADER", "0") == "1"
+# ---------------------------------------------
 
-    # ---------------------------------------------------------
-    # 🔍 2번 검색기: 채용 공고
-    # ---------------------------------------------------------
-    print(f"📡 인덱스 2 연결 중: {INDEX_NAME_JOB}")
-    vectorstore_job = PineconeVectorStore.from_existing_index(
-        index_name=INDEX_NAME_JOB,
-        embedding=embeddings,
-        text_key="context_text"
-    )
-    retriever_job = vectorstore_job.as_retriever(
-        search_type="similarity",
-        search_kwargs={'k': 3} 
-    )
 
-    # ---------------------------------------------------------
-    # 🤝 앙상블 검색기 (통합)
-    # ---------------------------------------------------------
-    print("🔗 두 검색기를 하나로 통합(Ensemble)합니다...")
-    ensemble_retriever = EnsembleRetriever(
-        retrievers=[retriever_policy, retriever_job],
-        weights=[0.5, 0.5] 
+# --- 3. RAG 챗봇 핵심 구성 요소 (워커 프로세스마다 처음 필요할 때 한 번 생성) ---
+# import 시점에는 아무 클라이언트도 만들지 않으므로 워커가 빨리 뜨고,
+# 서버는 포트를 연 직후(lifespan) 백그라운드에서 초기화합니다. (/readyz가 완료를 알려줌)
+# 초기화가 끝나기 전에 온 요청은 끝날 때까지 기다렸다가 처리하고, 실패하면 다음 요청에서 다시 시도합니다.
+
+# ---------------------------------------------------------
+# 🌟 [핵심 기능] 메타데이터 포맷팅 함수
+# Pinecone의 'metadata' 필드를 끄집어내어 텍스트로 변환합니다.
+# (문서마다 블록 하나 → 토큰 예산 단계가 순위대로 잘라냄)
+# ---------------------------------------------------------
+def format_doc_with_metadata(i, doc):
+    meta = doc.metadata
+    content = doc.page_content
+
+    # 메타데이터에서 안전하게 값 가져오기 (없으면 '정보 없음' 등)
+    title = meta.get('title') or meta.get('policy_name') or "제목 없음"
+
+    # 채용 공고 관련 필드
+    end_date = meta.get('apply_end_date', '')
+    method = meta.get('apply_method', '')
+    link = meta.get('apply_link', '')
+    category = meta.get('job_category', '')
+
+    # 정책 관련 필드 (필요시 추가)
+    target = meta.get('target_audience', '')
+
+    # LLM에게 보여줄 텍스트 블록 조립
+    doc_str = (
+        f"--- [문서 {i+1}: {title}] ---\n"
+        f"내용: {content}\n"
     )
 
-    # ---------------------------------------------------------
-    # 🌟 [핵심 기능] 메타데이터 포맷팅 함수
-    # Pinecone의 'metadata' 필드를 끄집어내어 텍스트로 변환합니다.
-    # ---------------------------------------------------------
-    def format_docs_with_metadata(docs):
-        formatted_results = []
-        for i, doc in enumerate(docs):
-            meta = doc.metadata
-            content = doc.page_content
-            
-            # 메타데이터에서 안전하게 값 가져오기 (없으면 '정보 없음' 등)
-            title = meta.get('title') or meta.get('policy_name') or "제목 없음"
-            
-            # 채용 공고 관련 필드
-            end_date = meta.get('apply_end_date', '')
-            method = meta.get('apply_method', '')
-            link = meta.get('apply_link', '')
-            category = meta.get('job_category', '')
-            
-            # 정책 관련 필드 (필요시 추가)
-            target = meta.get('target_audience', '')
+    # 정보가 있는 경우에만 라인 추가 (깔끔하게)
+    if end_date: doc_str += f"마감일: {end_date}\n"
+    if method: doc_str += f"신청방법: {method}\n"
+    if link: doc_str += f"링크: {link}\n"
+    if category: doc_str += f"분야: {category}\n"
+    if target: doc_str += f"대상: {target}\n"
+    if meta.get('distance_km') is not None: doc_str += f"거리: 약 {meta['distance_km']}km\n"
 
-            # LLM에게 보여줄 텍스트 블록 조립
-            doc_str = (
-                f"--- [문서 {i+1}: {title}] ---\n"
-                f"내용: {content}\n"
-            )
-            
-            # 정보가 있는 경우에만 라인 추가 (깔끔하게)
-            if end_date: doc_str += f"마감일: {end_date}\n"
-            if method: doc_str += f"신청방법: {method}\n"
-            if link: doc_str += f"링크: {link}\n"
-            if category: doc_str += f"분야: {category}\n"
-            if target: doc_str += f"대상: {target}\n"
-            
-            formatted_results.append(doc_str)
-        
-        return "\n\n".join(formatted_results)
+    return doc_str
 
 
-    # 🌟 [프롬프트] 메타데이터 활용 지침 추가
-    prompt_template = """
+# 🌟 [프롬프트] 메타데이터 활용 지침 추가
+prompt_template = """
     당신은 사용자에게 '지역 정책' 및 '채용 공고'를 안내하는 똑똑한 AI 어시스턴트, **'Jobs(잡스)'**입니다.
     
     [🧹 데이터 정제 및 필터링 규칙 (최우선 적용)]
@@ -167,124 +236,1090 @@ try:
 
     [Jobs의 답변]
     """
-    
-    PROMPT = PromptTemplate.from_template(prompt_template)
-
-    # 🌟 [LCEL 체인 구성] (기존 ConversationalRetrievalChain 대체)
-    # 1. 질문이 들어오면 -> 2. 검색기(retriever)가 문서를 찾고 -> 
-    # 3. format_docs_with_metadata가 메타데이터를 텍스트로 변환 -> 4. 프롬프트 -> 5. LLM
-    rag_chain = (
-        {
-            "context": itemgetter("question") | ensemble_retriever | format_docs_with_metadata,
-            "question": itemgetter("question"),
-            "chat_history": itemgetter("chat_history"),
-            "user_context_prompt": itemgetter("user_context_prompt"),
+
+PROMPT = PromptTemplate.from_template(prompt_template)
+
+# 오래된 대화 턴 요약용 프롬프트 (토큰 예산 단계가 백그라운드에서 사용)
+SUMMARY_PROMPT = PromptTemplate.from_template(
+    "다음은 사용자와 챗봇 'Jobs'의 대화입니다. 이후 답변에 필요한 정보(사용자의 조건, 관심 분야, "
+    "이미 안내한 정책/공고 이름)만 남겨 한국어 5문장 이내로 요약하세요.\n\n"
+    "[기존 요약]\n{summary}\n\n[새 대화]\n{turns}\n\n[요약]"
+)
+
+# ⏱️ 단계별 지연 시간 (초기화 전에도 /metrics가 동작하도록 모듈에 하나)
+stage_timer = StageTimer()
+
+
+class RagComponents:
+    """
+    LLM / 임베딩 / 벡터 저장소 / 검색기 / 캐시 / 체인 묶음.
+    OpenAI 호출은 keep-alive 연결 풀(httpx)을 공유해 요청마다 TLS 연결을 새로 맺지 않습니다.
+    """
+
+    def __init__(self):
+        # 무거운 SDK는 여기서 import (서버 import / 워커 기동을 가볍게)
+        from langchain_openai import OpenAIEmbeddings
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        started = time.perf_counter()
+        print("RAG 챗봇 구성 요소를 초기화합니다...")
+
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.http_client = httpx.Client(limits=limits)
+        self.http_async_client = httpx.AsyncClient(limits=limits)
+
+        # 🌟 [모델] Gemini 2.0 Flash Exp
+        self.llm = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash-exp", 
+            temperature=0.0
+        )
+
+        # ⚠️ [임베딩] OpenAI (보관소에 있는 문장은 API를 부르지 않음)
+        self.embeddings = OpenAIEmbeddings(
+            model="text-embedding-3-small",
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+        )
+        self.embedding_store = EmbeddingStore("text-embedding-3-small", 1536) if EMBED_STORE else None
+        if self.embedding_store is not None:
+            self.embeddings = StoredEmbeddings(self.embeddings, self.embedding_store)
+
+        # ---------------------------------------------------------
+        # 🔍 1번 검색기: 정책 데이터
+        # ---------------------------------------------------------
+        print(f"📡 인덱스 1 연결 중: {INDEX_NAME_POLICY} ({VECTOR_BACKEND})")
+        self.vectorstore_policy = self.open_vectorstore(INDEX_NAME_POLICY, text_key="embedding_text")
+
+        # ---------------------------------------------------------
+        # 🔍 2번 검색기: 채용 공고 (reindex.py가 별칭을 바꾸면 요청 사이에 새 인덱스로 교체)
+        # ---------------------------------------------------------
+        self.job_index_name = resolve_index(INDEX_NAME_JOB)
+        self.alias_version = read_corpus_version()
+        self.alias_switching = False
+        print(f"📡 인덱스 2 연결 중: {INDEX_NAME_JOB} → {self.job_index_name} ({VECTOR_BACKEND})")
+        self.vectorstore_job = self.open_vectorstore(self.job_index_name, text_key="context_text")
+
+        # ---------------------------------------------------------
+        # 🔤 3·4번 검색기: 로컬 BM25 역색인 (회사명 / 지역 / 태그 정확 일치 보완)
+        # 채용 공고는 post_to_pinecone.py가 갱신, 정책은 `python lexical_index.py policy-chatbot:embedding_text`로 생성
+        # ---------------------------------------------------------
+        lexical_policy = LexicalIndex(INDEX_NAME_POLICY)
+        lexical_job = LexicalIndex(self.job_index_name)
+        print(f"🔤 역색인 로드: 정책 {len(lexical_policy)}개 / 채용 {len(lexical_job)}개 문서")
+
+        # ---------------------------------------------------------
+        # 🤝 앙상블 검색기 (통합)
+        # 질문을 한 번만 임베딩(캐시 우선)하고, 같은 벡터로 두 인덱스를 동시에 조회합니다.
+        # 캐시에 없는 질문 임베딩은 몇 ms씩 모아서 한 번에 요청합니다.
+        # ---------------------------------------------------------
+        print("🔗 검색기들을 하나로 통합(Ensemble)합니다...")
+        self.query_embedding_cache = LRUTTLCache(max_size=EMBED_CACHE_SIZE, ttl_seconds=EMBED_CACHE_TTL)
+        self.query_embedder = BatchedEmbeddings(
+            self.embeddings, window=EMBED_BATCH_WINDOW_MS / 1000, max_batch=EMBED_BATCH_MAX
+        )
+        self.ensemble_retriever = SharedEmbeddingRetriever(
+            embeddings=self.query_embedder,
+            vectorstores=[self.vectorstore_policy, self.vectorstore_job],
+            weights=[0.5, 0.5],
+            k=DENSE_K,
+            embedding_cache=self.query_embedding_cache,
+            lexical_indexes=[lexical_policy, lexical_job],
+            lexical_weights=[0.3, 0.3],
+            lexical_k=LEXICAL_K,
+            max_chunks_per_doc=MAX_CHUNKS_PER_DOC,
+            timer=stage_timer,
+            source_names=["policy", "job"],
+        )
+
+        # 💬 검색 앞단의 답변 캐시 (post_to_pinecone.py가 공고를 올리면 corpus 버전이 바뀌어 자동 무효화)
+        self.answer_cache = SemanticAnswerCache(
+            max_size=ANSWER_CACHE_SIZE,
+            ttl_seconds=ANSWER_CACHE_TTL,
+            threshold=ANSWER_CACHE_THRESHOLD,
+            version_fn=read_corpus_version,
+        )
+        # 🛫 같은 질문이 동시에 들어오면 검색 + 답변 생성을 한 번만
+        self.answer_flights = SingleFlight(enabled=SINGLE_FLIGHT)
+
+        # 🚦 의도 분류기 (예문 임베딩은 DATA_DIR에 저장해 두고 재사용)
+        self.intent_router = IntentRouter(self.embeddings, threshold=INTENT_THRESHOLD) if INTENT_ROUTING else None
+
+        # ⭐ (지역 × 연령대)별 추천 목록 (수집기가 공고가 바뀔 때마다 갱신)
+        self.recommendation_store = RecommendationStore()
+
+        # 📍 공고 위치 격자 (수집기가 위치 표를 바꾸면 다음 "근처" 질문 때 다시 올림)
+        self.geo_store = GeoStore() if GEO_SEARCH else None
+        self.geo_revision, self.geo_index = self.geo_store.load() if self.geo_store is not None else (None, None)
+
+        # 🗂️ 서버 쪽 대화 세션 (요약된 대화 + 마지막 답변 문서)
+        self.session_store = SessionStore(
+            max_size=SESSION_CACHE_SIZE,
+            ttl_seconds=SESSION_TTL,
+            path=SESSION_DB if SESSION_BACKEND == "sqlite" else None,
+        )
+
+        # ---------------------------------------------------------
+        # 🧮 토큰 예산: 오래된 대화는 요약으로, 검색 문서는 순위대로 예산 안에서만
+        # ---------------------------------------------------------
+        self.summary_chain = SUMMARY_PROMPT | self.llm | StrOutputParser()
+        self.prompt_budgeter = PromptBudgeter(
+            template_tokens=count_tokens(PROMPT.format(context="", question="", chat_history="", user_context_prompt="")),
+            max_tokens=PROMPT_MAX_TOKENS,
+            history_max_tokens=HISTORY_MAX_TOKENS,
+            recent_turns=HISTORY_RECENT_TURNS,
+            summary_max_tokens=SUMMARY_MAX_TOKENS,
+            summary_cache=LRUTTLCache(max_size=SUMMARY_CACHE_SIZE, ttl_seconds=SUMMARY_CACHE_TTL),
+            summarize_fn=self.summarize_history,
+        )
+        budget_step = RunnableLambda(self.budget_prompt_inputs, afunc=self.abudget_prompt_inputs)
+
+        # 🌟 [LCEL 체인 구성] (기존 ConversationalRetrievalChain 대체)
+        # 1. 질문이 들어오면 -> 2. 검색기(retriever)가 문서를 찾고 -> 
+        # 3. 토큰 예산 단계가 문서/대화 기록을 텍스트로 변환하며 잘라냄 -> 4. 프롬프트 -> 5. LLM
+        # 검색이 끝난 뒤 답변만 생성하는 체인 (스트리밍 엔드포인트에서 재사용)
+        self.answer_chain = PROMPT | self.llm | StrOutputParser()
+
+        # 검색 단계: 질문과 함께 요청별 메타데이터 필터(지역 / 연령대 / 마감일)를 검색기에 넘깁니다.
+        retrieve_step = RunnableLambda(self.retrieve_docs, afunc=self.aretrieve_docs)
+
+        # (엔드포인트는 LLM 첫 토큰 시간을 재기 위해 같은 순서를 아래 stream_answer로 직접 실행)
+        self.rag_chain = RunnablePassthrough.assign(docs=retrieve_step) | budget_step | self.answer_chain
+
+        print(f"✅ RAG 챗봇 체인 초기화 완료 (LCEL 방식 + 메타데이터 연동, {time.perf_counter() - started:.1f}초).")
+
+    def open_vectorstore(self, index_name, text_key):
+        """VECTOR_BACKEND 설정에 따라 Pinecone 또는 로컬 인덱스를 엽니다."""
+        if VECTOR_BACKEND == "local":
+            return LocalVectorStore(LocalIndex(index_name), self.embeddings, text_key=text_key)
+        from langchain_pinecone import PineconeVectorStore
+        return PineconeVectorStore.from_existing_index(
+            index_name=index_name,
+            embedding=self.embeddings,
+            text_key=text_key,
+            pool_threads=PINECONE_POOL_THREADS,
+        )
+
+    async def afollow_index_alias(self):
+        """
+        🔀 채용 공고 인덱스 별칭이 바뀌었으면 새 인덱스로 교체합니다. (reindex.py switch / rollback)
+        별칭을 바꾸면 코퍼스 버전도 바뀌므로 버전이 그대로면 별칭 파일을 읽지 않습니다.
+        """
+        version = read_corpus_version()
+        if version == self.alias_version or self.alias_switching:
+            return
+        target = resolve_index(INDEX_NAME_JOB)
+        if target == self.job_index_name:
+            self.alias_version = version
+            return
+        # 인덱스 열기(로컬이면 파일 읽기)는 스레드에서, 교체는 목록을 통째로 바꿔 진행 중인 검색에 영향 없게
+        # (실패하면 alias_version이 그대로라 다음 요청에서 다시 시도)
+        self.alias_switching = True
+        try:
+            vectorstore, lexical = await asyncio.to_thread(
+                lambda: (self.open_vectorstore(target, text_key="context_text"), LexicalIndex(target))
+            )
+        finally:
+            self.alias_switching = False
+        self.alias_version = version
+        retriever = self.ensemble_retriever
+        retriever.vectorstores = [self.vectorstore_policy, vectorstore]
+        retriever.lexical_indexes = [retriever.lexical_indexes[0], lexical]
+        self.vectorstore_job = vectorstore
+        print(f"🔀 채용 공고 인덱스 전환: {self.job_index_name} → {target}")
+        self.job_index_name = target
+
+    async def arefresh_geo(self):
+        """위치 표가 바뀌었으면 격자를 다시 만듭니다. (읽기 / 만들기는 스레드에서, 교체는 한 번에)"""
+        revision = await asyncio.to_thread(self.geo_store.revision)
+        if revision != self.geo_revision:
+            self.geo_revision, self.geo_index = await asyncio.to_thread(self.geo_store.load)
+
+    def retrieve_docs(self, inputs):
+        return self.ensemble_retriever.invoke(inputs["question"], filters=inputs.get("filters"))
+
+    async def aretrieve_docs(self, inputs):
+        return await self.ensemble_retriever.ainvoke(inputs["question"], filters=inputs.get("filters"))
+
+    async def summarize_history(self, summary, turns_text):
+        return await self.summary_chain.ainvoke({"summary": summary or "(없음)", "turns": turns_text})
+
+    def budget_prompt_inputs(self, inputs):
+        """검색 결과와 대화 기록을 토큰 예산에 맞춰 프롬프트 입력으로 만듭니다."""
+        docs = inputs["docs"]
+        with stage_timer.span("format"):
+            history_text, kept, report = self.prompt_budgeter.fit(
+                inputs["conversation_key"],
+                inputs["history_turns"],
+                [format_doc_with_metadata(i, doc) for i, doc in enumerate(docs)],
+                inputs["question"],
+                inputs["user_context_prompt"],
+            )
+        print(
+            f"🧮 프롬프트 토큰 {report['total']}/{self.prompt_budgeter.max_tokens} "
+            f"(템플릿 {report['template']} · 프로필 {report['profile']} · 질문 {report['question']} "
+            f"· 대화 {report['history']} [요약 {report['history_summary']} + 최근 {report['history_recent_turns']}턴 {report['history_recent']}] "
+            f"· 문서 {report['context']} [{report['docs_kept']}/{report['docs_total']}개])"
+        )
+        return {
+            "question": inputs["question"],
+            "chat_history": history_text,
+            "user_context_prompt": inputs["user_context_prompt"],
+            "context": "\n\n".join(kept),
+            "docs": docs[: report["docs_kept"]],
         }
-        | PROMPT
-        | llm
-        | StrOutputParser()
-    )
 
-    print("✅ RAG 챗봇 체인 초기화 완료 (LCEL 방식 + 메타데이터 연동).")
+    async def abudget_prompt_inputs(self, inputs):
+        prompt_inputs = self.budget_prompt_inputs(inputs)
+        # 최근 턴 창에서 밀려난 턴이 있으면 답변 생성과 동시에 요약을 갱신 (다음 턴부터 사용)
+        self.prompt_budgeter.schedule_refresh(inputs["conversation_key"], inputs["history_turns"])
+        return prompt_inputs
+
+    async def aclose(self):
+        """종료 시 연결 풀 정리 (Pinecone은 동기 클라이언트의 스레드 풀)"""
+        self.http_client.close()
+        await self.http_async_client.aclose()
+        for vectorstore in (self.vectorstore_policy, self.vectorstore_job):
+            index = getattr(vectorstore, "_index", None)
+            if index is not None and hasattr(index, "close"):
+                await asyncio.to_thread(index.close)
+
 
-except Exception as e:
-    print(f"🚨 RAG 초기화 중 심각한 오류 발생: {e}")
-    print("API 키(.env), Pinecone 인덱스 이름, 라이브러리 설치를 확인하세요.")
-    exit(1)
+_rag: Optional[RagComponents] = None
+_rag_lock = threading.Lock()
+_warmup_task: Optional[asyncio.Task] = None
+rag_status = {"error": None, "startup_seconds": None}
+_process_started = time.perf_counter()
+
+
+def get_rag() -> RagComponents:
+    """구성 요소를 처음 필요할 때 한 번만 만듭니다. (여러 요청이 동시에 불러도 한 번)"""
+    global _rag
+    if _rag is None:
+        with _rag_lock:
+            if _rag is None:
+                try:
+                    _rag = RagComponents()
+                except Exception as e:
+                    rag_status["error"] = f"{type(e).__name__}: {e}"
+                    print(f"🚨 RAG 초기화 중 심각한 오류 발생: {e}")
+                    print("API 키(.env), Pinecone 인덱스 이름, 라이브러리 설치를 확인하세요.")
+                    raise
+                rag_status["error"] = None
+                rag_status["startup_seconds"] = round(time.perf_counter() - _process_started, 2)
+    return _rag
+
+
+async def aget_rag() -> RagComponents:
+    """이벤트 루프를 막지 않고 구성 요소를 가져옵니다. (처음 한 번은 스레드에서 생성)"""
+    if _rag is not None:
+        return _rag
+    return await asyncio.to_thread(get_rag)
+
+
+async def require_rag() -> RagComponents:
+    """엔드포인트 의존성: 초기화에 실패했으면 503 (별칭이 바뀌었으면 새 인덱스로 교체한 뒤 반환)"""
+    try:
+        rag = await aget_rag()
+    except Exception:
+        raise HTTPException(status_code=503, detail="챗봇을 준비하지 못했습니다. 잠시 후 다시 시도해주세요.")
+    try:
+        await rag.afollow_index_alias()
+    except Exception as e:
+        print(f"⚠️ 인덱스 별칭 전환 실패 → 이전 인덱스로 계속 검색합니다: {e}")
+    return rag
+
+
+def start_warmup() -> None:
+    """초기화를 백그라운드 작업으로 시작합니다. (이미 끝났거나 진행 중이면 무시)"""
+    global _warmup_task
+    if _rag is not None or (_warmup_task is not None and not _warmup_task.done()):
+        return
+    _warmup_task = asyncio.get_running_loop().create_task(aget_rag())
+    # 실패는 rag_status에 남으므로 여기서는 예외만 회수
+    _warmup_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _rag
+    # 포트를 먼저 열어 liveness에 응답하고, 초기화는 백그라운드에서 (RAG_EAGER_INIT=0이면 첫 요청 때)
+    if EAGER_INIT:
+        start_warmup()
+    yield
+    if _rag is not None:
+        await _rag.aclose()
+        _rag = None
 
 
 # --- 4. FastAPI 서버 설정 ---
-app = FastAPI()
-
-# 🌟 [추가] CORS 미들웨어 설정
-# 모든 도메인(origins=["*"])에서의 접근을 허용합니다.
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
+
+class ChatSlots:
+    """🌟 동시 처리 슬롯: 세마포어가 대기열 역할을 하며, 이벤트 루프는 막지 않습니다. (in_use: /metrics용 사용 중 슬롯 수)"""
+
+    def __init__(self, limit: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_use = 0
+
+    async def acquire(self) -> None:
+        await self._semaphore.acquire()
+        self.in_use += 1
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._semaphore.release()
+
+
+chat_slots = ChatSlots(MAX_CONCURRENT_CHATS)
+
+# 📊 /metrics용 요청 집계 (엔드포인트별 처리 중인 요청 수 / 결과별 요청 수)
+in_flight = {"ask": 0, "ask_stream": 0}
+request_counts: Dict[tuple, int] = defaultdict(int)
 
 class ChatRequest(BaseModel):
     message: str
     history: List[Dict[str, Any]] = []
     user_profile: Dict[str, Any] = {}
+    conversation_id: str | None = None # 있으면 대화 요약 캐시 키로 사용
+    session_id: str | None = None # 있으면 서버에 보관한 대화 세션 사용 (history 생략 가능)
+    resume_session: bool = False  # 클라이언트가 서버에 세션이 있다고 보고 history를 생략했는지 (없으면 409)
+    location: Dict[str, Any] | None = None # {"lat", "lng"} 사용자 위치 (있으면 "근처" 질문을 거리로 좁힘)
 
 class ChatResponse(BaseModel):
     answer: str
     source: str | None = None
+    session_id: str | None = None
 
-@app.post("/ask", response_model=ChatResponse)
-async def ask_question(request: ChatRequest):
-    try:
-        user_message = request.message
-        chat_history_list = request.history
-        user_profile = request.user_profile 
-        
-        print(f"Node.js로부터 받은 질문: {user_message}")
 
-        # 사용자 정보 포매팅
-        user_context_str = ""
-        user_keywords = "" 
+def build_chain_inputs(request: ChatRequest, session: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    요청 본문을 체인 입력으로 변환합니다.
+    (question / chat_history / history_turns / conversation_key / user_context_prompt / filters / carry_docs)
+    session이 있으면 요청의 history 대신 세션의 요약 + 턴을 씁니다.
+    """
+    user_message = request.message
+    chat_history_list = request.history
+    user_profile = request.user_profile 
+    
+    print(f"Node.js로부터 받은 질문: {user_message}")
+
+    # 사용자 정보 포매팅
+    user_context_str = ""
+    user_keywords = "" 
+    
+    if user_profile and (user_profile.get("age") or user_profile.get("region")):
+        info_list = []
+        if user_profile.get("age") and user_profile.get("age") != "알 수 없음":
+            age_val = user_profile['age']
+            info_list.append(f"- 나이: {age_val}")
+            user_keywords += f" {age_val}" 
+        if user_profile.get("region") and user_profile.get("region") != "알 수 없음":
+            region_val = user_profile['region']
+            info_list.append(f"- 거주지: {region_val}")
+            user_keywords += f" {region_val}" 
         
-        if user_profile and (user_profile.get("age") or user_profile.get("region")):
-            info_list = []
-            if user_profile.get("age") and user_profile.get("age") != "알 수 없음":
-                age_val = user_profile['age']
-                info_list.append(f"- 나이: {age_val}")
-                user_keywords += f" {age_val}" 
-            if user_profile.get("region") and user_profile.get("region") != "알 수 없음":
-                region_val = user_profile['region']
-                info_list.append(f"- 거주지: {region_val}")
-                user_keywords += f" {region_val}" 
-            
-            if info_list:
-                user_context_str = "\n".join(info_list)
-            else:
-                user_context_str = "(사용자 정보 없음)"
+        if info_list:
+            user_context_str = "\n".join(info_list)
         else:
-            user_context_str = "(로그인하지 않은 사용자 또는 정보 없음)"
-
-        # 대화 기록 포매팅 (String으로 변환)
-        formatted_history_str = ""
-        user_msg = None
-        for turn in chat_history_list:
-            if turn.get("sender") == "user":
-                user_msg = turn.get("text", "")
-            elif turn.get("sender") == "bot" and user_msg is not None:
-                formatted_history_str += f"User: {user_msg}\nBot: {turn.get('text', '')}\n"
-                user_msg = None 
-
-        # 🌟 검색어 보정 (Query Augmentation)
-        search_query = user_message
-        if "나" in user_message or "내" in user_message or "조건" in user_message or "추천" in user_message:
-            search_query += f" {user_keywords}"
-            print(f"🔍 보정된 검색 쿼리: {search_query}")
-
-        # 🌟 [LCEL 호출] invoke 사용
-        # 이제 chain 내부에서 검색(Retriever)과 포맷팅이 자동으로 일어납니다.
-        bot_reply = rag_chain.invoke({
-            "question": search_query, 
-            "chat_history": formatted_history_str,
-            "user_context_prompt": user_context_str 
+            user_context_str = "(사용자 정보 없음)"
+    else:
+        user_context_str = "(로그인하지 않은 사용자 또는 정보 없음)"
+
+    # 대화 기록을 (사용자, 봇) 턴으로 묶음 (프롬프트에는 토큰 예산 단계가 잘라서 넣음)
+    carry_docs = []
+    if session is not None:
+        history_turns = [tuple(turn) for turn in session["turns"]]
+        formatted_history_str = (f"(이전 대화 요약) {session['summary']}\n" if session["summary"] else "") + format_turns(history_turns)
+        # 새로 검색하더라도 바로 앞 답변의 문서를 몇 개 이어 붙임 (코퍼스가 바뀌었으면 버림)
+        if session["docs"] and session["corpus_version"] == read_corpus_version():
+            carry_docs = dicts_to_docs(session["docs"])[:SESSION_CARRY_DOCS]
+    else:
+        history_turns = split_turns(chat_history_list)
+        formatted_history_str = format_turns(history_turns)
+
+    # 🌟 검색어 보정 (Query Augmentation)
+    search_query = user_message
+    if "나" in user_message or "내" in user_message or "조건" in user_message or "추천" in user_message:
+        search_query += f" {user_keywords}"
+        print(f"🔍 보정된 검색 쿼리: {search_query}")
+
+    # 🌟 검색 필터: 프로필과 오늘 날짜로 채용 공고 후보를 미리 좁힙니다. (정책 인덱스는 필터 없음)
+    job_filter = build_job_filter(user_profile, user_message, date.today())
+
+    return {
+        "question": search_query, 
+        "chat_history": formatted_history_str,
+        "history_turns": history_turns,
+        "conversation_key": conversation_key(history_turns, user_profile, request.session_id or request.conversation_id),
+        "user_context_prompt": user_context_str,
+        "filters": [None, job_filter],
+        "carry_docs": carry_docs,
+        "nearby": None,
+    }
+
+
+async def apply_nearby(rag: RagComponents, request: ChatRequest, chain_inputs: Dict[str, Any]) -> None:
+    """
+    📍 위치가 있는 "근처" 질문이면 메모리 격자에서 가까운 공고를 찾아 채용 공고 검색을 그 공고들로 좁힙니다.
+    (반경 안에 없으면 가장 가까운 GEO_NEAREST_K개, 인덱스 조회는 원래 검색 한 번 그대로)
+    위치가 기준이므로 프로필 거주지 조건은 빼고, 질문에 쓴 지역 조건은 그대로 둡니다.
+    """
+    if rag.geo_store is None or not request.location or not is_nearby_question(request.message):
+        return
+    point = valid_point(request.location.get("lat"), request.location.get("lng"))
+    if point is None:
+        return
+    await rag.arefresh_geo()
+    radius = radius_in_question(request.message) or GEO_RADIUS_KM
+    today = date_ymd(date.today())
+    with stage_timer.span("geo"):
+        nearby = rag.geo_index.within(*point, radius, today, limit=GEO_MAX_CANDIDATES)
+        if not nearby:
+            nearby = rag.geo_index.nearest(*point, GEO_NEAREST_K, today)
+    if not nearby:
+        return
+    profile = {k: v for k, v in request.user_profile.items() if k != "region"}
+    job_filter = build_job_filter(profile, request.message, date.today())
+    chain_inputs["filters"] = [
+        chain_inputs["filters"][0],
+        {"$and": [job_filter, {"post_id": {"$in": [post_id for post_id, _ in nearby]}}]},
+    ]
+    chain_inputs["nearby"] = {
+        "point": (round(point[0], 3), round(point[1], 3)),
+        "radius_km": max(radius, nearby[-1][1]),
+        "distances": dict(nearby),
+    }
+    print(f"📍 근처 공고 {len(nearby)}개 (반경 {radius}km, 가장 가까운 곳 {nearby[0][1]:.1f}km)")
+
+
+def rank_by_distance(docs: List[Document], nearby: Dict[str, Any]) -> List[Document]:
+    """
+    검색 순위(관련도)와 거리를 GEO_WEIGHT 비율로 섞어 다시 정렬하고, 공고에 거리(km)를 붙입니다.
+    (관련도 = 검색 결과 안의 순위, 거리 점수 = 1 - 거리 / 반경, 위치가 없는 문서는 거리 점수 0)
+    """
+    distances, radius = nearby["distances"], nearby["radius_km"] or 1.0
+    scored = []
+    for rank, doc in enumerate(docs):
+        km = distances.get(doc.metadata.get("post_id"))
+        relevance = 1 - rank / len(docs)
+        proximity = max(0.0, 1 - km / radius) if km is not None else 0.0
+        if km is not None:
+            doc = Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "distance_km": round(km, 1)})
+        scored.append((GEO_WEIGHT * proximity + (1 - GEO_WEIGHT) * relevance, doc))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in scored]
+
+
+def answer_cache_key(chain_inputs: Dict[str, str]) -> tuple:
+    """
+    답변 캐시는 프로필과 대화 기록, 검색 필터(근처 질문이면 위치 / 반경까지)가 완전히 같은 경우에만 공유합니다.
+    (필터에는 질문에 쓴 지역이 들어가므로, 임베딩이 비슷한 "서울 일자리" / "부산 일자리"가 답변을 나눠 갖지 않음)
+    """
+    nearby = chain_inputs.get("nearby")
+    location = (nearby["point"], nearby["radius_km"]) if nearby else None
+    filters = json.dumps(chain_inputs["filters"], ensure_ascii=False, sort_keys=True, default=str)
+    return (chain_inputs["user_context_prompt"], chain_inputs["chat_history"], location, filters)
+
+
+def coalesce_key(chain_inputs: Dict[str, Any]) -> tuple:
+    """진행 중인 답변을 함께 받을 수 있는 요청인지 판단하는 키 (정규화한 질문 + 답변 캐시 키 + 이어 붙인 이전 문서)"""
+    carried = json.dumps([doc_key(doc) for doc in chain_inputs["carry_docs"]], ensure_ascii=False)
+    return (normalize_query(chain_inputs["question"]), *answer_cache_key(chain_inputs), carried)
+
+
+def summarize_sources(docs) -> List[Dict[str, str]]:
+    """스트리밍 마지막 이벤트에 실을 출처 문서 요약 (제목 / 링크 / 마감일)"""
+    sources = []
+    for doc in docs:
+        meta = doc.metadata
+        sources.append({
+            "title": meta.get('title') or meta.get('policy_name') or "제목 없음",
+            "link": meta.get('apply_link') or meta.get('source_url') or "",
+            "apply_end_date": meta.get('apply_end_date') or "",
         })
-        
-        # 출처 표시 로직
-        source_doc = "검색된 문서 기반"
+    return sources
 
-        print(f"Gemini 답변: {bot_reply}")
 
-        return {"answer": bot_reply, "source": source_doc}
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Server-Sent Events 한 건을 직렬화합니다. (data는 한 줄 JSON)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    except Exception as e:
-        print(f"🚨 RAG 서버 처리 중 오류: {e}")
-        import traceback
-        traceback.print_exc()
-        return {"answer": "죄송합니다, 답변 생성 중 오류가 발생했습니다.", "source": None}
+
+def timing_requested(http_request: Request) -> bool:
+    """단계별 시간을 응답에 붙일지 여부 (RAG_TIMING_HEADER=1 또는 요청 헤더 X-Timing: 1)"""
+    return TIMING_HEADER or http_request.headers.get("x-timing") == "1"
+
+
+@asynccontextmanager
+async def track_request(endpoint: str):
+    """
+    /metrics용 요청 집계: 처리 중 요청 수, 결과(outcome)별 요청 수, 엔드포인트 전체 시간.
+    yield한 dict의 outcome을 바꿔 결과를 표시합니다. (ok / routed / cache_hit / coalesced / rejected / timeout / error)
+    """
+    state = {"outcome": "ok", "started": time.perf_counter()}
+    in_flight[endpoint] += 1
+    try:
+        yield state
+    except BaseException:
+        if state["outcome"] == "ok":
+            state["outcome"] = "error"
+        raise
+    finally:
+        in_flight[endpoint] -= 1
+        request_counts[(endpoint, state["outcome"])] += 1
+        stage_timer.observe(f"request_{endpoint}", time.perf_counter() - state["started"])
+
+
+async def stream_answer(rag: RagComponents, prompt_inputs: Dict[str, Any], deadline: float):
+    """
+    답변 토큰을 생성되는 대로 내보내며 LLM 첫 토큰까지의 시간(llm_first_token)과
+    전체 생성 시간(llm_total)을 기록합니다. deadline(loop.time() 기준)을 넘으면 asyncio.TimeoutError.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    first_token = True
+    token_stream = rag.answer_chain.astream(prompt_inputs).__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(token_stream.__anext__(), timeout=deadline - loop.time())
+        except StopAsyncIteration:
+            break
+        if chunk:
+            if first_token:
+                stage_timer.observe("llm_first_token", time.perf_counter() - started)
+                first_token = False
+            yield chunk
+    stage_timer.observe("llm_total", time.perf_counter() - started)
+
+
+async def retrieve_and_budget(rag: RagComponents, chain_inputs: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+    """검색 → 토큰 예산 적용까지 (프롬프트 입력 반환, docs는 프롬프트에 들어간 문서만)"""
+    loop = asyncio.get_running_loop()
+    async with stage_timer.aspan("retrieve"):
+        docs = await asyncio.wait_for(
+            rag.ensemble_retriever.ainvoke(chain_inputs["question"], filters=chain_inputs["filters"]),
+            timeout=deadline - loop.time(),
+        )
+    if chain_inputs["nearby"]:
+        docs = rank_by_distance(docs, chain_inputs["nearby"])
+    if chain_inputs["carry_docs"]:
+        docs = merge_docs(docs, chain_inputs["carry_docs"], SESSION_CARRY_DOCS)
+    return await rag.abudget_prompt_inputs({**chain_inputs, "docs": docs})
+
+
+async def route_question(rag: RagComponents, message: str) -> Dict[str, Any]:
+    """
+    🚦 질문 의도 판단: 키워드 규칙 → (애매하면) 질문 임베딩과 가장 가까운 의도.
+    분류기를 껐거나 임베딩에 실패하면 항상 info(전체 RAG 경로)
+    """
+    intent_router = rag.intent_router
+    if intent_router is None:
+        return {"intent": "info", "method": "disabled", "score": None, "answer": None}
+    async with stage_timer.aspan("route"):
+        route = intent_router.classify_rules(message)
+        if route is None:
+            try:
+                # 검색 보정이 없는 질문이면 같은 임베딩이 캐시되어 답변 캐시 / 검색 단계에서 재사용됨
+                vector = await asyncio.wait_for(rag.ensemble_retriever.aembed_query(message), timeout=REQUEST_TIMEOUT)
+                route = intent_router.classify_vector(vector)
+            except Exception as e:
+                print(f"⚠️ 의도 판단용 임베딩 실패 → 정보 요청으로 처리: {e}")
+                route = {"intent": "info", "method": "default", "score": None, "answer": None}
+    intent_router.record(route)
+    print(f"🚦 질문 의도: {route['intent']} ({route['method']})")
+    return route
+
+
+def recommended_docs(rag: RagComponents, request: ChatRequest) -> List[Document]:
+    """⭐ 미리 계산된 (지역 × 연령대) 추천 목록 → 프롬프트용 문서 (벡터 검색 없음)"""
+    region, audiences = segment_for(request.user_profile, request.message)
+    today = date_ymd(date.today())
+    # 정책만 / 공고만 물어보면 그쪽만
+    compact = request.message.replace(" ", "")
+    wants_jobs = any(w in compact for w in ("공고", "채용", "일자리")) or not any(w in compact for w in ("정책", "혜택"))
+    wants_policies = any(w in compact for w in ("정책", "혜택")) or not any(w in compact for w in ("공고", "채용", "일자리"))
+    items = []
+    with stage_timer.span("recommend"):
+        if wants_jobs:
+            items += rag.recommendation_store.top(JOB, region, audiences, today, RECOMMEND_JOBS)
+        if wants_policies:
+            items += rag.recommendation_store.top(POLICY, region, audiences, today, RECOMMEND_POLICIES)
+    print(f"⭐ 추천 목록 사용: {region or '지역 모름'} / {'·'.join(filter(None, audiences)) or '나이 모름'} → {len(items)}개")
+    return [Document(page_content=item.pop("text", ""), metadata=item) for item in items]
+
+
+def answer_docs(rag: RagComponents, route: Dict[str, Any], request: ChatRequest) -> Optional[List[Document]]:
+    """의도별 프롬프트 문서: None이면 검색, 잡담은 문서 없이, 추천은 미리 계산된 목록 (비어 있으면 검색)"""
+    if route["intent"] == "chitchat":
+        return []
+    if route["intent"] == "recommend":
+        return recommended_docs(rag, request) or None
+    return None
+
+
+def start_answer(rag: RagComponents, chain_inputs: Dict[str, Any], question_vector, deadline: float, docs: Optional[List[Document]] = None):
+    """
+    검색 → 토큰 예산 → Gemini 답변을 백그라운드 작업으로 시작합니다. (같은 요청이 처리 중이면 거기에 합류)
+    docs를 주면 검색 없이 그 문서로 답변합니다. (잡담은 빈 목록, 추천은 미리 계산된 목록, 후속 질문은 세션 문서)
+    (SharedAnswer, 먼저 시작한 요청인지) 반환. 답변이 끝나면 답변 캐시에 저장합니다. (question_vector가 없으면 생략)
+    """
+    cache_key = answer_cache_key(chain_inputs)
+
+    async def produce(shared):
+        # 검색 → 토큰 예산 → Gemini 답변 (rag_chain과 같은 순서, 단계별 시간 기록)
+        if docs is None:
+            prompt_inputs = await retrieve_and_budget(rag, chain_inputs, deadline)
+        else:
+            prompt_inputs = await rag.abudget_prompt_inputs({**chain_inputs, "docs": docs})
+        shared.sources = summarize_sources(prompt_inputs["docs"])
+        shared.docs = prompt_inputs["docs"]
+        async for chunk in stream_answer(rag, prompt_inputs, deadline):
+            await shared.publish(chunk)
+        if question_vector is not None:
+            rag.answer_cache.store(
+                question_vector, cache_key, {"answer": shared.text, "sources": shared.sources, "docs": shared.docs}
+            )
+
+    return rag.answer_flights.join(coalesce_key(chain_inputs), produce)
+
+
+async def follow_answer(shared, deadline: float):
+    """SharedAnswer의 조각을 처음부터 받아 내보냅니다. 이 요청의 deadline을 넘으면 asyncio.TimeoutError"""
+    loop = asyncio.get_running_loop()
+    chunks = shared.subscribe().__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline - loop.time())
+        except StopAsyncIteration:
+            break
+        yield chunk
+
+
+async def require_session(rag: RagComponents, request: ChatRequest) -> None:
+    """
+    history 없이 이어 가려는 세션을 서버가 모르면(재시작 / 만료) 답변을 만들기 전에 409로 알립니다.
+    클라이언트는 갖고 있는 history를 담아 같은 요청을 다시 보내면 됩니다.
+    """
+    if not (request.session_id and request.resume_session) or request.history:
+        return
+    if await asyncio.to_thread(rag.session_store.get, request.session_id) is None:
+        raise HTTPException(
+            status_code=409,
+            detail={"code": "session_expired", "message": "대화 세션이 만료되었습니다. 대화 기록(history)을 함께 보내주세요."},
+        )
+
+
+async def open_session(rag: RagComponents, request: ChatRequest) -> tuple:
+    """
+    🗂️ 요청의 session_id로 세션을 엽니다. (session_id가 없으면 (None, None) → 예전처럼 history 사용)
+    처음 보는(또는 만료된) id면 요청의 history로 채우고, 요약에 반영된 턴은 세션에서 정리합니다.
+    """
+    if not request.session_id:
+        return None, None
+    session_id, session = await asyncio.to_thread(rag.session_store.open, request.session_id)
+    if not session["turns"] and not session["summary"] and request.history:
+        session["turns"] = [list(turn) for turn in split_turns(request.history)]
+    compact(session, conversation_key([], {}, session_id), rag.prompt_budgeter.summary_cache, SESSION_MAX_TURNS)
+    return session_id, session
+
+
+def session_docs(rag: RagComponents, session: Optional[Dict[str, Any]], route: Dict[str, Any], request: ChatRequest) -> Optional[List[Document]]:
+    """후속 질문("구체적으로?" 등)이면 세션에 기억한 마지막 답변 문서 (질문 임베딩 / 검색 없음), 아니면 None"""
+    if session is None or route["intent"] != "info":
+        return None
+    if not is_followup(request.message, session, read_corpus_version()):
+        return None
+    rag.session_store.reused += 1
+    print(f"🗂️ 후속 질문 → 이전 답변 문서 {len(session['docs'])}개 재사용 (검색 생략)")
+    return dicts_to_docs(session["docs"])
+
+
+async def remember_turn(rag: RagComponents, session_id, session, request: ChatRequest, answer: str, docs: Optional[List[Document]] = None) -> None:
+    """
+    답변한 턴을 세션에 추가합니다. docs가 None이면(고정 답변 / 잡담 / 후속 질문) 기억한 문서를 그대로 둠
+    (같은 세션의 요청이 겹쳐도 먼저 저장된 턴을 덮어쓰지 않도록 저장소가 저장된 세션에 턴을 더함)
+    """
+    if session is None:
+        return
+    updates = None
+    if docs is not None:
+        updates = {
+            "docs": docs_to_dicts(docs),
+            "region": normalize_region(request.message) or normalize_region(request.user_profile.get("region")) or "",
+            "corpus_version": read_corpus_version(),
+        }
+    await asyncio.to_thread(rag.session_store.add_turn, session_id, session, [request.message, answer], updates)
+
+
+@router.post("/ask", response_model=ChatResponse)
+async def ask_question(
+    request: ChatRequest, http_request: Request, response: Response, rag: RagComponents = Depends(require_rag)
+):
+    await require_session(rag, request)
+    breakdown = stage_timer.start_request()
+    async with track_request("ask") as state:
+        session_id, session = await open_session(rag, request)
+
+        # 🚦 인사 / 고정 질문은 대기열·검색·LLM 없이 바로 답변
+        route = await route_question(rag, request.message)
+        if route["answer"] is not None:
+            state["outcome"] = "routed"
+            await remember_turn(rag, session_id, session, request, route["answer"])
+            if timing_requested(http_request):
+                breakdown["total"] = time.perf_counter() - state["started"]
+                response.headers["Server-Timing"] = server_timing_header(breakdown)
+            return {"answer": route["answer"], "source": "기본 안내", "session_id": session_id}
+
+        # 처리 슬롯 확보 (가득 차 있으면 QUEUE_TIMEOUT 동안 대기)
+        try:
+            with stage_timer.span("queue_wait"):
+                await asyncio.wait_for(chat_slots.acquire(), timeout=QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            state["outcome"] = "rejected"
+            print("⏳ 동시 처리 한도 초과: 대기 시간이 만료되었습니다.")
+            raise HTTPException(status_code=503, detail="요청이 많아 잠시 후 다시 시도해주세요.")
+
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + REQUEST_TIMEOUT
+
+            with stage_timer.span("augment"):
+                chain_inputs = build_chain_inputs(request, session)
+            await apply_nearby(rag, request, chain_inputs)
+
+            # 🗂️ 후속 질문이면 이전 답변 문서로 바로 답변 (질문 임베딩 / 답변 캐시 / 검색 생략)
+            docs = session_docs(rag, session, route, request)
+            reused = docs is not None
+            question_vector = None
+            if not reused:
+                # 💬 답변 캐시 확인 (질문 임베딩은 캐시되어 검색 단계에서 그대로 재사용됨)
+                question_vector = await asyncio.wait_for(
+                    rag.ensemble_retriever.aembed_query(chain_inputs["question"]),
+                    timeout=deadline - loop.time(),
+                )
+                cache_key = answer_cache_key(chain_inputs)
+                cached = rag.answer_cache.lookup(question_vector, cache_key)
+                if cached is not None:
+                    state["outcome"] = "cache_hit"
+                    print(f"⚡ 답변 캐시 적중: {cached['answer']}")
+                    await remember_turn(rag, session_id, session, request, cached["answer"], cached.get("docs"))
+                    return {"answer": cached["answer"], "source": "검색된 문서 기반", "session_id": session_id}
+                docs = answer_docs(rag, route, request)
+                if docs is None and chain_inputs["carry_docs"]:
+                    rag.session_store.extended += 1
+
+            # 검색 → 토큰 예산 → Gemini 답변 (같은 질문이 처리 중이면 그 답변을 함께 받음)
+            # 임베딩 / Pinecone / Gemini 호출 동안 이벤트 루프가 다른 요청을 처리합니다.
+            shared, leader = start_answer(rag, chain_inputs, question_vector, deadline, docs)
+            if not leader:
+                state["outcome"] = "coalesced"
+                print("🛫 같은 질문이 처리 중이라 그 답변을 함께 받습니다.")
+            bot_reply = "".join([chunk async for chunk in follow_answer(shared, deadline)])
+            await remember_turn(
+                rag, session_id, session, request, bot_reply,
+                None if reused or route["intent"] == "chitchat" else shared.docs,
+            )
+            
+            # 출처 표시 로직
+            source_doc = "검색된 문서 기반"
+
+            print(f"Gemini 답변: {bot_reply}")
+
+            return {"answer": bot_reply, "source": source_doc, "session_id": session_id}
+
+        except asyncio.TimeoutError:
+            state["outcome"] = "timeout"
+            print(f"⏰ 답변 생성 시간 초과 ({REQUEST_TIMEOUT}초)")
+            return {"answer": "죄송합니다, 답변 생성 시간이 너무 오래 걸려 중단되었습니다.", "source": None, "session_id": session_id}
+
+        except Exception as e:
+            state["outcome"] = "error"
+            print(f"🚨 RAG 서버 처리 중 오류: {e}")
+            import traceback
+            traceback.print_exc()
+            return {"answer": "죄송합니다, 답변 생성 중 오류가 발생했습니다.", "source": None, "session_id": session_id}
+
+        finally:
+            chat_slots.release()
+            # ⏱️ 단계별 시간 → Server-Timing 헤더 (Node 프록시가 로그로 남김)
+            if timing_requested(http_request):
+                breakdown["total"] = time.perf_counter() - state["started"]
+                response.headers["Server-Timing"] = server_timing_header(breakdown)
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: ChatRequest, http_request: Request, rag: RagComponents = Depends(require_rag)):
+    """
+    🌊 스트리밍 답변 (Server-Sent Events)
+    - event: token  → data: {"text": "..."}  (Gemini가 생성하는 대로 조각 전송)
+    - event: done   → data: {"answer": "전체 답변", "sources": [...]}  (+ 요청 시 "timings": {단계: 밀리초})
+    - event: error  → data: {"message": "..."}
+    """
+    with_timings = timing_requested(http_request)
+    await require_session(rag, request) # SSE 헤더를 보내기 전에 확인
+
+    async def event_stream():
+        breakdown = stage_timer.start_request()
+        async with track_request("ask_stream") as state:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + REQUEST_TIMEOUT
+
+            session_id, session = await open_session(rag, request)
+
+            def done_event(answer, sources):
+                data = {"answer": answer, "sources": sources}
+                if session_id:
+                    data["session_id"] = session_id
+                if with_timings:
+                    breakdown["total"] = time.perf_counter() - state["started"]
+                    data["timings"] = {stage: round(seconds * 1000, 1) for stage, seconds in breakdown.items()}
+                return sse_event("done", data)
+
+            # 🚦 인사 / 고정 질문은 대기열·검색·LLM 없이 바로 답변
+            route = await route_question(rag, request.message)
+            if route["answer"] is not None:
+                state["outcome"] = "routed"
+                await remember_turn(rag, session_id, session, request, route["answer"])
+                yield sse_event("token", {"text": route["answer"]})
+                yield done_event(route["answer"], [])
+                return
+
+            try:
+                with stage_timer.span("queue_wait"):
+                    await asyncio.wait_for(chat_slots.acquire(), timeout=QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                state["outcome"] = "rejected"
+                print("⏳ 동시 처리 한도 초과: 대기 시간이 만료되었습니다.")
+                yield sse_event("error", {"message": "요청이 많아 잠시 후 다시 시도해주세요."})
+                return
+
+            try:
+                with stage_timer.span("augment"):
+                    chain_inputs = build_chain_inputs(request, session)
+                await apply_nearby(rag, request, chain_inputs)
+
+                # 🗂️ 후속 질문이면 이전 답변 문서로 바로 답변 (질문 임베딩 / 답변 캐시 / 검색 생략)
+                docs = session_docs(rag, session, route, request)
+                reused = docs is not None
+                question_vector = None
+                if not reused:
+                    # 💬 답변 캐시 확인 (적중하면 전체 답변을 한 번에 보내고 종료)
+                    question_vector = await asyncio.wait_for(
+                        rag.ensemble_retriever.aembed_query(chain_inputs["question"]),
+                        timeout=deadline - loop.time(),
+                    )
+                    cache_key = answer_cache_key(chain_inputs)
+                    cached = rag.answer_cache.lookup(question_vector, cache_key)
+                    if cached is not None:
+                        state["outcome"] = "cache_hit"
+                        print(f"⚡ 답변 캐시 적중(스트리밍): {cached['answer']}")
+                        await remember_turn(rag, session_id, session, request, cached["answer"], cached.get("docs"))
+                        yield sse_event("token", {"text": cached["answer"]})
+                        yield done_event(cached["answer"], cached["sources"] or [])
+                        return
+                    docs = answer_docs(rag, route, request)
+                    if docs is None and chain_inputs["carry_docs"]:
+                        rag.session_store.extended += 1
+
+                # 검색 → 토큰 예산 → 답변 토큰을 생성되는 대로 흘려보냅니다.
+                # (같은 질문이 처리 중이면 지금까지 나온 조각부터 이어 받음)
+                shared, leader = start_answer(rag, chain_inputs, question_vector, deadline, docs)
+                if not leader:
+                    state["outcome"] = "coalesced"
+                    print("🛫 같은 질문이 처리 중이라 그 답변을 함께 받습니다. (스트리밍)")
+                answer_parts = []
+                async for chunk in follow_answer(shared, deadline):
+                    answer_parts.append(chunk)
+                    yield sse_event("token", {"text": chunk})
+
+                bot_reply = "".join(answer_parts)
+                sources = shared.sources
+                await remember_turn(
+                    rag, session_id, session, request, bot_reply,
+                    None if reused or route["intent"] == "chitchat" else shared.docs,
+                )
+                print(f"Gemini 답변(스트리밍): {bot_reply}")
+                yield done_event(bot_reply, sources)
+
+            except asyncio.TimeoutError:
+                state["outcome"] = "timeout"
+                print(f"⏰ 답변 생성 시간 초과 ({REQUEST_TIMEOUT}초)")
+                yield sse_event("error", {"message": "죄송합니다, 답변 생성 시간이 너무 오래 걸려 중단되었습니다."})
+
+            except Exception as e:
+                state["outcome"] = "error"
+                print(f"🚨 RAG 스트리밍 처리 중 오류: {e}")
+                import traceback
+                traceback.print_exc()
+                yield sse_event("error", {"message": "죄송합니다, 답변 생성 중 오류가 발생했습니다."})
+
+            finally:
+                chat_slots.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # nginx 등 프록시가 버퍼링하지 않고 바로 흘려보내도록 설정
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/nearby")
+async def nearby_jobs(
+    lat: float, lng: float, radius_km: float = GEO_RADIUS_KM, k: int = GEO_NEAREST_K,
+    rag: RagComponents = Depends(require_rag),
+):
+    """
+    📍 반경 안의 마감 전 공고를 가까운 순으로 최대 k개 (반경 안에 없으면 가장 가까운 k개)
+    메모리 격자만 사용하므로 벡터 검색 / LLM 호출이 없습니다.
+    """
+    point = valid_point(lat, lng)
+    if point is None or rag.geo_store is None:
+        raise HTTPException(status_code=400, detail="위치 검색을 사용할 수 없습니다.")
+    await rag.arefresh_geo()
+    today = date_ymd(date.today())
+    with stage_timer.span("geo"):
+        nearby = rag.geo_index.within(*point, radius_km, today, limit=k) or rag.geo_index.nearest(*point, k, today)
+    return {
+        "radius_km": radius_km,
+        "jobs": [
+            {"post_id": post_id, "distance_km": round(km, 2), **rag.geo_index.payloads[post_id]}
+            for post_id, km in nearby
+        ],
+    }
+
+
+@router.get("/cache/stats")
+async def cache_stats(rag: RagComponents = Depends(require_rag)):
+    """캐시 크기 조정용 적중/미스 카운터"""
+    return {
+        "query_embedding": rag.query_embedding_cache.stats(),
+        "answer": rag.answer_cache.stats(),
+        "query_embed_batches": rag.query_embedder.stats(),
+        "sessions": rag.session_store.stats(),
+        "embedding_store": rag.embedding_store.stats() if rag.embedding_store is not None else None,
+    }
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """📊 Prometheus 스크레이프용 지표 (단계별 지연 시간 / 처리 중 요청 / 캐시 적중률)"""
+    lines = render_stage_metrics(stage_timer)
+    lines += render_gauges(
+        "rag_requests_in_flight", "Requests currently being handled.",
+        [({"endpoint": endpoint}, count) for endpoint, count in in_flight.items()],
+    )
+    lines += render_gauges(
+        "rag_requests_total", "Finished requests by outcome.",
+        [({"endpoint": endpoint, "outcome": outcome}, count) for (endpoint, outcome), count in sorted(request_counts.items())],
+        "counter",
+    )
+    lines += render_gauges(
+        "rag_chat_slots_in_use", "Chat slots in use (waiting requests are not counted).",
+        [({}, chat_slots.in_use)],
+    )
+    lines += render_gauges("rag_chat_slots_limit", "Chat slot limit per worker.", [({}, MAX_CONCURRENT_CHATS)])
+    lines += render_gauges("rag_ready", "1 once the RAG components are initialized.", [({}, int(_rag is not None))])
+    rag = _rag # 초기화 전에는 캐시 지표 없이
+    if rag is not None:
+        lines += render_cache_metrics({
+            "query_embedding": rag.query_embedding_cache.stats,
+            "answer": rag.answer_cache.stats,
+            "history_summary": rag.prompt_budgeter.summary_cache.stats,
+            "sessions": rag.session_store.memory.stats,
+            **({"embedding_store": rag.embedding_store.stats} if rag.embedding_store is not None else {}),
+        })
+        embed_batches = rag.query_embedder.stats()
+        lines += render_gauges(
+            "rag_query_embed_requests_total", "Query embeddings requested (after the embedding cache).",
+            [({}, embed_batches["requests"])], "counter",
+        )
+        lines += render_gauges(
+            "rag_query_embed_batches_total", "Batched embedding API calls for query embeddings.",
+            [({}, embed_batches["batches"])], "counter",
+        )
+        lines += render_gauges(
+            "rag_answer_flights", "Answers currently being generated (shared by identical requests).",
+            [({}, len(rag.answer_flights))],
+        )
+        lines += render_gauges(
+            "rag_answer_flight_joins_total", "Answer generations started (leader) or joined (follower).",
+            [({"role": "leader"}, rag.answer_flights.leaders), ({"role": "follower"}, rag.answer_flights.followers)],
+            "counter",
+        )
+        if rag.intent_router is not None:
+            lines += render_gauges(
+                "rag_intent_routes_total", "Routing decisions by intent and method (rule / centroid / default).",
+                [({"intent": intent, "method": method}, count) for (intent, method), count in sorted(rag.intent_router.counts.items())],
+                "counter",
+            )
+        lines += render_gauges(
+            "rag_session_followups_total", "Session turns that reused (no retrieval) or extended the previous answer's documents.",
+            [({"mode": "reused"}, rag.session_store.reused), ({"mode": "extended"}, rag.session_store.extended)],
+            "counter",
+        )
+        lines += render_gauges(
+            "rag_history_summary_refreshes_total", "Background history summary refreshes.",
+            [({"result": "ok"}, rag.prompt_budgeter.summary_refreshes), ({"result": "failed"}, rag.prompt_budgeter.summary_failures)],
+            "counter",
+        )
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@router.get("/healthz")
+async def healthz():
+    """liveness: 프로세스와 이벤트 루프가 응답하는지만 확인 (초기화 여부와 무관)"""
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@router.get("/readyz")
+async def readyz():
+    """readiness: 구성 요소 초기화가 끝나야 200. 아직이면 초기화를 시작하고 503"""
+    if _rag is not None:
+        return {"status": "ready", "pid": os.getpid(), "startup_seconds": rag_status["startup_seconds"]}
+    start_warmup()
+    status = "error" if rag_status["error"] else "starting"
+    return JSONResponse({"status": status, "error": rag_status["error"], "pid": os.getpid()}, status_code=503)
+
+
+def create_app() -> FastAPI:
+    """앱 팩토리: 클라이언트는 lifespan에서 백그라운드로 만들고, 종료 시 연결 풀을 닫습니다."""
+    app = FastAPI(lifespan=lifespan)
+
+    # 🌟 [추가] CORS 미들웨어 설정
+    # 모든 도메인(origins=["*"])에서의 접근을 허용합니다.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+
+# `uvicorn rag_server:app` 처럼 모듈 속성으로 띄우는 경우용 (만들기만 하고 초기화는 lifespan에서)
+app = create_app()
 
 
 # — 5. API 서버 실행 —
+# 여러 코어 사용: RAG_WORKERS=4 python rag_server.py
+#   또는 gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8001 --max-requests 5000 \
+#        --max-requests-jitter 500 --graceful-timeout 30 'rag_server:create_app()'
+# 워커는 각자 클라이언트 / 캐시 / 지표 / 동시 처리 슬롯을 가집니다. (RAG_MAX_CONCURRENT_CHATS는 워커당 값)
 if __name__ == "__main__":
-    print(f"Python RAG API 서버를 8001번 포트에서 시작합니다 (http://localhost:8001)")
-    run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    print(f"Python RAG API 서버를 {PORT}번 포트에서 시작합니다 (http://localhost:{PORT}, 워커 {WORKERS}개)")
+    run(
+        "rag_server:create_app",
+        factory=True,
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        timeout_keep_alive=KEEP_ALIVE_TIMEOUT,
+        limit_max_requests=WORKER_MAX_REQUESTS or None,
+    )
@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from corpus_state import DATA_DIR
+from metadata_filters import (
+    ALL_AUDIENCE, AUDIENCE_KEYWORDS, CLOSED_STATUSES, NO_DEADLINE_YMD, REGION_ALIASES,
+    audience_keys, audiences_for_age, normalize_region,
+)
+
+# -----------------------------------------------
+# ⭐ 프로필(지역 × 연령대)별 추천 목록 미리 계산
+# - 로그인한 사용자의 "추천해줘" 질문은 지역과 나이만으로 후보가 정해지므로,
+#   수집기가 공고가 바뀔 때마다 구간(segment)별 순위를 로컬 sqlite에 갱신해 둡니다.
+# - RAG 서버는 추천 질문에 벡터 검색 없이 이 표에서 상위 공고 / 정책을 꺼내 씁니다.
+# - items: 추천 항목 하나당 한 줄 (답변에 필요한 메타데이터만)
+#   segment_ranks: (지역, 연령대) 구간마다 지원 가능한 항목과 점수
+# -----------------------------------------------
+RECOMMENDATION_DB = os.path.join(DATA_DIR, "recommendations.sqlite3")
+
+JOB = "job"
+POLICY = "policy"
+
+# 구간: 지역(표준 이름, ""는 지역 모름) × 연령대("" 는 나이 모름)
+SEGMENT_REGIONS = [""] + sorted(set(REGION_ALIASES.values()) - {"전국"})
+SEGMENT_AUDIENCES = ["", "청소년", "청년", "중장년", "노인"]
+
+SNIPPET_CHARS = 400 # 답변 프롬프트에 넣을 본문 앞부분 길이
+PAYLOAD_KEYS = (
+    "title", "policy_name", "company_name", "region", "job_category", "employment_type",
+    "apply_method", "apply_link", "source_url", "apply_end_date", "target_audience", "summary",
+)
+
+# 추천 질문에서 지우고 나면 아무것도 남지 않아야 '조건만으로 추천' 질문으로 봄 (긴 표현부터 지움)
+_GENERIC_WORDS = sorted([
+    "추천해주세요", "추천해줘", "추천해", "추천", "알려주세요", "알려줘", "보여줘", "찾아줘",
+    "있을까요", "있을까", "있나요", "있어요", "있어", "뭐가", "뭐", "어떤", "좀", "해줘", "해",
+    "나한테", "저한테", "나에게", "저에게", "내", "나", "저", "제",
+    "조건에", "조건", "맞는", "맞춤", "어울리는", "지원가능한", "지원할수있는", "받을수있는", "할수있는",
+    "공고", "채용", "일자리", "정책", "혜택", "지원", "들", "에", "의", "랑", "하고", "것", "거",
+], key=len, reverse=True)
+_RECOMMEND_TRIGGERS = ("추천", "맞는", "맞춤", "조건에")
+_GENERIC_PATTERN = re.compile(
+    "|".join(map(re.escape, sorted(list(REGION_ALIASES) + list(AUDIENCE_KEYWORDS), key=len, reverse=True) + _GENERIC_WORDS))
+)
+
+
+def is_generic_recommendation(text: str) -> bool:
+    """'내 조건에 맞는 공고 추천해줘'처럼 지역 / 나이 말고 다른 조건이 없는 추천 질문인지"""
+    compact = re.sub(r"[\s?!.~,]", "", text.lower())
+    if not any(trigger in compact for trigger in _RECOMMEND_TRIGGERS):
+        return False
+    return len(_GENERIC_PATTERN.sub("", compact)) <= 1
+
+
+def segment_for(user_profile: Dict[str, Any], message: str) -> Tuple[str, List[str]]:
+    """
+    질문에 지역 / 연령대 표현이 있으면 그것을, 없으면 프로필의 거주지 / 나이를 씀.
+    (지역, 연령대 목록) 반환. 35~39세처럼 두 연령대에 걸치면 둘 다, 모르면 [""]
+    """
+    region = normalize_region(message) or normalize_region((user_profile or {}).get("region"))
+    if region == "전국":
+        region = ""
+    audiences = [key for key in audience_keys([message]) if key != ALL_AUDIENCE]
+    audiences = audiences or audiences_for_age((user_profile or {}).get("age"))
+    return region, (audiences or [""])
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+def item_segments(region_key: str, audiences: List[str]) -> List[Tuple[str, str, float]]:
+    """항목이 지원 가능한 구간과 점수 (지역 / 연령대가 정확히 맞으면 2점, 전국 / 전체 대상이면 1점)"""
+    segments = []
+    for region in SEGMENT_REGIONS:
+        if not region:
+            region_score = 0.0
+        elif region_key == region:
+            region_score = 2.0
+        elif region_key in ("전국", ""):
+            region_score = 1.0
+        else:
+            continue
+        for audience in SEGMENT_AUDIENCES:
+            if not audience:
+                audience_score = 0.0
+            elif audience in audiences:
+                audience_score = 2.0
+            elif ALL_AUDIENCE in audiences:
+                audience_score = 1.0
+            else:
+                continue
+            segments.append((region, audience, region_score + audience_score))
+    return segments
+
+
+def job_item(post_id: Any, text: str, metadata: Dict) -> Optional[Tuple]:
+    """공고 메타데이터 → items 행 재료 (닫힌 공고는 None)"""
+    if metadata.get("status") in CLOSED_STATUSES:
+        return None
+    region_key = metadata.get("region_key")
+    if region_key is None: # 정규화 필드가 생기기 전에 올라간 공고
+        region_key = normalize_region(metadata.get("region"))
+    audiences = metadata.get("audience_keys") or audience_keys(_as_list(metadata.get("target_audience")))
+    start = re.sub(r"\D", "", str(metadata.get("apply_start_date") or ""))[:8]
+    return (
+        JOB, str(post_id), text, metadata,
+        int(metadata.get("apply_end_ymd") or NO_DEADLINE_YMD), int(start or 0),
+        item_segments(region_key, audiences),
+    )
+
+
+def policy_item(doc_id: str, text: str, metadata: Dict) -> Tuple:
+    title = metadata.get("policy_name") or metadata.get("title") or ""
+    region_key = normalize_region(metadata.get("region") or title)
+    audiences = audience_keys(_as_list(metadata.get("target_audience")) or [title])
+    return (POLICY, str(doc_id), text, metadata, int(metadata.get("apply_end_ymd") or NO_DEADLINE_YMD), 0,
+            item_segments(region_key, audiences))
+
+
+class RecommendationStore:
+    """
+    추천 목록 sqlite (수집기가 쓰고 RAG 서버가 읽음, WAL 모드라 읽기가 쓰기를 기다리지 않음)
+    읽기/업로드 스레드가 함께 쓰므로 잠금으로 보호합니다.
+    """
+
+    def __init__(self, path: str = RECOMMENDATION_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " kind TEXT NOT NULL, item_id TEXT NOT NULL, payload TEXT NOT NULL,"
+            " end_ymd INTEGER NOT NULL, freshness INTEGER NOT NULL, PRIMARY KEY (kind, item_id));"
+            "CREATE TABLE IF NOT EXISTS segment_ranks ("
+            " region TEXT NOT NULL, audience TEXT NOT NULL, kind TEXT NOT NULL, item_id TEXT NOT NULL,"
+            " score REAL NOT NULL, PRIMARY KEY (kind, item_id, region, audience));"
+            "CREATE INDEX IF NOT EXISTS segment_ranks_by_segment ON segment_ranks (kind, region, audience, score DESC);"
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self._conn.commit()
+
+    # ---------------------------------------------------------
+    # ✍️ 수집기 쪽 (공고 단위 증분 갱신)
+    # ---------------------------------------------------------
+    def _delete(self, kind: str, item_ids: List[str]) -> None:
+        rows = [(kind, i) for i in item_ids]
+        self._conn.executemany("DELETE FROM segment_ranks WHERE kind = ? AND item_id = ?", rows)
+        self._conn.executemany("DELETE FROM items WHERE kind = ? AND item_id = ?", rows)
+
+    def _put(self, items: List[Tuple]) -> None:
+        for kind, item_id, text, metadata, end_ymd, freshness, segments in items:
+            payload = {k: metadata[k] for k in PAYLOAD_KEYS if metadata.get(k)}
+            payload["text"] = (text or "")[:SNIPPET_CHARS]
+            self._conn.execute(
+                "INSERT INTO items (kind, item_id, payload, end_ymd, freshness) VALUES (?, ?, ?, ?, ?)",
+                (kind, item_id, json.dumps(payload, ensure_ascii=False), end_ymd, freshness),
+            )
+            self._conn.executemany(
+                "INSERT INTO segment_ranks (region, audience, kind, item_id, score) VALUES (?, ?, ?, ?, ?)",
+                [(region, audience, kind, item_id, score) for region, audience, score in segments],
+            )
+
+    def put_jobs(self, posts: Iterable[Tuple[Any, str, Dict]]) -> None:
+        """(post_id, 본문, 공고 메타데이터) 목록을 반영 (이전 순위는 지우고 다시 계산, 닫힌 공고는 제거)"""
+        posts = list(posts)
+        if not posts:
+            return
+        items = [job_item(post_id, text, metadata) for post_id, text, metadata in posts]
+        with self._lock:
+            self._delete(JOB, [str(post_id) for post_id, _, _ in posts])
+            self._put([item for item in items if item is not None])
+            self._conn.commit()
+
+    def remove_jobs(self, post_ids: Iterable[Any]) -> None:
+        post_ids = [str(i) for i in post_ids]
+        if not post_ids:
+            return
+        with self._lock:
+            self._delete(JOB, post_ids)
+            self._conn.commit()
+
+    def replace_policies(self, docs: Iterable[Tuple[str, str, Dict]], signature: str) -> int:
+        """정책 목록 전체를 다시 계산 (정책은 수가 적고 한꺼번에 갱신되므로)"""
+        items = [policy_item(doc_id, text, metadata) for doc_id, text, metadata in docs]
+        with self._lock:
+            self._conn.execute("DELETE FROM segment_ranks WHERE kind = ?", (POLICY,))
+            self._conn.execute("DELETE FROM items WHERE kind = ?", (POLICY,))
+            self._put(items)
+            self._conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('policy_signature', ?)", (signature,))
+            self._conn.commit()
+        return len(items)
+
+    def policy_signature(self) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = 'policy_signature'").fetchone()
+        return row[0] if row else ""
+
+    def ids(self, kind: str = JOB) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT item_id FROM items WHERE kind = ?", (kind,))]
+
+    def count(self, kind: str = JOB) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items WHERE kind = ?", (kind,)).fetchone()[0]
+
+    # ---------------------------------------------------------
+    # 📖 RAG 서버 쪽
+    # ---------------------------------------------------------
+    def top(self, kind: str, region: str, audiences: List[str], today_ymd: int, limit: int) -> List[Dict]:
+        """
+        구간의 상위 항목 (마감일이 지난 항목 제외). 각 항목은 payload dict (+ kind / item_id / score)
+        연령대가 여럿이면 그 구간들을 합쳐 항목마다 가장 높은 점수로 순위를 매김
+        """
+        marks = ", ".join("?" for _ in audiences)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT i.item_id, i.payload, MAX(r.score) AS best FROM segment_ranks r"
+                " JOIN items i ON i.kind = r.kind AND i.item_id = r.item_id"
+                f" WHERE r.kind = ? AND r.region = ? AND r.audience IN ({marks}) AND i.end_ymd >= ?"
+                " GROUP BY i.item_id ORDER BY best DESC, i.freshness DESC, i.item_id DESC LIMIT ?",
+                (kind, region, *audiences, today_ymd, limit),
+            ).fetchall()
+        return [{**json.loads(payload), "kind": kind, "item_id": item_id, "score": score} for item_id, payload, score in rows]
+
+
+def lexical_signature(lexical) -> str:
+    """역색인 로그가 바뀌었는지 비교하는 값 (파일 inode + 크기)"""
+    try:
+        stat = os.stat(lexical.path)
+    except FileNotFoundError:
+        return ""
+    return f"{stat.st_ino}:{stat.st_size}"
+
+
+def sync_policies(store: RecommendationStore, lexical_policy) -> Optional[int]:
+    """정책 역색인 로그가 바뀌었으면 정책 추천 목록을 다시 계산합니다. (바뀐 게 없으면 None)"""
+    signature = lexical_signature(lexical_policy)
+    if signature == store.policy_signature():
+        return None
+    lexical_policy.refresh()
+    docs = [(doc_id, text, metadata) for doc_id, (text, metadata) in list(lexical_policy.docs.items())]
+    return store.replace_policies(docs, signature)
+
+
+def backfill_jobs(store: RecommendationStore, lexical_job) -> int:
+    """추천 표가 비어 있으면(처음 도입 / 파일 삭제) 채용 역색인에 있는 공고로 채웁니다. (공고의 첫 청크 기준)"""
+    if store.count(JOB):
+        return 0
+    lexical_job.refresh()
+    posts = [
+        (doc_id, text, metadata)
+        for doc_id, (text, metadata) in list(lexical_job.docs.items())
+        if "#" not in doc_id
+    ]
+    store.put_jobs(posts)
+    return len(posts)
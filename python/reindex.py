@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import shutil
+from datetime import datetime
+
+# import 시 별칭이 가리키는 (지금 검색에 쓰는) 인덱스에 연결되고, build가 새 인덱스로 바꿔 씁니다.
+import post_to_pinecone as ingest
+from corpus_state import DATA_DIR, LOCAL_INDEX_DIR, VECTOR_BACKEND, read_index_aliases, resolve_index, set_index_alias
+from lexical_index import LexicalIndex
+
+# -----------------------------------------------
+# 🔁 채용 공고 전체 재색인 (blue / green)
+# 임베딩 모델, 임베딩 텍스트 형식, 청크 설정을 바꿀 때 지금 인덱스(blue)는 그대로 검색에 쓰면서
+# 새 인덱스(green)를 따로 끝까지 만든 다음, 별칭(index_aliases.json)만 바꿔 한 번에 전환합니다.
+#
+#   python reindex.py build [새 인덱스 이름]   # 새 인덱스 만들기 (중단되면 같은 명령으로 이어서)
+#   python reindex.py switch [새 인덱스 이름]  # 검증을 통과한 인덱스로 전환
+#   python reindex.py rollback                 # 직전 인덱스로 되돌리기
+#   python reindex.py status                   # 별칭과 진행 상황
+#   python reindex.py drop <인덱스 이름>        # 더 이상 쓰지 않는 인덱스 삭제
+#
+# - 페이지(REINDEX_PAGE_SIZE개 공고)마다 체크포인트를 저장하고, 이미 올린 공고는 새 인덱스의 지문으로 건너뜁니다.
+# - DB의 is_embedded는 지금 인덱스의 상태이므로 건드리지 않습니다. (수집기는 그동안 blue에 계속 반영)
+# - 만드는 동안 바뀐 공고는 마지막 따라잡기 단계에서, 전환 직후에 바뀐 공고는 수집기가 별칭을 따라가며 전체 확인으로 반영합니다.
+# - RAG 서버와 다른 프로세스이므로 검색 지연에는 영향이 없습니다. 임베딩 API 한도를 RAG 서버의 질문 임베딩과 나눠 쓰므로
+#   OPENAI_EMBED_RPS / INGEST_EMBED_WORKERS로 속도를 맞추세요.
+# -----------------------------------------------
+ALIAS = ingest.PINECONE_INDEX_NAME
+REINDEX_DIR = os.path.join(DATA_DIR, "reindex")
+REINDEX_PAGE_SIZE = int(os.getenv("REINDEX_PAGE_SIZE", 2000)) # 체크포인트 한 번에 처리하는 공고 수
+REINDEX_NICE = int(os.getenv("REINDEX_NICE", 10)) # 같은 서버의 RAG 서버보다 CPU 우선순위를 낮춤
+VERIFY_ATTEMPTS = 3 # 검증이 어긋나면(그 사이 공고가 바뀜) 따라잡기 후 다시 검증하는 횟수
+VERIFY_WAIT = 60 # Pinecone 통계가 늦게 반영되는 것을 기다리는 최대 시간(초)
+
+
+# ---------------------------------------------------------
+# 💾 체크포인트
+# ---------------------------------------------------------
+def checkpoint_path(target):
+    return os.path.join(REINDEX_DIR, f"{target}.json")
+
+
+def load_checkpoint(target):
+    try:
+        with open(checkpoint_path(target), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(checkpoint):
+    os.makedirs(REINDEX_DIR, exist_ok=True)
+    checkpoint["updated_at"] = time.time()
+    path = checkpoint_path(checkpoint["target"])
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------
+# 🏗️ 새 인덱스 채우기
+# ---------------------------------------------------------
+def fetch_live_page(conn, after):
+    """검색되어야 하는 공고를 post_id 순서로 한 페이지 (키셋 페이지네이션)"""
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute(
+        f"SELECT {', '.join(ingest.EMBED_COLUMNS)} FROM {ingest.TABLE_NAME} "
+        f"WHERE post_id > %s AND NOT {ingest.DEAD_POST_CONDITION} ORDER BY post_id LIMIT {REINDEX_PAGE_SIZE}",
+        (after,),
+    )
+    rows = []
+    while True:
+        chunk = cursor.fetchmany(ingest.BATCH_SIZE)
+        if not chunk:
+            break
+        rows.extend(chunk)
+    cursor.close()
+    return rows
+
+
+def count_live_posts(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {ingest.TABLE_NAME} WHERE NOT {ingest.DEAD_POST_CONDITION}")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def sync_pass(conn, after, on_page=None):
+    """
+    after 이후의 살아 있는 공고를 새 인덱스에 반영합니다. (지문이 같으면 건너뜀 → 이어서 하기 / 따라잡기 겸용)
+    페이지마다 on_page(마지막 post_id, 페이지 결과)를 부르고, 전체 결과를 돌려줍니다.
+    """
+    progress = {"found": 0, "scanned": 0, "metadata_only": 0, "unchanged": 0, "after": None}
+    totals = {"chunks": 0, "failures": 0}
+    while True:
+        rows = fetch_live_page(conn, after)
+        if not rows:
+            break
+        # 새 인덱스는 DB의 is_embedded와 상관없으므로 DB 반영 단계는 비워 둠
+        pipeline = ingest.new_pipeline(lambda post_ids: None)
+        stats = pipeline.run(ingest.iter_row_batches(rows, progress, pipeline, fetch_missing=False))
+        page = {
+            "posts": len(rows),
+            "chunks": stats["upsert"]["rows"],
+            "failures": sum(stage["failures"] for stage in stats.values()),
+        }
+        totals["chunks"] += page["chunks"]
+        totals["failures"] += page["failures"]
+        after = rows[-1]['post_id']
+        if on_page:
+            on_page(after, page)
+        if len(rows) < REINDEX_PAGE_SIZE:
+            break
+    return {**totals, "changed": progress["found"], "scanned": progress["scanned"]}
+
+
+def remove_dead(conn):
+    """새 인덱스에 들어갔지만 그 뒤 삭제 / 승인 취소 / 마감된 공고를 지웁니다."""
+    ids = ingest.fingerprint_store.ids()
+    stale = []
+    for start in range(0, len(ids), ingest.SYNC_PAGE_SIZE):
+        stale += ingest.stale_ids(conn, ids[start:start + ingest.SYNC_PAGE_SIZE])
+    if stale:
+        ingest.delete_posts([int(post_id) for post_id in stale])
+    return len(stale)
+
+
+def vector_count():
+    stats = ingest.index.describe_index_stats()
+    return stats["total_vector_count"] if isinstance(stats, dict) else stats.total_vector_count
+
+
+def verify(conn):
+    """
+    공고 수(DB의 살아 있는 공고 = 새 인덱스 지문 수)와 벡터 수(지문의 청크 수 합 = 인덱스 / 역색인 벡터 수)를 비교합니다.
+    Pinecone 통계는 늦게 반영되므로 벡터 수는 VERIFY_WAIT초까지 다시 확인합니다.
+    """
+    ids = ingest.fingerprint_store.ids()
+    expected_chunks = sum(entry[2] for entry in ingest.fingerprint_store.get_many(ids).values())
+    ingest.lexical_index.refresh()
+    report = {
+        "live_posts": count_live_posts(conn),
+        "indexed_posts": len(ids),
+        "expected_vectors": expected_chunks,
+        "lexical_vectors": len(ingest.lexical_index),
+        "index_vectors": vector_count(),
+    }
+    deadline = time.monotonic() + VERIFY_WAIT
+    while report["index_vectors"] != expected_chunks and time.monotonic() < deadline:
+        time.sleep(2)
+        report["index_vectors"] = vector_count()
+    report["ok"] = (
+        report["live_posts"] == report["indexed_posts"]
+        and report["index_vectors"] == report["lexical_vectors"] == expected_chunks
+    )
+    return report
+
+
+def lower_priority():
+    if REINDEX_NICE and hasattr(os, "nice"):
+        os.nice(REINDEX_NICE)
+
+
+def build(target):
+    if target in (ALIAS, resolve_index(ALIAS)):
+        raise SystemExit(f"❌ '{target}'는 지금 검색에 쓰는 인덱스입니다. 새 이름을 지정하세요.")
+
+    checkpoint = load_checkpoint(target)
+    if checkpoint is None:
+        checkpoint = {
+            "target": target, "alias": ALIAS, "source": resolve_index(ALIAS),
+            "embedding_version": ingest.CHUNKED_EMBEDDING_VERSION, "status": "building",
+            "after": 0, "posts": 0, "chunks": 0, "failures": 0, "started_at": time.time(),
+        }
+    elif checkpoint["status"] == "switched":
+        raise SystemExit(f"❌ '{target}'는 이미 전환된 인덱스입니다.")
+    else:
+        print(f"↪️ 체크포인트에서 이어서 진행: post_id {checkpoint['after']} 이후 (공고 {checkpoint['posts']}개 완료)")
+        if checkpoint["embedding_version"] != ingest.CHUNKED_EMBEDDING_VERSION:
+            # 이미 올린 공고는 텍스트 지문이 달라져 따라잡기 단계에서 다시 임베딩됨
+            print(f"⚠️ 임베딩 설정이 바뀌었습니다: {checkpoint['embedding_version']} → {ingest.CHUNKED_EMBEDDING_VERSION}")
+            checkpoint["embedding_version"] = ingest.CHUNKED_EMBEDDING_VERSION
+        checkpoint["status"] = "building"
+
+    lower_priority()
+    ingest.open_target(target)
+    conn = ingest.get_db_connection()
+    total = count_live_posts(conn)
+    print(f"🏗️ 새 인덱스 '{target}' 만들기 시작 (지금 인덱스: {checkpoint['source']}, 살아 있는 공고 {total}개)")
+    started, done_before = time.monotonic(), checkpoint["posts"]
+
+    def on_page(after, page):
+        checkpoint["after"] = after
+        for key in ("posts", "chunks", "failures"):
+            checkpoint[key] += page[key]
+        save_checkpoint(checkpoint)
+        rate = (checkpoint["posts"] - done_before) / max(time.monotonic() - started, 1e-9)
+        remaining = max(total - checkpoint["posts"], 0) / rate if rate else 0
+        print(
+            f"   - post_id {after}까지 | 공고 {checkpoint['posts']}/{total} · 청크 {checkpoint['chunks']} "
+            f"· 실패 {checkpoint['failures']} | {rate:.1f} posts/s · 남은 시간 약 {remaining / 60:.1f}분"
+        )
+
+    sync_pass(conn, checkpoint["after"], on_page)
+
+    # 만드는 동안 바뀐 공고 따라잡기 → 검증 (어긋나면 다시 따라잡기)
+    for attempt in range(1, VERIFY_ATTEMPTS + 1):
+        checkpoint["status"] = "catching_up"
+        save_checkpoint(checkpoint)
+        caught = sync_pass(conn, 0)
+        removed = remove_dead(conn)
+        print(f"🔄 따라잡기 {attempt}: 다시 올린 공고 {caught['changed']}개 · 제거 {removed}개 · 실패 {caught['failures']}")
+        report = verify(conn)
+        checkpoint["verify"] = report
+        print(
+            f"🔎 검증: 공고 {report['indexed_posts']}/{report['live_posts']} "
+            f"| 벡터 인덱스 {report['index_vectors']} · 역색인 {report['lexical_vectors']} · 기대값 {report['expected_vectors']}"
+        )
+        if report["ok"]:
+            checkpoint["status"] = "verified"
+            save_checkpoint(checkpoint)
+            print(f"✅ '{target}' 준비 완료. 전환하려면: python reindex.py switch {target}")
+            return
+    checkpoint["status"] = "verify_failed"
+    save_checkpoint(checkpoint)
+    raise SystemExit("❌ 검증 실패: 위 숫자를 확인한 뒤 build를 다시 실행하세요. (체크포인트에서 이어서 진행)")
+
+
+# ---------------------------------------------------------
+# 🔀 전환 / 되돌리기
+# ---------------------------------------------------------
+def latest_checkpoint():
+    """가장 최근에 만든(전환 전) 인덱스의 체크포인트"""
+    if not os.path.isdir(REINDEX_DIR):
+        return None
+    checkpoints = [load_checkpoint(name[:-5]) for name in os.listdir(REINDEX_DIR) if name.endswith(".json")]
+    checkpoints = [c for c in checkpoints if c and c["status"] != "switched"]
+    return max(checkpoints, key=lambda c: c["updated_at"], default=None)
+
+
+def switch(target=None):
+    checkpoint = load_checkpoint(target) if target else latest_checkpoint()
+    if checkpoint is None:
+        raise SystemExit("❌ 전환할 인덱스가 없습니다. 먼저 python reindex.py build를 실행하세요.")
+    if checkpoint["status"] != "verified":
+        raise SystemExit(f"❌ '{checkpoint['target']}'는 아직 검증되지 않았습니다. (상태: {checkpoint['status']})")
+
+    # 검증 뒤 시간이 지났을 수 있으므로 한 번 더 따라잡고 확인
+    ingest.open_target(checkpoint["target"])
+    conn = ingest.get_db_connection()
+    sync_pass(conn, 0)
+    remove_dead(conn)
+    report = verify(conn)
+    if not report["ok"]:
+        raise SystemExit(f"❌ 전환 직전 검증 실패: {report}")
+
+    entry = set_index_alias(
+        ALIAS, checkpoint["target"],
+        embedding_version=checkpoint["embedding_version"], vectors=report["index_vectors"],
+    )
+    checkpoint["status"] = "switched"
+    checkpoint["switched_at"] = entry["switched_at"]
+    save_checkpoint(checkpoint)
+    print(f"🔀 전환 완료: {ALIAS} → {entry['target']} (이전: {entry['previous']})")
+    print("   RAG 서버는 다음 요청부터, 수집기는 몇 초 안에 새 인덱스를 사용합니다. 되돌리기: python reindex.py rollback")
+
+
+def rollback():
+    entry = read_index_aliases().get(ALIAS)
+    if not entry or not entry.get("previous") or entry["previous"] == entry["target"]:
+        raise SystemExit("❌ 되돌릴 이전 인덱스가 없습니다.")
+    current, previous = entry["target"], entry["previous"]
+    if not index_exists(previous):
+        raise SystemExit(f"❌ 이전 인덱스 '{previous}'가 이미 삭제되었습니다.")
+    # 전환 뒤 이전 인덱스에 반영되지 않은 변경은 수집기가 별칭을 따라가며 전체 확인 / 인덱스 대조로 반영
+    set_index_alias(ALIAS, previous, rolled_back_from=current)
+    checkpoint = load_checkpoint(current)
+    if checkpoint is not None:
+        checkpoint["status"] = "verified"
+        save_checkpoint(checkpoint)
+    print(f"↩️ 되돌리기 완료: {ALIAS} → {previous} (이전: {current}) (다시 전환하려면: python reindex.py switch {current})")
+
+
+def index_exists(name):
+    if VECTOR_BACKEND == "local":
+        return os.path.isdir(os.path.join(LOCAL_INDEX_DIR, name))
+    return name in ingest.pc.list_indexes().names()
+
+
+def drop(name):
+    """쓰지 않는 인덱스와 그 역색인 / 지문 사본 / 체크포인트를 지웁니다. (지금 검색에 쓰는 인덱스는 거부)"""
+    if name == resolve_index(ALIAS):
+        raise SystemExit(f"❌ '{name}'는 지금 검색에 쓰는 인덱스입니다.")
+    if VECTOR_BACKEND == "local":
+        shutil.rmtree(os.path.join(LOCAL_INDEX_DIR, name), ignore_errors=True)
+    elif index_exists(name):
+        ingest.pc.delete_index(name)
+    for path in (LexicalIndex(name).path, ingest.fingerprint_path(name), checkpoint_path(name)):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"🗑️ '{name}' 삭제 완료")
+
+
+def status():
+    entry = read_index_aliases().get(ALIAS)
+    print(f"🔖 {ALIAS} → {resolve_index(ALIAS)}" + (f" (이전: {entry['previous']})" if entry else " (별칭 없음)"))
+    if os.path.isdir(REINDEX_DIR):
+        for name in sorted(os.listdir(REINDEX_DIR)):
+            if name.endswith(".json"):
+                c = load_checkpoint(name[:-5])
+                print(
+                    f"   - {c['target']}: {c['status']} | 공고 {c['posts']} · 청크 {c['chunks']} · 실패 {c['failures']} "
+                    f"| {c['embedding_version']} | {datetime.fromtimestamp(c['updated_at']).strftime('%Y-%m-%d %H:%M')}"
+                )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    arg = sys.argv[2] if len(sys.argv) > 2 else None
+    try:
+        if command == "build":
+            build(arg or f"{ALIAS}-{datetime.now().strftime('%Y%m%d%H%M')}")
+        elif command == "switch":
+            switch(arg)
+        elif command == "rollback":
+            rollback()
+        elif command == "drop" and arg:
+            drop(arg)
+        elif command == "status":
+            status()
+        else:
+            print("사용법: python reindex.py [build [이름] | switch [이름] | rollback | status | drop <이름>]")
+            sys.exit(1)
+    finally:
+        ingest.close_db_connection()
@@ -0,0 +1,175 @@
+import asyncio
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from local_vector_store import LocalVectorStore
+from rag_cache import LRUTTLCache, normalize_query
+
+
+class SharedEmbeddingRetriever(BaseRetriever):
+    """
+    🔍 질문을 한 번만 임베딩해서 여러 Pinecone 인덱스(정책 / 채용)에 같은 벡터로 검색합니다.
+    - 쿼리 임베딩은 정규화된 질문 텍스트를 키로 LRU/TTL 캐시에 보관합니다.
+    - 로컬 BM25 역색인(lexical_indexes)의 결과도 함께 받아 회사명/지역/태그 일치를 보완합니다.
+    - 모든 결과는 EnsembleRetriever와 같은 가중 RRF(Reciprocal Rank Fusion)로 합칩니다.
+    - filters를 넘기면 인덱스별 메타데이터 필터로 사용합니다.
+      (vectorstores와 lexical_indexes는 같은 순서: [정책, 채용])
+    - 여러 청크로 나뉜 공고는 공고 단위로 다시 모으고, 점수가 높은 청크 max_chunks_per_doc개만 남깁니다.
+    - timer(metrics.StageTimer)를 넘기면 임베딩 / 인덱스별 검색 / 역색인 / 통합 시간을 기록합니다.
+      (인덱스별 단계 이름은 source_names: 예) ["policy", "job"] → retrieve_policy, retrieve_job)
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    embeddings: Embeddings
+    vectorstores: List[Any]
+    weights: List[float]
+    k: int = 3
+    c: int = 60
+    embedding_cache: LRUTTLCache
+    lexical_indexes: List[Any] = []
+    lexical_weights: List[float] = []
+    lexical_k: int = 3
+    max_chunks_per_doc: int = 2
+    timer: Any = None
+    source_names: List[str] = []
+
+    def _span(self, stage: str):
+        return self.timer.span(stage) if self.timer is not None else nullcontext()
+
+    def _source_name(self, i: int) -> str:
+        return self.source_names[i] if i < len(self.source_names) else str(i)
+
+    # ---------------------------------------------------------
+    # 🧮 쿼리 임베딩 (캐시 우선)
+    # ---------------------------------------------------------
+    def embed_query(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            with self._span("embed"):
+                vector = self.embeddings.embed_query(query)
+            self.embedding_cache.set(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str) -> List[float]:
+        key = normalize_query(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            with self._span("embed"):
+                vector = await self.embeddings.aembed_query(query)
+            self.embedding_cache.set(key, vector)
+        return vector
+
+    # ---------------------------------------------------------
+    # 🤝 가중 RRF 통합 (같은 본문은 하나로 합치고 점수 누적)
+    # ---------------------------------------------------------
+    def fuse(self, doc_lists: List[List[Document]]) -> List[Document]:
+        weights = self.weights + self.lexical_weights
+        if len(doc_lists) != len(weights):
+            raise ValueError("검색 결과 목록 수와 가중치 수가 같아야 합니다.")
+
+        scores = defaultdict(float)
+        unique_docs = {}
+        for doc_list, weight in zip(doc_lists, weights):
+            for rank, doc in enumerate(doc_list, start=1):
+                scores[doc.page_content] += weight / (rank + self.c)
+                unique_docs.setdefault(doc.page_content, doc)
+
+        with self._span("fuse"):
+            ranked = sorted(unique_docs.values(), key=lambda d: scores[d.page_content], reverse=True)
+            return self.collapse_chunks(ranked, scores)
+
+    def collapse_chunks(self, ranked: List[Document], scores: Dict[str, float]) -> List[Document]:
+        """
+        같은 공고의 청크를 문서 하나로 합칩니다.
+        - 공고 점수 = 청크 점수 합 (여러 청크가 걸린 공고가 위로)
+        - 본문 = 점수가 높은 청크 max_chunks_per_doc개를 원래 순서대로 이어 붙인 것
+        청크 정보(chunk_index)가 없는 문서(정책, 예전 공고)는 그대로 둡니다.
+        """
+        groups: Dict[Any, List[Document]] = {}
+        for doc in ranked:
+            if "chunk_index" in doc.metadata and doc.metadata.get("post_id") is not None:
+                key = ("post", doc.metadata["post_id"])
+            else:
+                key = doc.page_content
+            groups.setdefault(key, []).append(doc)
+
+        collapsed = []
+        for chunks in groups.values():
+            total = sum(scores[d.page_content] for d in chunks)
+            if len(chunks) == 1:
+                collapsed.append((total, chunks[0]))
+                continue
+            best = sorted(chunks[: self.max_chunks_per_doc], key=lambda d: d.metadata["chunk_index"])
+            metadata = {k: v for k, v in chunks[0].metadata.items() if k != "chunk_index"}
+            metadata["chunk_indexes"] = [d.metadata["chunk_index"] for d in best]
+            doc = Document(
+                id=chunks[0].id,
+                page_content="\n…\n".join(d.page_content for d in best),
+                metadata=metadata,
+            )
+            collapsed.append((total, doc))
+
+        collapsed.sort(key=lambda item: item[0], reverse=True)
+        return [doc for _, doc in collapsed]
+
+    def lexical_search(self, query: str, filters: List[Optional[Dict]]) -> List[List[Document]]:
+        """로컬 역색인 검색 (네트워크 호출 없이 수 마이크로초~밀리초)"""
+        with self._span("retrieve_lexical"):
+            return [
+                index.documents(query, k=self.lexical_k, filter=flt)
+                for index, flt in zip(self.lexical_indexes, filters)
+            ]
+
+    def _filters(self, filters: Optional[List[Optional[Dict]]]) -> List[Optional[Dict]]:
+        return list(filters) if filters else [None] * len(self.vectorstores)
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        filters: Optional[List[Optional[Dict]]] = None,
+    ) -> List[Document]:
+        filters = self._filters(filters)
+        vector = self.embed_query(query)
+        doc_lists = []
+        for i, (vs, flt) in enumerate(zip(self.vectorstores, filters)):
+            with self._span(f"retrieve_{self._source_name(i)}"):
+                doc_lists.append(vs.similarity_search_by_vector(vector, k=self.k, filter=flt))
+        return self.fuse(doc_lists + self.lexical_search(query, filters))
+
+    async def _asearch(self, i: int, vector: List[float], flt: Optional[Dict]) -> List[Document]:
+        vectorstore = self.vectorstores[i]
+        with self._span(f"retrieve_{self._source_name(i)}"):
+            if isinstance(vectorstore, LocalVectorStore):
+                return await vectorstore.asimilarity_search_by_vector(vector, k=self.k, filter=flt)
+            # PineconeVectorStore(langchain-pinecone 0.2.x)의 비동기 검색은 매번 캐시된 IndexAsyncio를 async with로 감싸
+            # 첫 호출 뒤 세션이 닫히므로(이후 "Session is closed"), 동기 검색(연결 풀 재사용)을 스레드에서 실행합니다.
+            return await asyncio.to_thread(vectorstore.similarity_search_by_vector, vector, k=self.k, filter=flt)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        filters: Optional[List[Optional[Dict]]] = None,
+    ) -> List[Document]:
+        filters = self._filters(filters)
+        vector = await self.aembed_query(query)
+        # 두 인덱스를 같은 벡터로 동시에 조회
+        doc_lists = await asyncio.gather(
+            *[self._asearch(i, vector, flt) for i, flt in enumerate(filters[: len(self.vectorstores)])]
+        )
+        return self.fuse(list(doc_lists) + self.lexical_search(query, filters))
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from corpus_state import DATA_DIR
+from metadata_filters import normalize_region
+from rag_cache import LRUTTLCache, normalize_query
+
+# -----------------------------------------------
+# 🗂️ 서버 쪽 대화 세션 (session_id별)
+# - 클라이언트가 매 요청마다 history 전체를 보내지 않아도 되도록 대화를 서버에 보관합니다.
+# - 요약에 반영된 오래된 턴은 지우고 요약문만 남김 (compacted history)
+# - 마지막 답변에 쓴 문서를 기억해 두었다가 "구체적으로?" 같은 후속 질문은 검색 없이 그 문서로 답변,
+#   새 질문이면 새로 검색한 문서 뒤에 이전 문서 몇 개를 이어 붙임
+# 기본은 워커 메모리(LRU + TTL), SESSION_DB 경로를 주면 sqlite에도 저장 (재시작 / 여러 워커 공유)
+# -----------------------------------------------
+SESSION_DB = os.path.join(DATA_DIR, "sessions.sqlite3")
+
+FOLLOWUP_MAX_CHARS = 30 # 이보다 긴 질문은 새 질문으로 봄
+PURGE_EVERY = 200 # sqlite 저장 N번마다 만료된 세션 정리
+
+# 방금 답변한 문서를 가리키는 표현 (그 / 이 / 저 + 가리키는 말, N번째, "구체적으로" 등)
+# "마감", "링크", "신청 방법", "자격"처럼 주제만 있는 말은 새 질문일 수 있으므로 가리키는 표현으로 보지 않음
+_POINTED = r"공고|정책|회사|곳|거|것|게|건|일자리|내용"
+_FOLLOWUP = re.compile(
+    r"구체적|자세히|자세하게|더 알려|더 설명|그거|그것|그게|그건|거기|이거|이것|저거|저것|방금|아까"
+    rf"|(?<!\S)(?:그|이|저|위의?) ?(?:{_POINTED})"
+    rf"|(?<!\S)(?:첫|두|세|네|다섯|마지막|[1-5]) ?번째(?: ?(?:{_POINTED}))?"
+    rf"|(?<!\S)[1-5] ?번(?: ?(?:{_POINTED}))?|(?<!\S)마지막 ?(?:{_POINTED})"
+)
+# 가리키는 표현을 빼고도 "IT 공고", "월세 정책"처럼 질문이 스스로 대상을 말하면 새 질문
+_OWN_SUBJECT = re.compile(r"\S ?(?:공고|정책|일자리|채용|알바|아르바이트)")
+# 새 검색을 원하는 표현
+_NEW_SEARCH = re.compile(r"다른|말고|새로운|또 있|더 있|그 밖|그밖|외에")
+
+
+def new_session() -> Dict[str, Any]:
+    return {
+        "summary": "",        # 요약에 반영된 오래된 턴들의 요약
+        "turns": [],          # 아직 요약에 반영되지 않은 (사용자, 봇) 턴
+        "docs": [],           # 마지막 답변에 쓴 문서 {"page_content", "metadata"}
+        "region": "",         # 마지막 질문의 지역 (후속 질문 판정용)
+        "corpus_version": "", # 문서를 기억할 때의 코퍼스 버전 (공고가 바뀌면 재사용 안 함)
+        "updated_at": 0.0,    # 이 사본을 읽거나 저장한 시점의 저장 시각 (다른 요청이 그 뒤에 저장했는지 확인용)
+    }
+
+
+def doc_key(doc: Document) -> Any:
+    """같은 공고 / 정책인지 판단하는 키 (청크를 합친 공고는 post_id)"""
+    post_id = doc.metadata.get("post_id")
+    return ("post", str(post_id)) if post_id is not None else doc.page_content
+
+
+def docs_to_dicts(docs: List[Document]) -> List[Dict[str, Any]]:
+    return [{"page_content": doc.page_content, "metadata": dict(doc.metadata)} for doc in docs]
+
+
+def dicts_to_docs(items: List[Dict[str, Any]]) -> List[Document]:
+    return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in items]
+
+
+def merge_docs(new_docs: List[Document], previous: List[Document], carry: int) -> List[Document]:
+    """새로 검색한 문서 뒤에 이전 답변 문서를 최대 carry개 이어 붙임 (중복 제외, 예산을 넘으면 예산 단계가 버림)"""
+    seen = {doc_key(doc) for doc in new_docs}
+    carried = [doc for doc in previous if doc_key(doc) not in seen][:carry]
+    return new_docs + carried
+
+
+def is_followup(message: str, session: Dict[str, Any], corpus_version: str) -> bool:
+    """
+    이전 답변 문서만으로 답할 수 있는 후속 질문인지
+    (짧고, 앞의 문서를 가리키고, 스스로 다른 대상 / 지역을 말하거나 새 공고를 찾는 말이 없고, 그 사이 코퍼스가 바뀌지 않음)
+    """
+    if not session["docs"] or session["corpus_version"] != corpus_version:
+        return False
+    text = normalize_query(message)
+    if not text or len(text) > FOLLOWUP_MAX_CHARS or _NEW_SEARCH.search(text):
+        return False
+    region = normalize_region(text)
+    if region and region != session["region"]:
+        return False
+    if not _FOLLOWUP.search(text):
+        return False
+    return not _OWN_SUBJECT.search(_FOLLOWUP.sub(" ", text))
+
+
+def compact(session: Dict[str, Any], key: str, summary_cache: LRUTTLCache, max_turns: int) -> None:
+    """
+    요약 캐시에 반영된 턴을 세션에서 지우고 요약문을 세션으로 옮깁니다.
+    (요약 캐시에는 (요약한 턴 수, 요약)이 들어 있으므로, 지운 만큼 0으로 맞춰 다시 넣음)
+    요약이 계속 실패해 턴이 max_turns를 넘으면 가장 오래된 턴부터 버립니다.
+    """
+    summarized_turns, summary = summary_cache.get(key) or (0, "")
+    if 0 < summarized_turns <= len(session["turns"]):
+        session["turns"] = session["turns"][summarized_turns:]
+        session["summary"] = summary
+    if len(session["turns"]) > max_turns:
+        session["turns"] = session["turns"][-max_turns:]
+    # 요약 캐시에서 밀려났거나 키가 겹쳤어도 세션의 요약으로 다시 채움
+    if session["summary"]:
+        summary_cache.set(key, (0, session["summary"]))
+
+
+class SessionStore:
+    """
+    session_id → 세션 dict.
+    메모리 LRU가 앞에 있고, path가 있으면 sqlite에 그대로 저장합니다.
+    sqlite를 쓰면 다른 워커가 같은 세션에 턴을 더했을 수 있으므로, 메모리 사본은 저장 시각(updated_at)이
+    sqlite와 같을 때만 쓰고 다르면 sqlite에서 다시 읽습니다.
+    get / open / add_turn은 sqlite를 건드리므로 async 핸들러에서는 asyncio.to_thread로 부릅니다.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 6 * 3600, path: Optional[str] = None):
+        self.memory = LRUTTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.created = 0
+        self.restored = 0 # sqlite에서 (다시) 읽어 온 세션 수 (재시작 / 다른 워커가 갱신)
+        self.merged = 0   # 읽은 뒤 다른 요청이 먼저 저장해 저장된 세션에 턴을 더한 횟수
+        self.reused = 0   # 검색 없이 이전 문서로 답한 후속 질문 수
+        self.extended = 0 # 새 검색 결과에 이전 문서를 이어 붙인 질문 수
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY, payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def _load(self, payload: str, updated_at: float) -> Dict[str, Any]:
+        session = {**new_session(), **json.loads(payload)}
+        session["updated_at"] = updated_at
+        return session
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        cached = self.memory.get(session_id)
+        if self._conn is None:
+            return cached
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            if cached is not None and cached["updated_at"] == row[0]:
+                return cached
+            # 처음 보거나 다른 워커가 그 뒤에 저장한 세션
+            row = self._conn.execute(
+                "SELECT payload, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        session = self._load(*row)
+        self.memory.set(session_id, session)
+        self.restored += 1
+        return session
+
+    def open(self, session_id: Optional[str]) -> tuple:
+        """(session_id, 세션). 없거나 만료되었으면 새 세션 (클라이언트가 보낸 id는 그대로 사용)"""
+        session = self.get(session_id) if session_id else None
+        if session is None:
+            session_id = session_id or self.new_id()
+            session = new_session()
+            self.created += 1
+        return session_id, session
+
+    def add_turn(self, session_id: str, session: Dict[str, Any], turn: List[str], updates: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        답변한 턴(과 바뀐 필드)을 세션에 더해 저장하고, 저장된 세션을 돌려줍니다.
+        같은 세션에 요청이 겹쳐 이 사본을 읽은 뒤 다른 요청(다른 워커)이 먼저 저장했으면,
+        이 사본으로 덮어쓰지 않고 저장된 세션에 이 요청의 턴과 필드만 더합니다. (먼저 저장한 턴을 잃지 않음)
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("BEGIN IMMEDIATE") # 다른 워커의 저장과 겹치지 않도록 읽기부터 쓰기 잠금
+                row = self._conn.execute(
+                    "SELECT payload, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is not None and row[1] != session["updated_at"]:
+                    session = self._load(*row)
+                    self.merged += 1
+            session["turns"].append(list(turn))
+            session.update(updates or {})
+            session["updated_at"] = time.time()
+            self.memory.set(session_id, session)
+            if self._conn is None:
+                return session
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions (session_id, payload, updated_at) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(session, ensure_ascii=False, default=str), session["updated_at"]),
+                )
+                self._saves += 1
+                if self._saves % PURGE_EVERY == 0:
+                    self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return session
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.memory.stats(),
+            "backend": "sqlite" if self._conn is not None else "memory",
+            "created": self.created,
+            "restored": self.restored,
+            "merged": self.merged,
+            "followups_reused": self.reused,
+            "followups_extended": self.extended,
+        }
@@ -0,0 +1,68 @@
+from typing import List
+
+import tiktoken
+
+# -----------------------------------------------
+# 🔢 토큰 계산 도우미 (OpenAI 임베딩 / 프롬프트 예산 계산용)
+# -----------------------------------------------
+TOKEN_ENCODING_MODEL = "text-embedding-3-small"
+
+_encoding = None
+_encoding_failed = False
+
+
+def get_encoding():
+    """tiktoken 인코딩을 한 번만 로드합니다. (인코딩 파일을 못 받으면 None → 근사치 사용)"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.encoding_for_model(TOKEN_ENCODING_MODEL)
+        except Exception as e:
+            print(f"⚠️ tiktoken 인코딩 로드 실패, 바이트 길이로 토큰 수를 근사합니다: {e}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        # 한글 1글자(3바이트) ≈ 1.5토큰으로 넉넉하게 잡는 근사치
+        return len(text.encode("utf-8")) // 2 + 1
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """max_tokens를 넘는 텍스트를 앞부분만 남기고 자릅니다."""
+    encoding = get_encoding()
+    if encoding is None:
+        if count_tokens(text) <= max_tokens:
+            return text
+        return text.encode("utf-8")[: max_tokens * 2].decode("utf-8", errors="ignore")
+
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_tokens(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    텍스트를 chunk_tokens 토큰씩 자릅니다. 이웃한 조각은 overlap_tokens만큼 겹칩니다.
+    (문장이 조각 경계에서 잘려도 앞뒤 조각 어느 한쪽에는 온전히 남도록)
+    """
+    step = max(chunk_tokens - overlap_tokens, 1)
+    encoding = get_encoding()
+    if encoding is None:
+        # 근사치 모드: count_tokens와 같은 기준(2바이트 ≈ 1토큰)으로 바이트를 자름
+        data = text.encode("utf-8")
+        size, stride = chunk_tokens * 2, step * 2
+        return [
+            data[start:start + size].decode("utf-8", errors="ignore")
+            for start in range(0, max(len(data) - (size - stride), 1), stride)
+        ]
+
+    tokens = encoding.encode(text)
+    return [
+        encoding.decode(tokens[start:start + chunk_tokens])
+        for start in range(0, max(len(tokens) - (chunk_tokens - step), 1), step)
+    ]
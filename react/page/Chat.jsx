@@ -123,6 +123,8 @@ const SendButton = styled.button`
 `;
 
 const CHAT_API = import.meta.env.VITE_CHAT_API;
+// 이런 질문이면 위치를 함께 보내 가까운 공고부터 찾음 (Python geo_index.py와 같은 표현)
+const NEARBY_PATTERN = /근처|가까운|가까이|주변|인근|근방|내 ?위치|현재 ?위치|반경|도보|걸어서|\d+ ?(km|킬로)/i;
 
 // --- [기능] Chat 컴포넌트 ---
 const Chat = () => {
@@ -135,6 +137,12 @@ const Chat = () => {
   
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // 대화 세션 ID: 서버가 대화 기록을 보관하므로, 서버가 세션을 확인해 준 뒤로는 history를 보내지 않음
+  // (서버가 세션을 잃었다고 409로 알려 오면 다시 history를 보냄)
+  const [sessionId] = useState(() => crypto.randomUUID());
+  const [sessionConfirmed, setSessionConfirmed] = useState(false);
+  // 사용자 위치: "근처 공고" 질문을 처음 할 때만 브라우저에 물어보고, 그 뒤로는 재사용
+  const locationRef = useRef(null);
   const messagesEndRef = useRef(null);
 
   const { isLoggedIn, age, region, gender } = useAuth(); 
@@ -147,13 +155,29 @@ const Chat = () => {
     scrollToBottom();
   }, [messages]);
 
+  const getLocation = () => {
+    if (locationRef.current || !navigator.geolocation) {
+      return Promise.resolve(locationRef.current);
+    }
+    return new Promise((resolve) => {
+      navigator.geolocation.getCurrentPosition(
+        (position) => {
+          locationRef.current = { lat: position.coords.latitude, lng: position.coords.longitude };
+          resolve(locationRef.current);
+        },
+        () => resolve(null), // 거부하면 위치 없이 질문 (지역 이름으로 검색)
+        { timeout: 5000, maximumAge: 10 * 60 * 1000 }
+      );
+    });
+  };
+
   const handleSend = async (e) => {
     e.preventDefault();
     if (input.trim() === '' || isLoading) return;
 
     const userMessage = { sender: 'user', text: input };
     const currentInput = input;
-    const historyToSend = messages;
+    const history = messages;
 
     setMessages(prevMessages => [...prevMessages, userMessage]);
     setInput('');
@@ -170,23 +194,38 @@ const Chat = () => {
     console.log("전송할 사용자 프로필:", userProfile);
 
     try {
-      const response = await fetch(CHAT_API , {
+      const location = NEARBY_PATTERN.test(currentInput) ? await getLocation() : locationRef.current;
+
+      const send = (resume) => fetch(CHAT_API , {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({ 
           message: currentInput, 
-          history: historyToSend,
-          user_profile: userProfile 
+          history: resume ? [] : history,
+          user_profile: userProfile,
+          session_id: sessionId,
+          resume_session: resume,
+          location: location
         }), 
       });
 
+      let response = await send(sessionConfirmed);
+      // 서버가 세션을 잃었으면(재시작 / 만료) 409 → 갖고 있는 대화 기록을 담아 한 번 더 보냄
+      if (response.status === 409) {
+        setSessionConfirmed(false);
+        response = await send(false);
+      }
+
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
       const data = await response.json();
+      if (data.session_id === sessionId) {
+        setSessionConfirmed(true);
+      }
 
       const botMessage = { 
         sender: 'bot', 